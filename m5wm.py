@@ -1,5 +1,13 @@
 from m5stack import lcd, axp, btnA, btnB, speaker
-import machine, utime, ujson, uos, ntptime, wifiCfg
+import machine, esp32, utime, ujson, uos, ntptime, wifiCfg, uheapq, array
+
+try:
+    import uasyncio
+    if not hasattr(uasyncio, "run"):
+        # MicroPython 1.12 以前の uasyncio (v2) は使用しない
+        uasyncio = None
+except ImportError:
+    uasyncio = None
 
 will_remove_cache = False
 
@@ -27,7 +35,6 @@ def main():
     import wattmeter
     global will_remove_cache
 
-    TASK_LOOP_WAIT_SEC = 3
     ERROR_DISPLAY_TIME = 60
     REBOOT_WAIT_SEC = 10
 
@@ -38,13 +45,21 @@ def main():
 
     wm = wattmeter.M5Wattmeter(
         vlcd=wattmeter.VirtualLCD(lcd=lcd, axp=axp),
-        client=wattmeter.BP35A1Client(uart=machine.UART, utime=utime, logging=logging),
+        client=(
+            wattmeter.BP35A1Client(uart=machine.UART, utime=utime, logging=logging)
+            if uasyncio is None else
+            wattmeter.AsyncBP35A1Client(uart=machine.UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        ),
         config=wattmeter.WMConfig(ujson=ujson, uos=uos, logging=logging),
         logging=logging,
         wifiCfg=wifiCfg,
         utime=utime,
         ntptime=ntptime,
-        speaker=speaker
+        speaker=speaker,
+        heapq=uheapq,
+        uasyncio=uasyncio,
+        machine=machine,
+        array=array
     )
 
     if will_remove_cache:
@@ -63,6 +78,7 @@ def main():
         """
         nonlocal wm
         wm.toggleSleep()
+        wm.interruptTaskLoop()
 
     def btnB_was_released():
         """
@@ -70,6 +86,7 @@ def main():
         """
         nonlocal wm
         wm.switchFace()
+        wm.interruptTaskLoop()
 
     def btnB_press_for():
         """
@@ -77,6 +94,7 @@ def main():
         """
         nonlocal wm
         wm.toggleFlip()
+        wm.interruptTaskLoop()
 
     btnA.wasReleased(btnA_was_released)
     btnB.wasReleased(btnB_was_released)
@@ -91,15 +109,18 @@ def main():
     else:
         prepared = True
 
-    while prepared:
+    if prepared:
+        if wm.config.config.display.light_sleep:
+            # ライトスリープ中はボタンA(GPIO37)の押下で起床する
+            esp32.wake_on_ext0(pin=machine.Pin(37, machine.Pin.IN), level=esp32.WAKEUP_ALL_LOW)
         try:
-            while wm.execLaunchableTask():
-                pass
+            if uasyncio is None:
+                wm.startTaskLoop()
+            else:
+                uasyncio.run(wm.runTaskLoop())
         except Exception as e:
             logging.exception(e)
             wm.vlcd.showError(str(e), e.__class__.__name__)
-            break
-        utime.sleep(TASK_LOOP_WAIT_SEC)
 
     if wm.config.config is None:
         return
@@ -0,0 +1,394 @@
+import struct
+import zlib
+from math import atan2, degrees
+from . import lcd as lcd_constants
+
+# lcd.font() で使用する各フォントの1文字の幅と高さ(実機のフォントの近似値)
+FONT_METRICS = {
+    lcd_constants.FONT_Default:      (7, 12),
+    lcd_constants.FONT_DejaVu18:     (11, 18),
+    lcd_constants.FONT_DejaVu24:     (15, 24),
+    lcd_constants.FONT_Ubuntu:       (10, 16),
+    lcd_constants.FONT_Comic:        (14, 24),
+    lcd_constants.FONT_Minya:        (14, 24),
+    lcd_constants.FONT_Tooney:       (20, 32),
+    lcd_constants.FONT_Small:        (6, 8),
+    lcd_constants.FONT_DefaultSmall: (6, 10),
+    lcd_constants.FONT_7seg:         (16, 32),
+    lcd_constants.FONT_DejaVu40:     (25, 40),
+    lcd_constants.FONT_DejaVu56:     (35, 56),
+    lcd_constants.FONT_DejaVu72:     (45, 72),
+    lcd_constants.FONT_Arial12:      (7, 14),
+    lcd_constants.FONT_Arial16:      (9, 16),
+    lcd_constants.FONT_UNICODE:      (8, 16),
+}
+
+# 5x8ドットの字形(列ごとに下位ビットが上)
+# 英小文字は大文字、未定義の文字は "?" で描画する
+GLYPHS = {
+    " ": (0x00, 0x00, 0x00, 0x00, 0x00),
+    "!": (0x00, 0x00, 0x5F, 0x00, 0x00),
+    "%": (0x23, 0x13, 0x08, 0x64, 0x62),
+    "(": (0x00, 0x1C, 0x22, 0x41, 0x00),
+    ")": (0x00, 0x41, 0x22, 0x1C, 0x00),
+    "+": (0x08, 0x08, 0x3E, 0x08, 0x08),
+    ",": (0x00, 0x80, 0x70, 0x30, 0x00),
+    "-": (0x08, 0x08, 0x08, 0x08, 0x08),
+    ".": (0x00, 0x00, 0x60, 0x60, 0x00),
+    "/": (0x20, 0x10, 0x08, 0x04, 0x02),
+    "0": (0x3E, 0x51, 0x49, 0x45, 0x3E),
+    "1": (0x00, 0x42, 0x7F, 0x40, 0x00),
+    "2": (0x72, 0x49, 0x49, 0x49, 0x46),
+    "3": (0x21, 0x41, 0x49, 0x4D, 0x33),
+    "4": (0x18, 0x14, 0x12, 0x7F, 0x10),
+    "5": (0x27, 0x45, 0x45, 0x45, 0x39),
+    "6": (0x3C, 0x4A, 0x49, 0x49, 0x31),
+    "7": (0x41, 0x21, 0x11, 0x09, 0x07),
+    "8": (0x36, 0x49, 0x49, 0x49, 0x36),
+    "9": (0x46, 0x49, 0x49, 0x29, 0x1E),
+    ":": (0x00, 0x00, 0x14, 0x00, 0x00),
+    "=": (0x14, 0x14, 0x14, 0x14, 0x14),
+    "?": (0x02, 0x01, 0x59, 0x09, 0x06),
+    "A": (0x7C, 0x12, 0x11, 0x12, 0x7C),
+    "B": (0x7F, 0x49, 0x49, 0x49, 0x36),
+    "C": (0x3E, 0x41, 0x41, 0x41, 0x22),
+    "D": (0x7F, 0x41, 0x41, 0x41, 0x3E),
+    "E": (0x7F, 0x49, 0x49, 0x49, 0x41),
+    "F": (0x7F, 0x09, 0x09, 0x09, 0x01),
+    "G": (0x3E, 0x41, 0x41, 0x51, 0x73),
+    "H": (0x7F, 0x08, 0x08, 0x08, 0x7F),
+    "I": (0x00, 0x41, 0x7F, 0x41, 0x00),
+    "J": (0x20, 0x40, 0x41, 0x3F, 0x01),
+    "K": (0x7F, 0x08, 0x14, 0x22, 0x41),
+    "L": (0x7F, 0x40, 0x40, 0x40, 0x40),
+    "M": (0x7F, 0x02, 0x1C, 0x02, 0x7F),
+    "N": (0x7F, 0x04, 0x08, 0x10, 0x7F),
+    "O": (0x3E, 0x41, 0x41, 0x41, 0x3E),
+    "P": (0x7F, 0x09, 0x09, 0x09, 0x06),
+    "Q": (0x3E, 0x41, 0x51, 0x21, 0x5E),
+    "R": (0x7F, 0x09, 0x19, 0x29, 0x46),
+    "S": (0x26, 0x49, 0x49, 0x49, 0x32),
+    "T": (0x03, 0x01, 0x7F, 0x01, 0x03),
+    "U": (0x3F, 0x40, 0x40, 0x40, 0x3F),
+    "V": (0x1F, 0x20, 0x40, 0x20, 0x1F),
+    "W": (0x3F, 0x40, 0x38, 0x40, 0x3F),
+    "X": (0x63, 0x14, 0x08, 0x14, 0x63),
+    "Y": (0x03, 0x04, 0x78, 0x04, 0x03),
+    "Z": (0x61, 0x59, 0x49, 0x4D, 0x43),
+}
+
+class FrameBufferLCD:
+    """
+    lcdモジュールのソフトウェア実装
+
+    VirtualLCDが使用するlcdモジュールの関数をbytearrayのフレームバッファ(RGB 24bit)に描画する
+    lcdモジュールの代わりに VirtualLCD(lcd=FrameBufferLCD(), axp=axp) として使用する
+
+    Attributes
+    ----------
+    calls : dict
+        描画関数ごとの呼び出し回数
+    """
+
+    def __init__(self, width = 136, height = 241):
+        for name in dir(lcd_constants):
+            if name[:1].isupper():
+                setattr(self, name, getattr(lcd_constants, name))
+        self._width = width
+        self._height = height
+        self._screen = bytearray(width * height * 3)
+        self._sprite = None
+        self._sprite_w = 0
+        self._sprite_h = 0
+        self._target = None  # 描画先 (buffer, width, height)
+        self._fg = lcd_constants.WHITE
+        self._bg = lcd_constants.BLACK
+        self._font = lcd_constants.FONT_Default
+        self._font_rotate = 0
+        self._font_color = -1
+        self.calls = {}
+        self.sprite_deselect()
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # --- フレームバッファ ---
+
+    def _set(self, x, y, color):
+        buffer, w, h = self._target
+        if 0 <= x < w and 0 <= y < h:
+            i = (y * w + x) * 3
+            buffer[i] = (color >> 16) & 0xFF
+            buffer[i + 1] = (color >> 8) & 0xFF
+            buffer[i + 2] = color & 0xFF
+
+    def _fill(self, inside, x1, y1, x2, y2, color):
+        # 範囲内で inside(x, y) が真のピクセルを塗る
+        for y in range(y1, y2 + 1):
+            for x in range(x1, x2 + 1):
+                if inside(x, y):
+                    self._set(x, y, color)
+
+    def _outline(self, inside, x1, y1, x2, y2, color):
+        # 領域の内側で上下左右のいずれかが外側のピクセルを塗る
+        for y in range(y1, y2 + 1):
+            for x in range(x1, x2 + 1):
+                if inside(x, y) and not (inside(x - 1, y) and inside(x + 1, y) and inside(x, y - 1) and inside(x, y + 1)):
+                    self._set(x, y, color)
+
+    def _color(self, color):
+        return self._fg if color < 0 else color
+
+    def getPixel(self, x, y):
+        """
+        画面のピクセルの色を取得する
+
+        Parameters
+        ----------
+        x : int
+            x座標
+        y : int
+            y座標
+
+        Returns
+        -------
+        int
+            色 (0xRRGGBB)
+        """
+        i = (y * self._width + x) * 3
+        s = self._screen
+        return (s[i] << 16) | (s[i + 1] << 8) | s[i + 2]
+
+    def getScreen(self):
+        """
+        画面のフレームバッファの複製を取得する
+
+        Returns
+        -------
+        bytes
+            左上から1行ずつ並べたRGBの値
+        """
+        return bytes(self._screen)
+
+    def toPPM(self):
+        """
+        画面をPPM(P6)形式に変換する
+
+        Returns
+        -------
+        bytes
+            PPM形式の画像
+        """
+        header = "P6\n{} {}\n255\n".format(self._width, self._height).encode("ascii")
+        return header + bytes(self._screen)
+
+    def toPNG(self):
+        """
+        画面をPNG形式に変換する
+
+        Returns
+        -------
+        bytes
+            PNG形式の画像
+        """
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+        stride = self._width * 3
+        raw = b"".join(b"\x00" + bytes(self._screen[y * stride:(y + 1) * stride]) for y in range(self._height))
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", self._width, self._height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b"")
+        )
+
+    def save(self, path):
+        """
+        画面を画像ファイルに保存する
+
+        Parameters
+        ----------
+        path : str
+            保存するファイルのパス
+            拡張子が .png の場合はPNG形式、それ以外はPPM形式
+        """
+        data = self.toPNG() if path.lower().endswith(".png") else self.toPPM()
+        with open(path, "wb") as f:
+            f.write(data)
+
+    # --- lcdモジュールの関数 ---
+
+    def screensize(self):
+        return (self._width, self._height)
+
+    def sprite_create(self, w, h, color):
+        self._sprite = bytearray(w * h * 3)
+        self._sprite_w = w
+        self._sprite_h = h
+
+    def sprite_select(self):
+        self._target = (self._sprite, self._sprite_w, self._sprite_h)
+
+    def sprite_deselect(self):
+        self._target = (self._screen, self._width, self._height)
+
+    def sprite_show(self, x, y):
+        self._count("sprite_show")
+        sw = self._sprite_w
+        for sy in range(self._sprite_h):
+            dy = y + sy
+            if not 0 <= dy < self._height:
+                continue
+            for sx in range(sw):
+                dx = x + sx
+                if 0 <= dx < self._width:
+                    si = (sy * sw + sx) * 3
+                    di = (dy * self._width + dx) * 3
+                    self._screen[di:di + 3] = self._sprite[si:si + 3]
+
+    def setColor(self, color, bg_color):
+        self._fg = color
+        self._bg = bg_color
+
+    def clear(self, color = -1):
+        self._count("clear")
+        buffer, w, h = self._target
+        c = self._bg if color < 0 else color
+        buffer[:] = bytes(((c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF)) * (w * h)
+
+    def font(self, font, rotate=0, transparent=True, fixedwidth=True, dist=0, width=0, outline=0, color=-1):
+        self._font = font
+        self._font_rotate = rotate % 360
+        self._font_color = color
+
+    def fontSize(self):
+        return FONT_METRICS[self._font]
+
+    def textWidth(self, text):
+        return len(text) * FONT_METRICS[self._font][0]
+
+    def pixel(self, x, y, color=-1):
+        self._count("pixel")
+        self._set(x, y, self._color(color))
+
+    def _line(self, x, y, x1, y1, c):
+        dx = abs(x1 - x)
+        dy = -abs(y1 - y)
+        sx = 1 if x < x1 else -1
+        sy = 1 if y < y1 else -1
+        err = dx + dy
+        while True:
+            self._set(x, y, c)
+            if x == x1 and y == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x += sx
+            if e2 <= dx:
+                err += dx
+                y += sy
+
+    def line(self, x, y, x1, y1, color=-1):
+        self._count("line")
+        self._line(x, y, x1, y1, self._color(color))
+
+    def rect(self, x, y, width, height, color=-1, fillcolor=-1):
+        self._count("rect")
+        x2 = x + width - 1
+        y2 = y + height - 1
+        inside = lambda px, py: x <= px <= x2 and y <= py <= y2
+        if fillcolor >= 0:
+            self._fill(inside, x, y, x2, y2, fillcolor)
+        self._outline(inside, x, y, x2, y2, self._color(color))
+
+    def roundrect(self, x, y, width, height, r, color=-1, fillcolor=-1):
+        self._count("roundrect")
+        x2 = x + width - 1
+        y2 = y + height - 1
+
+        def inside(px, py):
+            if not (x <= px <= x2 and y <= py <= y2):
+                return False
+            cx = min(max(px, x + r), x2 - r)
+            cy = min(max(py, y + r), y2 - r)
+            return (px - cx) ** 2 + (py - cy) ** 2 <= r * r + r
+
+        if fillcolor >= 0:
+            self._fill(inside, x, y, x2, y2, fillcolor)
+        self._outline(inside, x, y, x2, y2, self._color(color))
+
+    def triangle(self, x, y, x1, y1, x2, y2, color=-1, fillcolor=-1):
+        self._count("triangle")
+        if fillcolor >= 0:
+            def inside(px, py):
+                d1 = (px - x1) * (y - y1) - (x - x1) * (py - y1)
+                d2 = (px - x2) * (y1 - y2) - (x1 - x2) * (py - y2)
+                d3 = (px - x) * (y2 - y) - (x2 - x) * (py - y)
+                negative = d1 < 0 or d2 < 0 or d3 < 0
+                positive = d1 > 0 or d2 > 0 or d3 > 0
+                return not (negative and positive)
+
+            self._fill(inside, min(x, x1, x2), min(y, y1, y2), max(x, x1, x2), max(y, y1, y2), fillcolor)
+        c = self._color(color)
+        self._line(x, y, x1, y1, c)
+        self._line(x1, y1, x2, y2, c)
+        self._line(x2, y2, x, y, c)
+
+    def circle(self, x, y, r, color=-1, fillcolor=-1):
+        self._count("circle")
+        inside = lambda px, py: (px - x) ** 2 + (py - y) ** 2 <= r * r + r
+        if fillcolor >= 0:
+            self._fill(inside, x - r, y - r, x + r, y + r, fillcolor)
+        self._outline(inside, x - r, y - r, x + r, y + r, self._color(color))
+
+    def arc(self, x, y, r, thick, start, end, color=-1, fillcolor=-1):
+        self._count("arc")
+        start %= 360
+        end %= 360
+
+        def inside(px, py):
+            d = (px - x) ** 2 + (py - y) ** 2
+            if d > r * r + r or d <= (r - thick) ** 2 + (r - thick):
+                return False
+            # 画面の上方向を0として時計回りの角度
+            angle = 0
+            if px != x or py != y:
+                angle = degrees(atan2(px - x, y - py)) % 360
+            if start <= end:
+                return start <= angle <= end
+            return angle >= start or angle <= end
+
+        if fillcolor >= 0:
+            self._fill(inside, x - r, y - r, x + r, y + r, fillcolor)
+        self._outline(inside, x - r, y - r, x + r, y + r, self._color(color))
+
+    def text(self, x, y, txt, color=-1):
+        self._count("text")
+        if color >= 0:
+            c = color
+        elif self._font_color >= 0:
+            c = self._font_color
+        else:
+            c = self._fg
+        cw, ch = FONT_METRICS[self._font]
+        # 文字の座標(tx: 文字列の方向, ty: 文字の下方向)を時計回りに回転する
+        rotate = self._font_rotate
+        if rotate == 90:
+            transform = lambda tx, ty: (x - ty, y + tx)
+        elif rotate == 180:
+            transform = lambda tx, ty: (x - tx, y - ty)
+        elif rotate == 270:
+            transform = lambda tx, ty: (x + ty, y - tx)
+        else:
+            transform = lambda tx, ty: (x + tx, y + ty)
+        for i, char in enumerate(txt):
+            glyph = GLYPHS.get(char.upper(), GLYPHS["?"])
+            for py in range(ch):
+                row = py * 8 // ch
+                for px in range(cw):
+                    column = px * 6 // cw
+                    # 6列目は文字間の空白
+                    if column < 5 and glyph[column] & (1 << row):
+                        self._set(*transform(i * cw + px, py), c)
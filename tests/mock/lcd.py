@@ -84,6 +84,9 @@ def textWidth(text):
 def pixel(x, y, color=-1):
     pass
 
+def line(x, y, x1, y1, color=-1):
+    pass
+
 def rect(x, y, width, height, color=-1, fillcolor=-1):
     pass
 
@@ -0,0 +1,27 @@
+import asyncio
+from asyncio import Lock, Event, CancelledError, TimeoutError, create_task, gather, run, get_event_loop
+from . import utime
+
+# 待機時間は実際には待たずに utime.ticks を進めて他のタスクに制御を渡す
+
+async def sleep(t):
+    utime.ticks += int(t * 1000)
+    await asyncio.sleep(0)
+
+async def sleep_ms(t):
+    utime.ticks += t
+    await asyncio.sleep(0)
+
+async def wait_for_ms(aw, timeout):
+    # 他のタスクが進められる間は時間を進めずに待つ
+    task = asyncio.ensure_future(aw)
+    for _ in range(10):
+        await asyncio.sleep(0)
+        if task.done():
+            return task.result()
+    utime.ticks += timeout
+    await asyncio.sleep(0)
+    if not task.done():
+        task.cancel()
+        raise TimeoutError
+    return task.result()
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 
 timestamp = None
+ticks = 0  # ticks_ms() の値 sleep()/sleep_ms() で進む
 
 EPOCH_OFFSET = 946684800  # Unix epoch の 2000/1/1 00:00:00 ← 組み込み機器のエポック
 
@@ -44,10 +45,21 @@ def mktime(t):
     return int(dt.timestamp() - EPOCH_OFFSET)
 
 def sleep(seconds):
-    pass
+    global ticks
+    ticks += int(seconds * 1000)
 
 def sleep_ms(ms):
-    pass
+    global ticks
+    ticks += ms
+
+def ticks_ms():
+    return ticks
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
 
 def time():
     if timestamp is None:
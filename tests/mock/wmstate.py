@@ -1,3 +1,8 @@
+version = 1
+
+def getVersion():
+    return version
+
 def getCurrentWatt():
     return 123
 
@@ -1,15 +1,15 @@
 import unittest
 from unittest.mock import MagicMock, call
-from mock import lcd, axp, ujson, uos, utime, logging, wifiCfg, ntptime, speaker
+from mock import lcd, axp, ujson, uos, utime, logging, wifiCfg, ntptime, speaker, uasyncio
 from mock.machine import UART
-import os, tempfile, json
+import os, tempfile, json, heapq, array, random
 import vlcd, wisun, wmconfig, meter
 
 class TestM5Wattmeter(unittest.TestCase):
     def getAssetFilePath(self, file_name):
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", file_name)
 
-    def getInstance(self):
+    def getInstance(self, array=None):
         return meter.M5Wattmeter(
             vlcd=vlcd.VirtualLCD(lcd=lcd, axp=axp),
             client=wisun.BP35A1Client(uart=UART, utime=utime, logging=logging),
@@ -18,11 +18,28 @@ class TestM5Wattmeter(unittest.TestCase):
             wifiCfg=wifiCfg,
             utime=utime,
             ntptime=ntptime,
-            speaker=speaker
+            speaker=speaker,
+            heapq=heapq,
+            array=array
+        )
+
+    def getAsyncInstance(self):
+        return meter.M5Wattmeter(
+            vlcd=vlcd.VirtualLCD(lcd=lcd, axp=axp),
+            client=wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio),
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging),
+            logging=logging,
+            wifiCfg=wifiCfg,
+            utime=utime,
+            ntptime=ntptime,
+            speaker=speaker,
+            heapq=heapq,
+            uasyncio=uasyncio
         )
 
     def setUp(self):
         uos.ADD_ENTRIES = []
+        utime.ticks = 0
 
     def tearDown(self):
         utime.timestamp = None
@@ -31,32 +48,40 @@ class TestM5Wattmeter(unittest.TestCase):
         def nothing():
             pass
         wm = self.getInstance()
+        utime.ticks = 5000
         wm.addTask(
-            launch_time=12445,
+            delay=100,
             func=nothing,
             interval=None
         )
         wm.addTask(
-            launch_time=12345,
+            delay=0,
             func=nothing,
             interval=300
         )
         wm.addTask(
-            launch_time=12545,
+            delay=200,
             func=nothing,
             interval=10
         )
         wm.addTask(
-            launch_time=12645,
+            delay=300,
             func=nothing,
-            interval=1
+            interval=0.5
         )
 
-        self.assertIsNone(wm._getTask(12344))
-        self.assertEqual(wm._getTask(12345), {"t": 12345, "f": nothing, "i": 300})
-        self.assertIsNone(wm._getTask(12345))
-        self.assertEqual(wm._getTask(12555), {"t": 12445, "f": nothing, "i": None})
-        self.assertEqual(wm._getTask(12555), {"t": 12545, "f": nothing, "i": 10})
+        def assertTask(task, launch_time, interval):
+            self.assertEqual(task["t"], launch_time)
+            self.assertIs(task["f"], nothing)
+            self.assertEqual(task["i"], interval)
+
+        # 起動時刻は最初の addTask() 時点からの経過時間(ミリ秒)
+        self.assertIsNone(wm._getTask(-1))
+        assertTask(wm._getTask(0), 0, 300000)
+        self.assertIsNone(wm._getTask(0))
+        assertTask(wm._getTask(210000), 100000, None)
+        assertTask(wm._getTask(210000), 200000, 10000)
+        assertTask(wm._getTask(300000), 300000, 500)
 
     def test_execLaunchableTask(self):
         task1 = MagicMock()
@@ -65,51 +90,400 @@ class TestM5Wattmeter(unittest.TestCase):
 
         wm = self.getInstance()
         wm.addTask(
-            launch_time=12355,
+            delay=11,
             func=task2,
             interval=300
         )
         wm.addTask(
-            launch_time=12345,
+            delay=1,
             func=task1,
             interval=30
         )
         wm.addTask(
-            launch_time=12360,
+            delay=16,
             func=task3,
             interval=5
         )
 
-        # 12344 → None
-        utime.timestamp = 12344
+        # 999 → None
+        utime.ticks = 999
         self.assertFalse(wm.execLaunchableTask())
-        # 12345 → 12345
-        utime.timestamp = 12345
+        # 1000 → 1000
+        utime.ticks = 1000
         self.assertTrue(wm.execLaunchableTask())
         self.assertEqual(task1.call_count, 1)
         self.assertEqual(task2.call_count, 0)
         self.assertEqual(task3.call_count, 0)
-        # 12360 → 12355, (12360)
-        utime.timestamp = 12360
+        # 16000 → 11000, (16000)
+        utime.ticks = 16000
         self.assertTrue(wm.execLaunchableTask())
         self.assertEqual(task1.call_count, 1)
         self.assertEqual(task2.call_count, 1)
         self.assertEqual(task3.call_count, 0)
-        # 12361 → 12360
-        utime.timestamp = 12361
+        # 16001 → 16000
+        utime.ticks = 16001
         self.assertTrue(wm.execLaunchableTask())
         self.assertEqual(task1.call_count, 1)
         self.assertEqual(task2.call_count, 1)
         self.assertEqual(task3.call_count, 1)
-        # 12365 → None
-        utime.timestamp = 12365
+        # 20999 → None
+        utime.ticks = 20999
         self.assertFalse(wm.execLaunchableTask())
-        # 12366 → 12366(12360の繰り返し)
-        utime.timestamp = 12366
+        # 21000 → 21000(16000の繰り返し 実行開始が遅れても間隔はずれない)
+        utime.ticks = 21000
         self.assertTrue(wm.execLaunchableTask())
-        self.assertEqual(task1.call_count, 1)
-        self.assertEqual(task2.call_count, 1)
         self.assertEqual(task3.call_count, 2)
+        # 38500 → 26000, 31000 (実行が遅れて過ぎた回は飛ばす)
+        utime.ticks = 38500
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertFalse(wm.execLaunchableTask())
+        self.assertEqual(task1.call_count, 2)
+        self.assertEqual(task3.call_count, 3)
+        # 41000 → 41000
+        utime.ticks = 41000
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertEqual(task3.call_count, 4)
+        self.assertEqual(task1.call_count, 2)
+
+    def test_execLaunchableTask_ntp_resync(self):
+        task = MagicMock()
+        wm = self.getInstance()
+        utime.timestamp = 734050000
+        wm.addTask(delay=30, func=task, interval=30)
+        # 時刻が修正されても経過時間で実行する
+        utime.timestamp = 734040000
+        utime.ticks = 30000
+        self.assertTrue(wm.execLaunchableTask())
+        utime.timestamp = 734090000
+        utime.ticks = 59999
+        self.assertFalse(wm.execLaunchableTask())
+        self.assertEqual(task.call_count, 1)
+
+    def test_now_wraparound(self):
+        wm = self.getInstance()
+        ticks_diff = utime.ticks_diff
+        utime.ticks_diff = MagicMock(side_effect=lambda a, b: ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000)
+        try:
+            utime.ticks = 0x3FFFFFF0
+            self.assertEqual(wm._now(), 0)
+            # ticks_ms() が桁あふれしても経過時間は増え続ける
+            utime.ticks = 0x10
+            self.assertEqual(wm._now(), 0x20)
+        finally:
+            utime.ticks_diff = ticks_diff
+
+    def test_runTaskLoop(self):
+        wm = self.getAsyncInstance()
+        calls = []
+
+        async def request():
+            calls.append("request start")
+            await uasyncio.sleep_ms(10000)
+            calls.append("request end")
+
+        def display():
+            calls.append("display")
+
+        async def error():
+            raise RuntimeError("task error")
+
+        wm.addTask(delay=0, func=request)
+        wm.addTask(delay=0, func=display)
+        wm.addTask(delay=0, func=error)
+        with self.assertRaises(RuntimeError) as cm:
+            uasyncio.run(wm.runTaskLoop())
+        self.assertEqual(str(cm.exception), "task error")
+        # コルーチンのタスクの完了を待たずに他のタスクが実行される
+        self.assertEqual(calls[0:2], ["display", "request start"])
+
+    def test_runTaskLoop_wait_until_next_task(self):
+        wm = self.getAsyncInstance()
+        launched = []
+
+        def display():
+            launched.append(utime.ticks)
+
+        def stop():
+            raise RuntimeError("stop")
+
+        wm.addTask(delay=0, func=display, interval=5)
+        wm.addTask(delay=12, func=stop)
+        with self.assertRaises(RuntimeError):
+            uasyncio.run(wm.runTaskLoop())
+        # 次のタスクの起動時刻ちょうどまで待機する
+        self.assertEqual(launched, [0, 5000, 10000])
+        self.assertEqual(utime.ticks, 12000)
+
+    def test_interruptTaskLoop(self):
+        wm = self.getAsyncInstance()
+        stopped = []
+
+        def stop():
+            stopped.append(utime.ticks)
+            raise RuntimeError("stop")
+
+        async def button():
+            await uasyncio.sleep_ms(0)
+            wm.addTask(delay=0, func=stop)
+            wm.interruptTaskLoop()
+
+        wm.addTask(delay=0, func=button)
+        with self.assertRaises(RuntimeError):
+            uasyncio.run(wm.runTaskLoop())
+        # 最大の待機時間を待たずに追加されたタスクを実行する
+        self.assertEqual(stopped, [0])
+
+    def test_startTaskLoop(self):
+        wm = self.getInstance()
+        launched = []
+
+        def display():
+            launched.append(utime.ticks)
+
+        def stop():
+            raise RuntimeError("stop")
+
+        def advance(ms):
+            utime.ticks += ms
+
+        wm.addTask(delay=0, func=display, interval=5)
+        wm.addTask(delay=12, func=stop)
+        sleep_ms = utime.sleep_ms
+        utime.sleep_ms = advance
+        try:
+            with self.assertRaises(RuntimeError):
+                wm.startTaskLoop()
+        finally:
+            utime.sleep_ms = sleep_ms
+        # uasyncioを使用しない場合も次のタスクの起動時刻まで待機する
+        self.assertEqual(launched, [0, 5000, 10000])
+        self.assertEqual(utime.ticks, 12000)
+
+    def test_startTaskLoop_sleep_count(self):
+        wm = self.getInstance()
+        sleep_ms = utime.sleep_ms
+        sleeps = []
+
+        def advance(ms):
+            sleeps.append(ms)
+            utime.ticks += ms
+
+        def stop():
+            raise RuntimeError("stop")
+
+        wm.addTask(delay=30, func=MagicMock(), interval=30)
+        wm.addTask(delay=95, func=stop)
+        utime.sleep_ms = advance
+        try:
+            with self.assertRaises(RuntimeError):
+                wm.startTaskLoop()
+        finally:
+            utime.sleep_ms = sleep_ms
+        # 次のタスクの起動時刻まで1回の呼び出しで待機する
+        self.assertEqual(sleeps, [30000, 30000, 30000, 5000])
+
+    def test_runTaskLoop_lightsleep(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getAsyncInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+
+        def lightsleep(time_ms):
+            utime.ticks += time_ms
+        wm.machine = MagicMock()
+        wm.machine.lightsleep.side_effect = lightsleep
+
+        def stop():
+            raise RuntimeError("stop")
+
+        # ディスプレイ点灯中はライトスリープしない
+        wm.addTask(delay=12, func=stop)
+        with self.assertRaises(RuntimeError):
+            uasyncio.run(wm.runTaskLoop())
+        wm.machine.lightsleep.assert_not_called()
+
+        # ディスプレイ消灯中は次のタスクの起動時刻までライトスリープする
+        wm._display_sleep = True
+        wm.addTask(delay=12, func=stop)
+        with self.assertRaises(RuntimeError):
+            uasyncio.run(wm.runTaskLoop())
+        wm.machine.lightsleep.assert_called_once_with(12000)
+        self.assertEqual(utime.ticks, 24000)
+
+    def test_canLightSleep(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getAsyncInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        wm._display_sleep = True
+
+        # machineが指定されていない
+        self.assertFalse(wm._canLightSleep())
+
+        wm.machine = MagicMock()
+        self.assertTrue(wm._canLightSleep())
+
+        # スマートメータの応答待ち
+        wm._running_coroutines = 1
+        self.assertFalse(wm._canLightSleep())
+        wm._running_coroutines = 0
+
+        # ディスプレイ点灯中
+        wm._display_sleep = False
+        self.assertFalse(wm._canLightSleep())
+        wm._display_sleep = True
+
+        # 通知を受け取る関数が登録されている(ライトスリープ中は通知が失われる)
+        wm._notification_registered = True
+        self.assertFalse(wm._canLightSleep())
+        wm._notification_registered = False
+
+        # 設定で無効
+        wm.config.config.display.light_sleep = False
+        self.assertFalse(wm._canLightSleep())
+
+    def test_getNextTaskDelay(self):
+        wm = self.getInstance()
+        self.assertIsNone(wm.getNextTaskDelay())
+        task = wm.addTask(delay=3, func=MagicMock())
+        wm.addTask(delay=10, func=MagicMock())
+        utime.ticks = 1000
+        self.assertEqual(wm.getNextTaskDelay(), 2000)
+        wm.cancelTask(task)
+        self.assertEqual(wm.getNextTaskDelay(), 9000)
+        utime.ticks = 20000
+        self.assertEqual(wm.getNextTaskDelay(), 0)
+
+    def test_cancelTask(self):
+        task1 = MagicMock()
+        task2 = MagicMock()
+        wm = self.getInstance()
+        handle1 = wm.addTask(delay=0, func=task1, interval=10)
+        handle2 = wm.addTask(delay=0, func=task2, interval=None)
+        wm.cancelTask(handle2)
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertFalse(wm.execLaunchableTask())
+        self.assertEqual(task1.call_count, 1)
+        task2.assert_not_called()
+        # 繰り返しのタスクは実行中に取り消した場合も以後実行されない
+        task1.side_effect = lambda: wm.cancelTask(handle1)
+        utime.ticks = 10000
+        self.assertTrue(wm.execLaunchableTask())
+        utime.ticks = 1000000
+        self.assertFalse(wm.execLaunchableTask())
+        self.assertEqual(task1.call_count, 2)
+
+    def test_rescheduleTask(self):
+        task1 = MagicMock()
+        task2 = MagicMock()
+        wm = self.getInstance()
+        handle1 = wm.addTask(delay=0, func=task1, interval=None)
+        wm.addTask(delay=50, func=task2, interval=None)
+        wm.rescheduleTask(handle1, 100)
+        utime.ticks = 99999
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertFalse(wm.execLaunchableTask())
+        task1.assert_not_called()
+        task2.assert_called_once()
+        utime.ticks = 100000
+        self.assertTrue(wm.execLaunchableTask())
+        task1.assert_called_once()
+
+    def test_setTaskInterval(self):
+        wm = self.getInstance()
+        launched = []
+
+        def task():
+            launched.append(utime.ticks)
+
+        handle = wm.addTask(delay=0, func=task, interval=30)
+        self.assertTrue(wm.execLaunchableTask())
+        # 待ち行列にある場合は前回の起動時刻から計算し直す
+        wm.setTaskInterval(handle, 10)
+        utime.ticks = 10000
+        self.assertTrue(wm.execLaunchableTask())
+
+        # 実行中に変更した場合は次の起動時刻から新しい間隔になる
+        def change():
+            launched.append(utime.ticks)
+            wm.setTaskInterval(handle, 60)
+        handle["f"] = change
+        utime.ticks = 20000
+        self.assertTrue(wm.execLaunchableTask())
+        utime.ticks = 79999
+        self.assertFalse(wm.execLaunchableTask())
+        utime.ticks = 80000
+        self.assertTrue(wm.execLaunchableTask())
+
+        # 前回の起動時刻からの間隔が過ぎている場合は即座に実行する
+        utime.ticks = 100000
+        wm.setTaskInterval(handle, 5)
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertEqual(launched, [0, 10000, 20000, 80000, 100000])
+
+    def test_adaptUpdateInterval(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        # update_interval: 15, adaptive_interval: 5-300, caution: 2000
+        wm._prepareTask()
+        wm.client.execGetMeasurements = MagicMock()
+
+        def intervals(*watts):
+            results = []
+            for watt in watts:
+                wm.client.execGetMeasurements.return_value = {"watt": watt, "ampere": None, "power": None}
+                wm._updateCurrentPowerConsumption()
+                results.append(wm._update_interval)
+            return results
+
+        # 比較する前回の値がない初回は変更しない
+        self.assertEqual(intervals(500), [15])
+        # 変化がなければ最長の間隔まで延ばす
+        self.assertEqual(intervals(500, 500, 500, 500, 500, 500), [30, 60, 120, 240, 300, 300])
+        self.assertEqual(wm._update_task["i"], 300000)
+        # 変化が大きい場合は最短の間隔にする
+        self.assertEqual(intervals(700, 700, 740), [5, 10, 20])
+        # 注意の設定値に近い場合は最短の間隔にする
+        self.assertEqual(intervals(1800, 1810), [5, 5])
+
+        # 消費電力量を取得できなかった場合は変更せず次の取得時に前回の値と比較する
+        self.assertEqual(intervals(None, 1810, None, 1300, 1300), [5, 5, 5, 5, 10])
+
+        # adaptive_intervalが設定されていない場合は変更しない
+        wm.config.config.wattmeter.adaptive_interval = None
+        self.assertEqual(intervals(500, 3000), [10, 10])
+
+    def test_addTask_with_key(self):
+        task1 = MagicMock()
+        task2 = MagicMock()
+        wm = self.getInstance()
+        handle1 = wm.addTask(delay=0, func=task1, interval=None, key="save")
+        handle2 = wm.addTask(delay=60, func=task2, interval=None, key="save")
+        self.assertIs(handle1, handle2)
+        utime.ticks = 59999
+        self.assertFalse(wm.execLaunchableTask())
+        utime.ticks = 60000
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertFalse(wm.execLaunchableTask())
+        task1.assert_not_called()
+        task2.assert_called_once()
+        # 実行済みのkeyは新しいタスクとして追加される
+        handle3 = wm.addTask(delay=0, func=task1, interval=None, key="save")
+        self.assertIsNot(handle3, handle1)
+        self.assertTrue(wm.execLaunchableTask())
+        task1.assert_called_once()
 
     def test_toggleSleep(self):
         wm = self.getInstance()
@@ -123,6 +497,121 @@ class TestM5Wattmeter(unittest.TestCase):
         self.assertFalse(wm.toggleSleep())
         axp.setLcdBrightness.assert_called_once_with(60)
 
+    def test_updateDisplay_sleeping(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        wm._prepared = True
+        wm.vlcd.update = MagicMock()
+        wm.beep = MagicMock()
+
+        # 消灯中は描画しない
+        wm.toggleSleep()
+        wm._state.setCurrentWatt(100)
+        wm._updateDisplay()
+        wm.vlcd.update.assert_not_called()
+
+        # 点灯したらすぐに描画する
+        wm.toggleSleep()
+        wm.vlcd.update.assert_called_once_with(wm._state)
+
+        # 消灯中も状態は確認し、悪化した場合は点灯して描画する
+        wm.vlcd.update.reset_mock()
+        wm.toggleSleep()
+        wm._state.setCurrentWatt(3000)
+        wm._updateDisplay()
+        self.assertFalse(wm._display_sleep)
+        wm.vlcd.update.assert_called_once_with(wm._state)
+        wm.beep.assert_called_once()
+
+    def test_requestDisplayUpdate(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774410  # 2021/1/1 00:00:10
+        wm = self.getInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        wm.client.execGetMeasurements = MagicMock(return_value={"watt": 100, "ampere": None, "power": None})
+        wm.client.processNotifications = MagicMock()
+        wm.vlcd.update = MagicMock()
+        wm._prepared = True
+        wm._prepareTask()
+
+        # 時刻と消費電力量の変化をまとめて1度だけ描画する
+        while wm.execLaunchableTask():
+            pass
+        wm.vlcd.update.assert_called_once_with(wm._state)
+
+        # 表示内容が変化しない場合は描画しない
+        wm.vlcd.update.reset_mock()
+        utime.ticks = 15000
+        while wm.execLaunchableTask():
+            pass
+        wm.vlcd.update.assert_not_called()
+
+        # 分が変わると描画する
+        utime.timestamp = 662774460
+        utime.ticks = 50000
+        while wm.execLaunchableTask():
+            pass
+        wm.vlcd.update.assert_called_once_with(wm._state)
+        self.assertEqual(wm._state.getTime("{min:02d}"), "01")
+
+    def test_requestDisplayUpdate_async(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getAsyncInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        rendered = []
+
+        def update(state):
+            rendered.append((utime.ticks, state.getCurrentWatt()))
+            if state.getCurrentWatt() == 200:
+                raise RuntimeError("stop")
+        wm.vlcd.update = update
+        wm._prepared = True
+        wm._state.addObserver(wm._requestDisplayUpdate)
+
+        async def request():
+            await uasyncio.sleep_ms(3000)
+            wm._state.setCurrentWatt(200)
+
+        wm.addTask(delay=0, func=request)
+        wm.addTask(delay=60, func=MagicMock())
+        with self.assertRaises(RuntimeError):
+            uasyncio.run(wm.runTaskLoop())
+        # 取得した値は次のタスクの起動時刻を待たずに描画される
+        self.assertEqual(rendered, [(3000, 200)])
+
+    def test_scheduledWakeUp_render(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        wm = self.getInstance()
+        wm.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        wm.config.load()
+        wm.vlcd.update = MagicMock()
+
+        # 準備が完了していない場合は描画しない
+        wm.scheduledSleep()
+        wm.scheduledWakeUp()
+        wm.vlcd.update.assert_not_called()
+
+        wm._prepared = True
+        wm.scheduledSleep()
+        wm.scheduledWakeUp()
+        wm.vlcd.update.assert_called_once_with(wm._state)
+
     def test_toggleFlip(self):
         uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
         uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
@@ -132,11 +621,20 @@ class TestM5Wattmeter(unittest.TestCase):
         wm.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
         wm.config.load()
 
+        wm.config.saveCacheIfChanged = MagicMock()
         self.assertTrue(wm.config.cache.display_flip)
         wm.toggleFlip()
         self.assertFalse(wm.config.cache.display_flip)
+        utime.ticks = 10000
         wm.toggleFlip()
         self.assertTrue(wm.config.cache.display_flip)
+        # キャッシュの書き込みは最後の操作から遅延して1回だけ行う
+        utime.ticks = 10000 + wm.CACHE_SYNC_DELAY * 1000 - 1
+        self.assertFalse(wm.execLaunchableTask())
+        utime.ticks = 10000 + wm.CACHE_SYNC_DELAY * 1000
+        self.assertTrue(wm.execLaunchableTask())
+        self.assertFalse(wm.execLaunchableTask())
+        self.assertEqual(wm.config.saveCacheIfChanged.call_count, 1)
 
     def test_addScheduledSleepTask(self):
         uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
@@ -150,13 +648,13 @@ class TestM5Wattmeter(unittest.TestCase):
 
         utime.timestamp = 734050799  # 2023/4/5 22:59:59
         wm._addScheduledSleepTask()
-        self.assertEqual(wm._tasks[-1]["t"], 734050800)  # 2023/4/5 23:00:00
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734050800)  # 2023/4/5 23:00:00
         utime.timestamp = 734050800  # 2023/4/5 23:00:00
-        wm._tasks[-1]["f"]()
-        self.assertEqual(wm._tasks[-1]["t"], 734076000)  # 2023/4/6 06:00:00
+        wm._task_keys["scheduledSleep"]["f"]()
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734076000)  # 2023/4/6 06:00:00
         utime.timestamp = 734076000  # 2023/4/6 06:00:00
-        wm._tasks[-1]["f"]()
-        self.assertEqual(wm._tasks[-1]["t"], 734137200)  # 2023/4/6 23:00:00
+        wm._task_keys["scheduledSleep"]["f"]()
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734137200)  # 2023/4/6 23:00:00
 
     def test_addScheduledSleepTask_same_day(self):
         uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
@@ -179,13 +677,13 @@ class TestM5Wattmeter(unittest.TestCase):
 
         utime.timestamp = 734011199  # 2023/4/5 11:59:59
         wm._addScheduledSleepTask()
-        self.assertEqual(wm._tasks[-1]["t"], 734011200)  # 2023/4/5 12:00:00
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734011200)  # 2023/4/5 12:00:00
         utime.timestamp = 734011200  # 2023/4/5 12:00:00
-        wm._tasks[-1]["f"]()
-        self.assertEqual(wm._tasks[-1]["t"], 734011260)  # 2023/4/5 12:01:00
+        wm._task_keys["scheduledSleep"]["f"]()
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734011260)  # 2023/4/5 12:01:00
         utime.timestamp = 734011260  # 2023/4/5 12:01:00
-        wm._tasks[-1]["f"]()
-        self.assertEqual(wm._tasks[-1]["t"], 734097600)  # 2023/4/6 12:00:00
+        wm._task_keys["scheduledSleep"]["f"]()
+        self.assertEqual(utime.timestamp + wm._task_keys["scheduledSleep"]["t"] // 1000, 734097600)  # 2023/4/6 12:00:00
 
     def test_beep(self):
         uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
@@ -209,6 +707,122 @@ class TestM5Wattmeter(unittest.TestCase):
         speaker.tone.assert_has_calls([call(100, 200), call(400, 500)])
         utime.sleep_ms.assert_called_once_with(300)
 
+    def test_receiveNotification(self):
+        instance = self.getInstance()
+        record = {"year": 2021, "mon": 1, "mday": 2, "hour": 0, "min": 0, "sec": 0, "power": 466.0}
+        instance._receiveNotification(0xE7, 1000)
+        self.assertIsNone(instance._state.getLast30MinutesPowerConsumption())
+        instance._receiveNotification(0xEA, None)
+        self.assertIsNone(instance._state.getLast30MinutesPowerConsumption())
+        instance._receiveNotification(0xEA, record)
+        self.assertEqual(instance._state.getLast30MinutesPowerConsumption(), record)
+
+    def test_receiveNotification_demand_anchor(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774400  # 2021/1/1 00:00:00
+        instance = self.getInstance()
+        instance.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        instance.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        instance.config.load()
+        record = {"year": 2021, "mon": 1, "mday": 1, "hour": 0, "min": 0, "sec": 0, "power": 466.0}
+        instance._state.setCurrentWatt(1000, 662774400 + 60)
+        instance._receiveNotification(0xEA, record)
+        # 時限の開始時点の積算電力量を起点に使用電力量を補正する
+        instance._state.setIntegralPowerConsumption(466.5, 662774400 + 900)
+        # (0.5kWh + 1000W * 900秒) / 1800秒
+        self.assertEqual(instance._state.getDemandForecast(), 1500)
+
+    def test_updateCurrentPowerConsumption_demand(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774400  # 2021/1/1 00:00:00
+        instance = self.getInstance()
+        instance.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        instance.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        instance.config.load()
+        record = {"year": 2021, "mon": 1, "mday": 1, "hour": 0, "min": 0, "sec": 0, "power": 466.0}
+        instance._receiveNotification(0xEA, record)
+
+        # 瞬時電力は1000Wのままだが積算電力量は0.75kWh増えている
+        instance.client.execGetMeasurements = MagicMock(return_value={"watt": 1000, "ampere": None, "power": 466.75})
+        utime.timestamp = 662774400 + 900
+        instance._updateCurrentPowerConsumption()
+        # 瞬時電力の積算(1000W * 1800秒 / 1800秒)ではなく積算電力量に従う
+        # (0.75kWh + 1000W * 900秒) / 1800秒
+        self.assertEqual(instance._state.getDemandForecast(), 2000)
+        self.assertEqual(instance._state.getCurrentWatt(), 1000)
+
+        # 積算電力量が取得できない場合は瞬時電力を積算する
+        instance.client.execGetMeasurements.return_value = {"watt": 1000, "ampere": None, "power": None}
+        utime.timestamp = 662774400 + 1200
+        instance._updateCurrentPowerConsumption()
+        # (0.75kWh + 1000W * 300秒 + 1000W * 600秒) / 1800秒
+        self.assertEqual(instance._state.getDemandForecast(), 2000)
+
+    def test_updateCurrentPowerConsumption_demand_polls_only(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774400 + 300  # 2021/1/1 00:05:00
+        instance = self.getInstance(array)
+        instance.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        instance.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        instance.config.load()
+        instance.client.execGetMeasurements = MagicMock(return_value={"watt": 1000, "ampere": None, "power": 466.0})
+        instance._updateCurrentPowerConsumption()
+
+        # 定時積算電力量の通知がなくても定期取得の積算電力量に従う
+        instance.client.execGetMeasurements.return_value = {"watt": 1000, "ampere": None, "power": 466.75}
+        utime.timestamp = 662774400 + 900
+        instance._updateCurrentPowerConsumption()
+        # 起点は 466.0kWh - 1000W * 300秒
+        # (0.75kWh + 1000W * 300秒 + 1000W * 900秒) / 1800秒
+        self.assertEqual(instance._state.getDemandForecast(), round((2700000 + 300000 + 900000) / 1800))
+
+    def test_updateCurrentPowerConsumption_watt_unavailable(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774400
+        instance = self.getInstance(array)
+        instance.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        instance.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        instance.config.load()
+        instance._prepareTask()
+        instance.client.execGetMeasurements = MagicMock(return_value={"watt": 500, "ampere": None, "power": 466.0})
+        instance._updateCurrentPowerConsumption()
+        interval = instance._update_interval
+
+        # 瞬時電力が取得できない場合はエラーとして扱い表示と統計値を更新しない
+        instance.client.execGetMeasurements.return_value = {"watt": None, "ampere": None, "power": 466.5}
+        utime.timestamp = 662774400 + 30
+        instance._updateCurrentPowerConsumption()
+        self.assertEqual(instance._state.getCurrentWatt(), 500)
+        self.assertEqual(instance._state._continuous_error_count, 1)
+        self.assertEqual(instance._update_interval, interval)
+        self.assertEqual(instance._state.getDemandForecast(), 500)
+
+    def test_updateCurrentPowerConsumptionAsync(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+        uos.ADD_ENTRIES.append(("cache_full.json", 0x8000, 0))
+
+        utime.timestamp = 662774400
+        instance = self.getInstance()
+        instance.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        instance.config.CACHE_FILE_PATH = self.getAssetFilePath("cache_full.json")
+        instance.config.load()
+        instance._state.setIntegralPowerConsumption = MagicMock()
+
+        async def measurements():
+            return {"watt": 321, "ampere": (10, 20), "power": 466.5}
+        instance.client.execGetMeasurementsAsync = measurements
+        uasyncio.run(instance._updateCurrentPowerConsumptionAsync())
+        self.assertEqual(instance._state.getCurrentWatt(), 321)
+        instance._state.setIntegralPowerConsumption.assert_called_once_with(466.5, 662774400)
+
 class TestWMState(unittest.TestCase):
     def getAssetFilePath(self, file_name):
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", file_name)
@@ -244,6 +858,150 @@ class TestWMState(unittest.TestCase):
         state.setCurrentWatt(123)
         self.assertEqual(state.getCurrentWatt(), 123)
 
+    def test_getWattSeries(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging),
+            array=array
+        )
+        state.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        state.config.load()
+
+        for time in range(0, 3600, 30):
+            state.setCurrentWatt(1000 if time < 1800 else 2000, time)
+        state.setCurrentWatt(500, 3600)
+
+        raw = state.getWattSeries()
+        self.assertEqual(raw.getLength(), 120)
+        self.assertEqual(raw.getValue(0), 500)
+        self.assertEqual(raw.getValue(1), 2000)
+        self.assertEqual(raw.getValue(119), 1000)
+        self.assertEqual(state.getWattSeries(60).getLength(), 60)
+        self.assertEqual(state.getWattSeries(600).getLength(), 6)
+        self.assertEqual(state.getWattSeries(3600).getLength(), 1)
+        self.assertEqual(state.getWattSeries(3600).getValue(0), 1500)
+        self.assertIsNone(state.getWattSeries(1))
+
+        # 時刻を指定しない場合は時系列に記録しない
+        state.setCurrentWatt(100)
+        self.assertEqual(raw.getValue(0), 500)
+
+    def test_getWattSeries_without_array(self):
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        )
+        self.assertIsNone(state.getWattSeries())
+        self.assertIsNone(state.getWattStats(300))
+
+    def test_getWattStats(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging),
+            array=array
+        )
+        state.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        state.config.load()
+
+        for time in range(0, 3600, 30):
+            state.setCurrentWatt(1000 if time < 3300 else 2000, time)
+
+        stats = state.getWattStats(300)
+        self.assertEqual(stats.getCount(), 10)
+        self.assertEqual(stats.getMin(), 2000)
+        self.assertEqual(stats.getMean(), 2000)
+        stats = state.getWattStats(3600)
+        self.assertEqual(stats.getCount(), 120)
+        self.assertEqual(stats.getMin(), 1000)
+        self.assertEqual(stats.getMax(), 2000)
+        self.assertEqual(stats.getMean(), 1083)
+        self.assertEqual(state.getWattStats(86400).getCount(), 120)
+        self.assertIsNone(state.getWattStats(1))
+
+    def test_isDemandExceeded(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        )
+        state.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        state.config.load()
+        # caution: 2000, warning: 2500, demand: 1800
+
+        state.setCurrentWatt(1500, 0)
+        self.assertEqual(state.getDemandForecast(), 1500)
+        self.assertFalse(state.isDemandExceeded())
+        self.assertTrue(state.isStatusNormal())
+
+        # 瞬時電力は注意未満でも予測値が設定値を超えると注意
+        state.setCurrentWatt(1900, 900)
+        self.assertEqual(state.getDemandForecast(), 1800)
+        self.assertTrue(state.isDemandExceeded())
+        self.assertTrue(state.isStatusCaution())
+        self.assertTrue(state.isStatusEscalated())
+
+        # 次の時限
+        state.setCurrentWatt(1000, 1800)
+        self.assertFalse(state.isDemandExceeded())
+        self.assertTrue(state.isStatusNormal())
+
+        state.config.config.wattmeter.demand = None
+        state.setCurrentWatt(1900, 1800)
+        self.assertFalse(state.isDemandExceeded())
+
+    def test_getVersion(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        )
+        state.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        state.config.load()
+
+        version = state.getVersion()
+        state.setTime((2020, 1, 2, 3, 4, 5, 3, 2))
+        self.assertEqual(state.getVersion(), version + 1)
+        # 秒のみの変化は表示内容に影響しない
+        state.setTime((2020, 1, 2, 3, 4, 50, 3, 2))
+        self.assertEqual(state.getVersion(), version + 1)
+        state.setTime((2020, 1, 2, 3, 5, 0, 3, 2))
+        self.assertEqual(state.getVersion(), version + 2)
+
+        state.setCurrentWatt(100)
+        self.assertEqual(state.getVersion(), version + 3)
+        state.setCurrentWatt(100)
+        self.assertEqual(state.getVersion(), version + 3)
+        state.setCurrentWatt(101)
+        self.assertEqual(state.getVersion(), version + 4)
+
+    def test_addObserver(self):
+        uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
+
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        )
+        state.config.CONFIG_FILE_PATH = self.getAssetFilePath("config_full.json")
+        state.config.load()
+        observer = MagicMock()
+        state.addObserver(observer)
+
+        state.setCurrentWatt(100)
+        observer.assert_called_once_with(state)
+        state.setCurrentWatt(100)
+        state.setTime((2020, 1, 2, 3, 4, 5, 3, 2))
+        state.setTime((2020, 1, 2, 3, 4, 6, 3, 2))
+        self.assertEqual(observer.call_count, 2)
+
+    def test_getLast30MinutesPowerConsumption(self):
+        state = meter.WMState(
+            config=wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        )
+        self.assertIsNone(state.getLast30MinutesPowerConsumption())
+        record = {"year": 2021, "mon": 1, "mday": 2, "hour": 0, "min": 30, "sec": 0, "power": 123.4}
+        state.setLast30MinutesPowerConsumption(record)
+        self.assertEqual(state.getLast30MinutesPowerConsumption(), record)
+
     def test_isStatusNormal_Caution_Warning(self):
         uos.ADD_ENTRIES.append(("config_full.json", 0x8000, 0))
         uos.ADD_ENTRIES.append(("config_min.json", 0x8000, 0))
@@ -399,3 +1157,219 @@ class TestWMState(unittest.TestCase):
         state.setCurrentWatt(2500)
         self.assertTrue(state.isStatusEscalated())
         self.assertFalse(state.isStatusEscalated())
+
+
+class TestTimeSeries(unittest.TestCase):
+    def test_add_raw(self):
+        series = meter.TimeSeries(array=array, size=3)
+        self.assertEqual(series.getLength(), 0)
+        with self.assertRaises(IndexError):
+            series.getValue(0)
+
+        series.add(1)
+        series.add(2)
+        self.assertEqual(series.getLength(), 2)
+        self.assertEqual(series.getValue(0), 2)
+        self.assertEqual(series.getValue(1), 1)
+
+        # 古い値から上書きされる
+        series.add(3)
+        series.add(4)
+        self.assertEqual(series.getLength(), 3)
+        self.assertEqual([series.getValue(i) for i in range(3)], [4, 3, 2])
+        with self.assertRaises(IndexError):
+            series.getValue(3)
+
+    def test_add_clamp(self):
+        series = meter.TimeSeries(array=array, size=2)
+        series.add(40000)
+        series.add(-40000)
+        self.assertEqual(series.getValue(1), meter.TimeSeries.MAX_VALUE)
+        self.assertEqual(series.getValue(0), meter.TimeSeries.MIN_VALUE)
+
+    def test_add_period(self):
+        series = meter.TimeSeries(array=array, size=4, period=60)
+        series.add(1000, 0)
+        series.add(1001, 30)
+        # 集計中の期間は含まない
+        self.assertEqual(series.getLength(), 0)
+
+        series.add(500, 60)
+        self.assertEqual(series.getLength(), 1)
+        self.assertEqual(series.getValue(0), 1001)  # 1000.5を四捨五入
+
+        # 値のない期間はMISSING
+        series.add(700, 200)
+        series.add(0, 240)
+        self.assertEqual(series.getLength(), 4)
+        self.assertEqual(
+            [series.getValue(i) for i in range(4)],
+            [700, meter.TimeSeries.MISSING, 500, 1001]
+        )
+
+    def test_add_period_long_gap(self):
+        series = meter.TimeSeries(array=array, size=3, period=60)
+        series.add(1000, 0)
+        series.add(2000, 60 * 1000)
+        series.add(0, 60 * 1001)
+        self.assertEqual(series.getLength(), 3)
+        self.assertEqual(
+            [series.getValue(i) for i in range(3)],
+            [2000, meter.TimeSeries.MISSING, meter.TimeSeries.MISSING]
+        )
+
+
+class TestRingQueue(unittest.TestCase):
+    def test_push_pop(self):
+        queue = meter.RingQueue(array=array, size=3)
+        self.assertTrue(queue.isEmpty())
+        queue.pushBack(1)
+        queue.pushBack(2)
+        queue.pushBack(3)
+        with self.assertRaises(IndexError):
+            queue.pushBack(4)
+        self.assertEqual(queue.getFront(), 1)
+        self.assertEqual(queue.getBack(), 3)
+        self.assertEqual(queue.popFront(), 1)
+        queue.pushBack(4)
+        self.assertEqual(queue.popBack(), 4)
+        self.assertEqual(queue.popBack(), 3)
+        self.assertEqual(queue.popFront(), 2)
+        self.assertTrue(queue.isEmpty())
+
+
+class TestWindowStats(unittest.TestCase):
+    def test_empty(self):
+        stats = meter.WindowStats(array=array, window=60, buckets=6, max_value=1000)
+        self.assertEqual(stats.getCount(), 0)
+        self.assertIsNone(stats.getMin())
+        self.assertIsNone(stats.getMax())
+        self.assertIsNone(stats.getMean())
+        self.assertIsNone(stats.getEWMA())
+        self.assertIsNone(stats.getQuantile(0.95))
+
+    def test_sliding_window(self):
+        stats = meter.WindowStats(array=array, window=60, buckets=6, max_value=1000)
+        stats.add(500, 0)
+        stats.add(100, 5)
+        stats.add(300, 10)
+        self.assertEqual(stats.getCount(), 3)
+        self.assertEqual(stats.getMin(), 100)
+        self.assertEqual(stats.getMax(), 500)
+        self.assertEqual(stats.getMean(), 300)
+
+        # 0-9秒のバケットが期間外になる
+        stats.add(200, 60)
+        self.assertEqual(stats.getCount(), 2)
+        self.assertEqual(stats.getMin(), 200)
+        self.assertEqual(stats.getMax(), 300)
+        self.assertEqual(stats.getMean(), 250)
+
+        # 期間全体が期間外になる
+        stats.add(700, 1000)
+        self.assertEqual(stats.getCount(), 1)
+        self.assertEqual(stats.getMin(), 700)
+        self.assertEqual(stats.getMax(), 700)
+
+    def test_compare_with_samples(self):
+        random.seed(1)
+        window = 300
+        width = 10
+        stats = meter.WindowStats(array=array, window=window, buckets=window // width, max_value=10000)
+        samples = []
+        time = 0
+        for _ in range(2000):
+            time += random.choice((1, 5, 10, 30, 120))
+            value = random.randint(-500, 5000)
+            stats.add(value, time)
+            samples.append((time, value))
+            oldest = (time // width - window // width) * width + width
+            values = [v for t, v in samples if t >= oldest]
+            self.assertEqual(stats.getCount(), len(values))
+            self.assertEqual(stats.getMin(), min(values))
+            self.assertEqual(stats.getMax(), max(values))
+            self.assertEqual(stats.getMean(), (sum(values) + len(values) // 2) // len(values))
+
+    def test_ewma(self):
+        stats = meter.WindowStats(array=array, window=60, buckets=6, max_value=1000)
+        stats.add(100, 0)
+        self.assertEqual(stats.getEWMA(), 100)
+        stats.add(700, 60)
+        self.assertEqual(stats.getEWMA(), 400)
+        # 経過時間が0の値は反映されない
+        stats.add(1000, 60)
+        self.assertEqual(stats.getEWMA(), 400)
+
+    def test_quantile(self):
+        stats = meter.WindowStats(array=array, window=3600, buckets=60, max_value=10000)
+        for time in range(0, 1000):
+            stats.add(time * 10, time)
+        # 0-9990Wの一様分布
+        self.assertAlmostEqual(stats.getQuantile(0.5), 5000, delta=500)
+        self.assertAlmostEqual(stats.getQuantile(0.95), 9500, delta=500)
+
+        # 古い値の重みは減衰する
+        for time in range(1000, 1000 + 3600 * 10, 30):
+            stats.add(1000, time)
+        self.assertAlmostEqual(stats.getQuantile(0.95), 1000, delta=200)
+
+
+class TestDemandForecaster(unittest.TestCase):
+    def test_setEnergy_without_boundary_record(self):
+        forecaster = meter.DemandForecaster()
+        forecaster.add(1000, 1800 + 300)
+        # 時限内の最初の積算電力量から積算済みの使用電力量を差し引いて起点とする
+        forecaster.setEnergy(100.0, 1800 + 300)
+        self.assertEqual(forecaster.getForecast(), 1000)
+        forecaster.add(1000, 1800 + 900)
+        forecaster.setEnergy(100.75, 1800 + 900)
+        # (0.75kWh + 1000W * 300秒 + 1000W * 900秒) / 1800秒
+        self.assertEqual(forecaster.getForecast(), round((2700000 + 300000 + 900000) / 1800))
+
+        # 時限の開始時点の積算電力量を受け取った場合はその値を起点とする
+        forecaster.setEnergy(99.9, 1800)
+        forecaster.setEnergy(100.75, 1800 + 900)
+        self.assertEqual(forecaster.getForecast(), round((3060000 + 900000) / 1800))
+
+    def test_add(self):
+        forecaster = meter.DemandForecaster()
+        self.assertIsNone(forecaster.getForecast())
+
+        # 最初の計測値は時限の開始から続いていたとみなす
+        forecaster.add(1000, 1800 + 600)
+        self.assertEqual(forecaster.getForecast(), 1000)
+
+        # 台形近似で積算して残りは最新の瞬時電力が続くとする
+        forecaster.add(3000, 1800 + 1200)
+        # (1000 * 600 + 2000 * 600 + 3000 * 600) / 1800
+        self.assertEqual(forecaster.getForecast(), 2000)
+
+    def test_add_next_window(self):
+        forecaster = meter.DemandForecaster()
+        forecaster.add(1000, 1500)
+        forecaster.add(3000, 2100)
+        # 時限の開始から (1000 + 3000) / 2 で積算する
+        self.assertEqual(forecaster.getForecast(), round((2000 * 300 + 3000 * 1500) / 1800))
+
+        # 時刻が戻った場合は積算しない
+        forecaster.add(0, 2000)
+        self.assertEqual(forecaster.getForecast(), round(2000 * 300 / 1800))
+
+    def test_setEnergy(self):
+        forecaster = meter.DemandForecaster()
+        forecaster.add(500, 1800 + 60)
+        forecaster.setEnergy(100.0, 1800)
+        forecaster.add(500, 1800 + 600)
+        # 計測値からの使用電力量で補正する 0.25kWh = 900000Ws
+        forecaster.setEnergy(100.25, 1800 + 900)
+        self.assertEqual(forecaster.getForecast(), round((900000 + 500 * 900) / 1800))
+
+        # 起点より小さい値は無視する
+        forecaster.setEnergy(99.0, 1800 + 1000)
+        self.assertEqual(forecaster.getForecast(), round((900000 + 500 * 900) / 1800))
+
+        # 次の時限に進むと起点はリセットされる
+        forecaster.setEnergy(101.0, 3600 + 60)
+        self.assertAlmostEqual(forecaster._anchor, 101.0 - 500 * 60 / 3600000)
+        forecaster.add(1000, 3600 + 120)
+        self.assertEqual(forecaster.getForecast(), round((750 * 120 + 1000 * 1680) / 1800))
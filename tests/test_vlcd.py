@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, call
 from mock import lcd as lcd_mock, axp, wmstate
+from mock.framebuffer import FrameBufferLCD
 import vlcd as virtual_lcd
 
 class TestVLCD(unittest.TestCase):
@@ -45,6 +46,122 @@ class TestVLCD(unittest.TestCase):
         vlcd._pixel(100, 50, lcd.BLUE)
         lcd.pixel.assert_called_once_with(86, 100, color=lcd.BLUE)
 
+    def test_line(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.line = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._line(100, 50, 110, 50, lcd.BLUE)
+        lcd.line.assert_called_once_with(50, 141, 50, 131, color=lcd.BLUE)
+
+    def test_line_flip(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.line = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd.setFlip(True)
+        vlcd._line(100, 50, 110, 50, lcd.BLUE)
+        lcd.line.assert_called_once_with(86, 100, 86, 110, color=lcd.BLUE)
+
+    def test_drawBitmap(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        bitmap = 0x1AB07FA2303E2F687528BD3C0E431FF8FFFE1FF810081FF810081FF81008
+
+        for flip in (False, True):
+            vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+            vlcd.setFlip(flip)
+
+            # 1ビットずつピクセルを描画した場合と同じピクセルを塗る
+            lcd.pixel = MagicMock()
+            mask = 1 << 16*15
+            for py in range(15):
+                for px in range(16):
+                    if bitmap & mask > 0:
+                        vlcd._pixel(203+px, 14+py, color=lcd.RED)
+                    mask >>= 1
+            expected = set(c.args for c in lcd.pixel.call_args_list)
+
+            lcd.line = MagicMock()
+            vlcd._drawBitmap(203, 14, bitmap, 16, 15, lcd.RED)
+            actual = set()
+            for c in lcd.line.call_args_list:
+                x1, y1, x2, y2 = c.args
+                self.assertEqual(x1, x2)
+                self.assertEqual(c.kwargs, {"color": lcd.RED})
+                for y in range(min(y1, y2), max(y1, y2) + 1):
+                    actual.add((x1, y))
+            self.assertEqual(actual, expected)
+            self.assertLess(lcd.line.call_count, len(expected))
+
+    def test_drawPrimitives(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        V = virtual_lcd.VirtualLCD
+
+        for flip in (False, True):
+            vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+            vlcd.setFlip(flip)
+
+            # 図形ごとに描画した場合と同じ引数で描画する
+            lcd.pixel = MagicMock()
+            lcd.line = MagicMock()
+            lcd.rect = MagicMock()
+            lcd.triangle = MagicMock()
+            vlcd._pixel(100, 50, lcd.BLUE)
+            vlcd._line(10, 20, 30, 40, lcd.RED)
+            vlcd._rect(10, 20, 30, 40, lcd.RED, lcd.BLUE)
+            vlcd._rect(5, 6, 7, 8)
+            vlcd._triangle(1, 2, 3, 4, 5, 6, lcd.RED, lcd.BLUE)
+            expected = (
+                lcd.pixel.call_args_list,
+                lcd.line.call_args_list,
+                lcd.rect.call_args_list,
+                lcd.triangle.call_args_list,
+            )
+
+            lcd.pixel = MagicMock()
+            lcd.line = MagicMock()
+            lcd.rect = MagicMock()
+            lcd.triangle = MagicMock()
+            vlcd.drawPrimitives([
+                (V.PRIMITIVE_PIXEL, 100, 50, lcd.BLUE),
+                (V.PRIMITIVE_LINE, 10, 20, 30, 40, lcd.RED),
+                (V.PRIMITIVE_RECT, 10, 20, 30, 40, lcd.RED, lcd.BLUE),
+                (V.PRIMITIVE_RECT, 5, 6, 7, 8, -1, -1),
+                (V.PRIMITIVE_TRIANGLE, 1, 2, 3, 4, 5, 6, lcd.RED, lcd.BLUE),
+            ])
+            actual = (
+                lcd.pixel.call_args_list,
+                lcd.line.call_args_list,
+                lcd.rect.call_args_list,
+                lcd.triangle.call_args_list,
+            )
+            self.assertEqual(actual, expected)
+
+    def test_drawPrimitives_unknown(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        with self.assertRaises(ValueError):
+            vlcd.drawPrimitives([(99, 0, 0, lcd.RED)])
+
+    def test_compileBitmap_cache(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        # 最下位ビットは使用しない
+        spans = vlcd._compileBitmap(0b0110_1111_0001_1, 4, 3)
+        self.assertEqual(spans, ((1, 0, 2), (0, 1, 4), (3, 2, 1)))
+        self.assertIs(vlcd._compileBitmap(0b0110_1111_0001_1, 4, 3), spans)
+        # 向きを変えても同じ区間を使う
+        vlcd.setFlip(True)
+        self.assertIs(vlcd._compileBitmap(0b0110_1111_0001_1, 4, 3), spans)
+
     def test_rect(self):
         lcd = lcd_mock
         lcd.screensize = MagicMock(return_value=(136, 241))
@@ -184,6 +301,18 @@ class TestVLCD(unittest.TestCase):
         self.assertEqual(vlcd._createColorArgs(), {})
         self.assertEqual(vlcd._createColorArgs(lcd.BLACK), {"color": lcd.BLACK})
         self.assertEqual(vlcd._createColorArgs(lcd.BLACK, lcd.RED), {"color": lcd.BLACK, "fillcolor": lcd.RED})
+        self.assertEqual(vlcd._createColorArgs(-1, lcd.RED), {"fillcolor": lcd.RED})
+
+    def test_createColorArgs_cache(self):
+        lcd = lcd_mock
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        # 同じ色の組み合わせでは同じdictを使う
+        kwargs = vlcd._createColorArgs(lcd.BLACK, lcd.RED)
+        self.assertIs(vlcd._createColorArgs(lcd.BLACK, lcd.RED), kwargs)
+        self.assertIsNot(vlcd._createColorArgs(lcd.BLACK), kwargs)
+        self.assertIsNot(vlcd._createColorArgs(lcd.RED, lcd.BLACK), kwargs)
+        self.assertIs(vlcd._createColorArgs(), vlcd._createColorArgs(-1, -1))
 
     def test_setFlip(self):
         lcd = lcd_mock
@@ -542,3 +671,432 @@ class TestVLCD(unittest.TestCase):
         vlcd.update(wmstate)
 
         vlcd._faceHakone.assert_called_once()
+
+    def test_update_unchanged(self):
+        lcd = lcd_mock
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._faceBasicDark = MagicMock()
+        vlcd.setFace(vlcd.FACE_BASIC_DARK)
+        self.assertTrue(vlcd.update(wmstate))
+        # 表示内容が変わっていない場合は描画しない
+        self.assertFalse(vlcd.update(wmstate))
+        vlcd._faceBasicDark.assert_called_once()
+
+        wmstate.version += 1
+        self.assertTrue(vlcd.update(wmstate))
+        self.assertEqual(vlcd._faceBasicDark.call_count, 2)
+
+        # 向きの変更や他の画面を表示した後は描画する
+        vlcd.setFlip(True)
+        self.assertTrue(vlcd.update(wmstate))
+        vlcd.showProgress(0.5)
+        self.assertTrue(vlcd.update(wmstate))
+        vlcd.showError("error")
+        self.assertTrue(vlcd.update(wmstate))
+        self.assertEqual(vlcd._faceBasicDark.call_count, 5)
+
+
+    def test_render(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.clear = MagicMock()
+        lcd.sprite_show = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._drawItem = MagicMock()
+        vlcd._rect = MagicMock()
+        V = virtual_lcd.VirtualLCD
+        items = [
+            (10, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+            (50, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+            (60, 15, 30, 10, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+        ]
+
+        # 初回は画面全体を描画する
+        self.assertTrue(vlcd._render(list(items)))
+        lcd.clear.assert_called_once()
+        self.assertEqual(vlcd._drawItem.call_args_list, [call(item) for item in items])
+        lcd.sprite_show.assert_called_once()
+
+        # 変化が無い場合は描画しない
+        lcd.clear.reset_mock()
+        vlcd._drawItem.reset_mock()
+        lcd.sprite_show.reset_mock()
+        self.assertFalse(vlcd._render(list(items)))
+        vlcd._drawItem.assert_not_called()
+        lcd.sprite_show.assert_not_called()
+
+        # 変化した表示項目の領域だけ消去して重なる表示項目を描画する
+        changed = list(items)
+        changed[1] = (50, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.BLUE))
+        self.assertTrue(vlcd._render(changed))
+        lcd.clear.assert_not_called()
+        vlcd._rect.assert_called_once_with(49, 9, 22, 12, vlcd._bg, vlcd._bg)
+        self.assertEqual(vlcd._drawItem.call_args_list, [call(changed[1]), call(changed[2])])
+        lcd.sprite_show.assert_called_once()
+
+        # 位置が変わった場合は前後の両方の領域を消去する
+        vlcd._rect.reset_mock()
+        vlcd._drawItem.reset_mock()
+        moved = list(changed)
+        moved[0] = (0, 0, 5, 5, V.ITEM_ROUNDRECT, (5, lcd.RED))
+        self.assertTrue(vlcd._render(moved))
+        self.assertEqual(vlcd._rect.call_args_list, [
+            call(9, 9, 22, 12, vlcd._bg, vlcd._bg),
+            call(0, 0, 6, 6, vlcd._bg, vlcd._bg),
+        ])
+        self.assertEqual(vlcd._drawItem.call_args_list, [call(moved[0])])
+
+    def test_render_full(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.clear = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._drawItem = MagicMock()
+        V = virtual_lcd.VirtualLCD
+        items = [(10, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED))]
+        vlcd._render(list(items))
+
+        # 背景色が変わった場合
+        lcd.clear.reset_mock()
+        vlcd.setColor(lcd.WHITE, lcd.RED)
+        self.assertTrue(vlcd._render(list(items)))
+        lcd.clear.assert_called_once()
+
+        # 表示項目の数が変わった場合
+        lcd.clear.reset_mock()
+        self.assertTrue(vlcd._render(items + [(50, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED))]))
+        lcd.clear.assert_called_once()
+
+        # 他の画面を表示した場合
+        lcd.clear.reset_mock()
+        vlcd.invalidate()
+        self.assertTrue(vlcd._render(items + [(50, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED))]))
+        lcd.clear.assert_called_once()
+
+    def test_recordLayer(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        V = virtual_lcd.VirtualLCD
+        items = [
+            (200, 8, 38, 25, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+            (203, 14, 16, 15, V.ITEM_BITMAP, (0x08C00C8008841FFE1080608000827FFF00001FFC1008100810081FF81008, lcd.RED)),
+        ]
+
+        for flip in (False, True):
+            vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+            vlcd.setFlip(flip)
+            lcd.roundrect = MagicMock()
+            lcd.line = MagicMock()
+            for item in items:
+                vlcd._drawItem(item)
+            expected = (lcd.roundrect.call_args_list, lcd.line.call_args_list)
+
+            # 記録中は描画せず、再生すると直接描画した場合と同じになる
+            lcd.roundrect = MagicMock()
+            lcd.line = MagicMock()
+            layer = vlcd._recordLayer(items)
+            self.assertIs(vlcd._lcd, lcd)
+            lcd.roundrect.assert_not_called()
+            lcd.line.assert_not_called()
+            self.assertEqual([entry[0:4] for entry in layer], [(200, 8, 238, 33), (203, 14, 219, 29)])
+            for entry in layer:
+                vlcd._replay(entry[4])
+            self.assertEqual((lcd.roundrect.call_args_list, lcd.line.call_args_list), expected)
+
+    def test_render_static(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.clear = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._drawItem = MagicMock()
+        vlcd._rect = MagicMock()
+        V = virtual_lcd.VirtualLCD
+        static_items = [
+            (0, 0, 20, 20, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+            (100, 0, 20, 20, V.ITEM_ROUNDRECT, (5, lcd.RED)),
+        ]
+        vlcd._recordLayer = MagicMock(return_value=[
+            (0, 0, 20, 20, ["layer0"]),
+            (100, 0, 120, 20, ["layer1"]),
+        ])
+        vlcd._replay = MagicMock()
+        item = (10, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.RED))
+
+        # 初回は静的な表示項目を記録して全体を描画する
+        vlcd._render([item], list(static_items))
+        vlcd._recordLayer.assert_called_once_with(static_items)
+        lcd.clear.assert_called_once()
+        self.assertEqual(vlcd._replay.call_args_list, [call(["layer0"]), call(["layer1"])])
+
+        # 静的な表示項目は記録したものを使い、変化した領域に重なるものだけ再生する
+        vlcd._replay.reset_mock()
+        lcd.clear.reset_mock()
+        vlcd._render([(10, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.BLUE))], list(static_items))
+        vlcd._recordLayer.assert_called_once()
+        lcd.clear.assert_not_called()
+        self.assertEqual(vlcd._replay.call_args_list, [call(["layer0"])])
+
+        # 静的な表示項目が変わった場合は記録し直して全体を描画する
+        static_items[1] = (100, 0, 20, 20, V.ITEM_ROUNDRECT, (5, lcd.BLUE))
+        vlcd._render([(10, 10, 20, 10, V.ITEM_ROUNDRECT, (5, lcd.BLUE))], list(static_items))
+        self.assertEqual(vlcd._recordLayer.call_count, 2)
+        lcd.clear.assert_called_once()
+
+    def test_render_static_reset(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        vlcd._drawItem = MagicMock()
+        vlcd._recordLayer = MagicMock(return_value=[])
+        V = virtual_lcd.VirtualLCD
+        static_items = [(0, 0, 20, 20, V.ITEM_ROUNDRECT, (5, lcd.RED))]
+
+        vlcd._render([], list(static_items))
+        vlcd._render([], list(static_items))
+        self.assertEqual(vlcd._recordLayer.call_count, 1)
+        # 向きや表示方式を変えると記録し直す
+        vlcd.setFlip(True)
+        vlcd._render([], list(static_items))
+        self.assertEqual(vlcd._recordLayer.call_count, 2)
+        vlcd.setFace(vlcd.FACE_HAKONE)
+        vlcd._render([], list(static_items))
+        self.assertEqual(vlcd._recordLayer.call_count, 3)
+        # 他の画面を表示しても記録したものを使う
+        vlcd.showError("error")
+        vlcd._render([], list(static_items))
+        self.assertEqual(vlcd._recordLayer.call_count, 3)
+
+    def test_drawItem_unknown(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        with self.assertRaises(ValueError):
+            vlcd._drawItem((0, 0, 1, 1, 99, ()))
+
+    def test_textSize_cache(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        text_width = lcd.textWidth
+        font_size = lcd.fontSize
+        self.addCleanup(setattr, lcd, "textWidth", text_width)
+        self.addCleanup(setattr, lcd, "fontSize", font_size)
+        lcd.font = MagicMock()
+        lcd.textWidth = MagicMock(return_value=40)
+        lcd.fontSize = MagicMock(return_value=(10, 18))
+        self.assertEqual(vlcd._textItem(10, 20, "1234", lcd.FONT_DejaVu18, lcd.WHITE),
+            (10, 20, 40, 18, vlcd.ITEM_TEXT, (lcd.FONT_DejaVu18, "1234", lcd.WHITE)))
+        self.assertEqual(vlcd._textSize("1234", lcd.FONT_DejaVu18), (40, 18))
+        # 計測済みの文字列ではlcdのフォントを切り替えない
+        self.assertEqual(lcd.font.call_count, 1)
+        self.assertEqual(lcd.textWidth.call_count, 1)
+        vlcd._textSize("1234", lcd.FONT_DejaVu24)
+        self.assertEqual(lcd.font.call_count, 2)
+        # 上限に達した場合は破棄する
+        for i in range(vlcd.TEXT_SIZE_CACHE_SIZE):
+            vlcd._textSize(str(i), lcd.FONT_DejaVu18)
+        self.assertLessEqual(len(vlcd._text_size_cache), vlcd.TEXT_SIZE_CACHE_SIZE)
+
+class TestAltFont7seg(unittest.TestCase):
+    def drawReference(self, vlcd, x, y, w, h, color):
+        # セグメントの図形を仮想画面の座標で1つずつ描画する(全セグメント)
+        def horizon(x, y, w, h):
+            hh = round(h / 2)
+            vlcd._triangle(x+hh, y+hh, x+h, y, x+h, y+h-1, color, color)
+            vlcd._triangle(x+h+hh+w, y+hh, x+h+w, y, x+h+w, y+h-1, color, color)
+            vlcd._rect(x+h, y, w, h, color, color)
+
+        def vertical(x, y, w, h):
+            hw = round(w / 2)
+            vlcd._triangle(x+hw, y+hw, x+1, y+w, x+w-1, y+w, color, color)
+            vlcd._triangle(x+hw, y+w+h+hw, x+1, y+w+h, x+w-1, y+w+h, color, color)
+            vlcd._rect(x, y+w, w, h, color, color)
+
+        horizon(x, y, w, h)
+        vertical(x, y+1, h, w)
+        vertical(x+w+h, y+1, h, w)
+        horizon(x, y+w+h+3, w, h)
+        vertical(x, y+5+w+h, h, w)
+        vertical(x+w+h, y+5+w+h, h, w)
+        horizon(x, y+(w+h)*2+7, w, h)
+
+    def test_draw7seg(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        for flip in (False, True):
+            vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+            vlcd.setFlip(flip)
+            lcd.triangle = MagicMock()
+            lcd.rect = MagicMock()
+            self.drawReference(vlcd, 10, 20, 10, 4, lcd.RED)
+            expected = (lcd.triangle.call_args_list, lcd.rect.call_args_list)
+
+            lcd.triangle = MagicMock()
+            lcd.rect = MagicMock()
+            width = virtual_lcd.AltFont7seg.draw7seg(vlcd, 10, 20, 10, 4, 0b1111111, lcd.RED)
+            self.assertEqual(width, 18)
+            self.assertEqual((lcd.triangle.call_args_list, lcd.rect.call_args_list), expected)
+
+    def test_draw7seg_cache(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        lcd.triangle = MagicMock()
+        lcd.rect = MagicMock()
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        virtual_lcd.AltFont7seg.draw7seg(vlcd, 0, 0, 10, 4, 0b0010010, lcd.RED)
+        virtual_lcd.AltFont7seg.draw7seg(vlcd, 30, 0, 10, 4, 0b1111111, lcd.RED, lcd.BLACK)
+        virtual_lcd.AltFont7seg.drawWatt(vlcd, 0, 53, 20, 8, 1234, lcd.RED, lcd.BLACK)
+        self.assertEqual(set(vlcd._segment_cache.keys()), {(10, 4, False), (20, 8, False)})
+        # 描画しないセグメント(behind_colorなし)は描画しない
+        self.assertEqual(lcd.rect.call_args_list[0:2], [
+            call(5, 223, 10, 4, color=lcd.RED, fillcolor=lcd.RED),
+            call(23, 223, 10, 4, color=lcd.RED, fillcolor=lcd.RED),
+        ])
+        self.assertEqual(lcd.rect.call_args_list[2][0][0:2], (0, 227 - 30))
+
+        # 向きを変えるとキャッシュを破棄する
+        vlcd.setFlip(True)
+        self.assertEqual(vlcd._segment_cache, {})
+
+    def test_drawWatt_items(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        V = virtual_lcd.VirtualLCD
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        lcd.triangle = MagicMock()
+        lcd.rect = MagicMock()
+        virtual_lcd.AltFont7seg.drawWatt(vlcd, 0, 53, 20, 8, -12, lcd.RED, lcd.BLACK)
+        expected = (lcd.triangle.call_args_list, lcd.rect.call_args_list)
+
+        # 1文字ずつ表示項目として追加し、描画すると直接描画した場合と同じになる
+        lcd.triangle = MagicMock()
+        lcd.rect = MagicMock()
+        items = []
+        virtual_lcd.AltFont7seg.drawWatt(vlcd, 0, 53, 20, 8, -12, lcd.RED, lcd.BLACK, items=items)
+        lcd.triangle.assert_not_called()
+        self.assertEqual(items, [
+            (0, 53, 36, 71, V.ITEM_MINUS, (20, 8, lcd.RED)),
+            (39, 53, 36, 71, V.ITEM_7SEG, (20, 8, 0, lcd.RED, lcd.BLACK)),
+            (78, 53, 36, 71, V.ITEM_7SEG, (20, 8, 0, lcd.RED, lcd.BLACK)),
+            (117, 53, 36, 71, V.ITEM_7SEG, (20, 8, 0b0010010, lcd.RED, lcd.BLACK)),
+            (156, 53, 36, 71, V.ITEM_7SEG, (20, 8, 0b1011101, lcd.RED, lcd.BLACK)),
+        ])
+        for item in items:
+            vlcd._drawItem(item)
+        self.assertEqual((lcd.triangle.call_args_list, lcd.rect.call_args_list), expected)
+
+    def test_drawTime_items(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+        V = virtual_lcd.VirtualLCD
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        items = []
+        virtual_lcd.AltFont7seg.drawDate(vlcd, 10, 10, 10, 4, "01", "02", lcd.RED, lcd.BLACK, items=items)
+        virtual_lcd.AltFont7seg.drawTime(vlcd, 106, 10, 10, 4, "03:04", lcd.RED, lcd.BLACK, items=items)
+        self.assertEqual([item[0] for item in items], [10, 31, 58, 79, 106, 127, 148, 155, 176])
+        self.assertEqual(items[6], (148, 10, 4, 39, V.ITEM_COLON, (10, 4, lcd.RED)))
+
+    def test_drawMinus(self):
+        lcd = lcd_mock
+        lcd.screensize = MagicMock(return_value=(136, 241))
+
+        vlcd = virtual_lcd.VirtualLCD(lcd=lcd, axp=axp)
+        lcd.triangle = MagicMock()
+        lcd.rect = MagicMock()
+        width = virtual_lcd.AltFont7seg.drawMinus(vlcd, 5, 7, 10, 4, lcd.RED)
+        self.assertEqual(width, 18)
+        lcd.rect.assert_called_once_with(7+14+3, 241-5-4-10, 4, 10, color=lcd.RED, fillcolor=lcd.RED)
+        self.assertEqual(lcd.triangle.call_count, 2)
+
+class RenderState:
+    """
+    FrameBufferLCDでの描画に使用する表示内容
+    """
+    def __init__(self, watt, minute):
+        self.version = 1
+        self.watt = watt
+        self.minute = minute
+        self.config = MagicMock()
+        config_wm = self.config.config.wattmeter
+        config_wm.max.watt = 3000
+        config_wm.warning.watt = 2500
+        config_wm.caution.watt = 2000
+
+    def set(self, watt, minute):
+        self.watt = watt
+        self.minute = minute
+        self.version += 1
+
+    def getVersion(self):
+        return self.version
+
+    def getCurrentWatt(self):
+        return self.watt
+
+    def getTime(self, format):
+        return format.format(mon=1, mday=2, hour=3, min=self.minute)
+
+    def isStatusWarning(self):
+        return self.watt > 2500
+
+    def isStatusCaution(self):
+        return self.watt > 2000
+
+class TestRendering(unittest.TestCase):
+    def render(self, face, flip, state):
+        fb = FrameBufferLCD()
+        vlcd = virtual_lcd.VirtualLCD(lcd=fb, axp=axp)
+        vlcd.setFace(face)
+        vlcd.setFlip(flip)
+        vlcd.update(state)
+        return fb
+
+    def test_render_diff(self):
+        # 差分だけを描画した画面と全体を描画した画面が一致する
+        for face in virtual_lcd.VirtualLCD.FACE_LIST:
+            for flip in (False, True):
+                state = RenderState(123, 5)
+                fb = FrameBufferLCD()
+                vlcd = virtual_lcd.VirtualLCD(lcd=fb, axp=axp)
+                vlcd.setFace(face)
+                vlcd.setFlip(flip)
+                for watt, minute in ((123, 5), (124, 5), (1999, 6), (2100, 6), (2600, 7), (-50, 7), (8, 8)):
+                    state.set(watt, minute)
+                    vlcd.update(state)
+                    expected = self.render(face, flip, state).getScreen()
+                    self.assertEqual(fb.getScreen(), expected, (face, flip, watt, minute))
+
+    def test_render_diff_calls(self):
+        # ワット数だけが変わった場合は全体を描画するより描画命令が少ない
+        state = RenderState(1234, 5)
+        fb = FrameBufferLCD()
+        vlcd = virtual_lcd.VirtualLCD(lcd=fb, axp=axp)
+        vlcd.setFace(vlcd.FACE_HAKONE)
+        vlcd.update(state)
+        full_calls = sum(fb.calls.values())
+        fb.calls = {}
+        state.set(1235, 5)
+        vlcd.update(state)
+        self.assertNotIn("clear", fb.calls)
+        self.assertLess(sum(fb.calls.values()) * 10, full_calls)
+
+    def test_image(self):
+        fb = self.render(virtual_lcd.VirtualLCD.FACE_BASIC_DARK, False, RenderState(123, 5))
+        w, h = fb.screensize()
+        ppm = fb.toPPM()
+        self.assertTrue(ppm.startswith("P6\n{} {}\n255\n".format(w, h).encode("ascii")))
+        self.assertEqual(len(ppm) - ppm.index(b"255\n") - 4, w * h * 3)
+        self.assertTrue(fb.toPNG().startswith(b"\x89PNG\r\n\x1a\n"))
+        # 文字が描画されている
+        self.assertIn(lcd_mock.WHITE, set(fb.getPixel(x, y) for x in range(w) for y in range(h)))
@@ -1,10 +1,20 @@
-import unittest, random
+import unittest, random, itertools
 from unittest.mock import MagicMock, call
-from mock import utime, logging
+from mock import utime, logging, uasyncio
 from mock.machine import UART
 import wisun
 
 class TestBP35A1Client(unittest.TestCase):
+    def setUp(self):
+        utime.ticks = 0
+        utime.sleep_ms = MagicMock(side_effect=self.advanceTicks)
+
+    def advanceTicks(self, ms):
+        utime.ticks += ms
+
+    def encodeLines(self, lines):
+        return [line.encode() if isinstance(line, str) else line for line in lines]
+
     def createIPv6Address(self):
         parts = [format(0xFE80 + random.randint(0, 63), '04X')]
         for _ in range(7):
@@ -29,69 +39,61 @@ class TestBP35A1Client(unittest.TestCase):
     def test_writeAndReadline(self):
         UART.any = MagicMock()
         UART.any.side_effect = [11, 7]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKTEST 00\r\n", "OK 00\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKTEST 00\r\n", "OK 00\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", "OK")
         self.assertEqual(response, ["SKTEST 00", "OK 00"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_list_break_words(self):
         UART.any = MagicMock()
         UART.any.side_effect = [11, 6]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKTEST 00\r\n", "STOP\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKTEST 00\r\n", "STOP\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", ["OK", "STOP"])
         self.assertEqual(response, ["SKTEST 00", "STOP"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_tuple_break_words(self):
         UART.any = MagicMock()
         UART.any.side_effect = [11, 6]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKTEST 00\r\n", "STOP\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKTEST 00\r\n", "STOP\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", ("OK", "STOP"))
         self.assertEqual(response, ["SKTEST 00", "STOP"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_no_break_words(self):
         UART.any = MagicMock()
-        UART.any.side_effect = [8, 8, 0, 0, 0]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["LINE 1\r\n", "LINE 2\r\n"]
+        UART.any.side_effect = [8, 8] + [0] * 100
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["LINE 1\r\n", "LINE 2\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline(
             "SKTEST 00",
@@ -101,22 +103,21 @@ class TestBP35A1Client(unittest.TestCase):
         )
         self.assertEqual(response, ["LINE 1", "LINE 2"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        sleep_ms_calls = [call(300), call(200), call(200)]
-        utime.sleep_ms.assert_has_calls(sleep_ms_calls)
-        self.assertEqual(utime.sleep_ms.call_count, 3)
+        # break_wordsがない場合は上限時間(300 + 200 * 2)まで受信を続ける
+        self.assertEqual(utime.ticks, 700)
+        self.assertEqual(utime.sleep_ms.call_count, 70)
+        utime.sleep_ms.assert_called_with(10)
 
     def test_writeAndReadline_ignore_remaining_lines(self):
         UART.any = MagicMock()
         UART.any.side_effect = [8, 4, 8]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["LINE 1\r\n", "OK\r\n", "LINE 2\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["LINE 1\r\n", "OK\r\n", "LINE 2\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline(
             "SKTEST 00",
@@ -127,20 +128,18 @@ class TestBP35A1Client(unittest.TestCase):
         )
         self.assertEqual(response, ["LINE 1", "OK"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(300)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_response_delayed(self):
         UART.any = MagicMock()
         UART.any.side_effect = [0, 8, 0, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["LINE 1\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["LINE 1\r\n", "OK\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline(
             "SKTEST 00",
@@ -151,70 +150,63 @@ class TestBP35A1Client(unittest.TestCase):
         )
         self.assertEqual(response, ["LINE 1", "OK"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        sleep_ms_calls = [call(300), call(200), call(200)]
+        # 受信データが届いた時点で処理する(pre_waitは待たない)
+        sleep_ms_calls = [call(10), call(10)]
         utime.sleep_ms.assert_has_calls(sleep_ms_calls)
-        self.assertEqual(utime.sleep_ms.call_count, 3)
+        self.assertEqual(utime.sleep_ms.call_count, 2)
 
     def test_writeAndReadline_return_bytes(self):
         UART.any = MagicMock(return_value=7)
-        UART.readline = MagicMock(return_value=b"OK 00\r\n")
+        UART.read = MagicMock(return_value=b"OK 00\r\n")
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", "OK")
         self.assertEqual(response, ["OK 00"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_inconsistent_response(self):
         UART.any = MagicMock(return_value=7)
-        UART.readline = MagicMock()
-        UART.readline.side_effect = [None, "OK 00\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines([None, "OK 00\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", "OK")
         self.assertEqual(response, ["OK 00"])
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_without_crlf(self):
         UART.any = MagicMock(return_value=7)
-        UART.readline = MagicMock()
-        UART.readline.side_effect = [None, "OK 00\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines([None, "OK 00\r\n"])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         response = client._writeAndReadline("SKTEST 00", "OK", auto_crlf = False)
         self.assertEqual(response, ["OK 00"])
         UART.write.assert_called_once_with("SKTEST 00")
-        utime.sleep_ms.assert_called_once_with(500)
+        utime.sleep_ms.assert_not_called()
 
     def test_writeAndReadline_read_timeout_no_response(self):
         UART.any = MagicMock(return_value=0)
-        UART.readline = MagicMock(return_value=None)
+        UART.read = MagicMock(return_value=None)
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.ReadTimeoutError) as cm:
             client._writeAndReadline(
@@ -226,23 +218,20 @@ class TestBP35A1Client(unittest.TestCase):
             )
         self.assertIn("SKTEST", str(cm.exception))
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        self.assertEqual(UART.any.call_count, 3)
-        sleep_ms_calls = [call(300), call(200), call(200)]
-        utime.sleep_ms.assert_has_calls(sleep_ms_calls)
-        self.assertEqual(utime.sleep_ms.call_count, 3)
+        self.assertEqual(UART.any.call_count, 71)
+        self.assertEqual(utime.ticks, 700)
+        self.assertEqual(utime.sleep_ms.call_count, 70)
 
     def test_writeAndReadline_read_timeout_break_words_not_included(self):
         UART.any = MagicMock()
-        UART.any.side_effect = [6, 0, 0, 0]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["TEST\r\n", None]
+        UART.any.side_effect = [6] + [0] * 100
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["TEST\r\n", None])
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.ReadTimeoutError) as cm:
             client._writeAndReadline(
@@ -254,20 +243,17 @@ class TestBP35A1Client(unittest.TestCase):
             )
         self.assertIn("SKTEST", str(cm.exception))
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        sleep_ms_calls = [call(300), call(200), call(200)]
-        utime.sleep_ms.assert_has_calls(sleep_ms_calls)
-        self.assertEqual(utime.sleep_ms.call_count, 3)
+        self.assertEqual(utime.ticks, 700)
+        self.assertEqual(utime.sleep_ms.call_count, 70)
 
     def test_writeAndReadline_read_timeout_when_infinite_loop(self):
         UART.any = MagicMock(return_value=1)
-        UART.readline = MagicMock(return_value=None)
+        UART.read = MagicMock(return_value=None)
         UART.write = MagicMock()
-        utime.sleep_ms = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
-        utime.sleep_ms.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.ReadTimeoutError) as cm:
             client._writeAndReadline(
@@ -279,8 +265,92 @@ class TestBP35A1Client(unittest.TestCase):
             )
         self.assertIn("SKTEST", str(cm.exception))
         UART.write.assert_called_once_with("SKTEST 00\r\n")
-        utime.sleep_ms.assert_called_once_with(300)
-        self.assertEqual(UART.readline.call_count, 200)
+        utime.sleep_ms.assert_not_called()
+        self.assertEqual(UART.read.call_count, 200)
+
+    def test_writeAndReadline_split_chunks(self):
+        chunks = [b"SKTE", b"ST 00\r\nOK", b" 00\r\n"]
+        UART.any = MagicMock()
+        UART.any.side_effect = [len(chunk) for chunk in chunks]
+        UART.read = MagicMock()
+        UART.read.side_effect = chunks
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        response = client._writeAndReadline("SKTEST 00", "OK")
+        self.assertEqual(response, ["SKTEST 00", "OK 00"])
+        read_calls = [call(4), call(9), call(5)]
+        UART.read.assert_has_calls(read_calls)
+
+    def test_nextLine_binary_mode(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        header = "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 ".format(ip_address, mac_address).encode()
+        # データ部に改行文字(0x0A, 0x0D)を含む
+        data = b"\x10\x81\x00\x01\x02\x88\x01\x05\xFF\x01\x72\x01\xE7\x04\x00\x0D\x0A\x0A"
+        chunks = [b"OK\r\nERX", header[3:] + data[0:10], data[10:] + b"\r\nOK\r\n"]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(chunk) for chunk in chunks], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = chunks
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._binary_mode = True
+        lines = []
+        for _ in range(len(chunks)):
+            client._receive()
+            line = client._nextLine()
+            while line is not None:
+                lines.append(line)
+                line = client._nextLine()
+        self.assertEqual(lines, [b"OK", header + data, b"OK"])
+
+    def test_writeAndReadline_remaining_lines_in_buffer(self):
+        chunk = b"OK 00\r\nSKTEST 01\r\nOK 01\r\n"
+        UART.any = MagicMock()
+        UART.any.side_effect = [len(chunk)] + [0] * 10
+        UART.read = MagicMock(return_value=chunk)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        self.assertEqual(client._writeAndReadline("SKTEST 00", "OK"), ["OK 00"])
+        # 受信バッファに残った行は次のコマンドの応答として処理される
+        self.assertEqual(client._writeAndReadline("SKTEST 01", "OK"), ["SKTEST 01", "OK 01"])
+        UART.read.assert_called_once_with(len(chunk))
+        utime.sleep_ms.assert_not_called()
+
+    def test_writeAndReadline_line_filter(self):
+        UART.any = MagicMock()
+        UART.any.side_effect = [11, 8, 14, 7]
+        UART.read = MagicMock()
+        UART.read.side_effect = [b"SKTEST 00\r\n", b"LINE 1\r\n", b"ERXUDP 1234\r\n", b"OK 00\r\n"]
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        response = client._writeAndReadline("SKTEST 00", "OK", line_filter="ERXUDP ")
+        self.assertEqual(response, ["ERXUDP 1234", "OK 00"])
+
+    def test_writeAndReadline_buffer_overflow(self):
+        data = b"X" * (wisun.BP35A1Client.RECEIVE_BUFFER_SIZE + 4) + b"\r\n"
+        UART.any = MagicMock(return_value=len(data))
+        UART.read = MagicMock()
+        UART.read.side_effect = lambda n: data[0:n] if n == wisun.BP35A1Client.RECEIVE_BUFFER_SIZE else data[-6:]
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        response = client._writeAndReadline("SKTEST 00", "XXXX")
+        self.assertEqual(response, ["X" * wisun.BP35A1Client.RECEIVE_BUFFER_SIZE])
 
     def test_sendUDPData(self):
         ip_address = self.createIPv6Address()
@@ -297,14 +367,13 @@ class TestBP35A1Client(unittest.TestCase):
         side_effect = []
         for line in response:
             side_effect.append(len(line))
-        side_effect += [0] * 100
-        UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = response
+        UART.any.side_effect = itertools.chain(side_effect, itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(response)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         actual_response = client._sendUDPData(ip_address, data)
@@ -336,12 +405,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = response
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(response)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         expected_leading_frame = "1081000102880105FF01"
@@ -371,32 +440,309 @@ class TestBP35A1Client(unittest.TestCase):
         with self.assertRaises(ValueError):
             client._extractUDPData("OK 00")
 
-    def test_findFrameFromResponseEvents(self):
+    def test_dispatchUDPEvent(self):
         ip_address = self.createIPv6Address()
         mac_address = self.createMacAddress()
         data = b"\x10\x81\x01\xFE\x05\xFF\x01\x02\x88\x01\x62\x01\xE7\x00"
-        events = [
-            "SKSENDTO 1 {} 0E1A 1 000E ".format(ip_address),
-            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 108100000EF0010EF0017301D50400123456".format(ip_address, mac_address),
-            "EVENT 21 {} 00".format(ip_address),
-            "OK",
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._transactions[0x01FE] = [client._createExpectedEchonetLiteResponseLeadingFrame(data), 0xE7, 10000, None]
+        # TIDが異なる
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000102880105FF017201E704000003E8".format(ip_address, mac_address)
+        ))
+        # ECHONET Liteのフレームではない
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 02CC 02CC {1} 0 000A 00010203040506070809".format(ip_address, mac_address)
+        ))
+        self.assertIsNone(client._transactions[0x01FE][3])
+        self.assertTrue(client._dispatchUDPEvent(
             "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 108101FE02880105FF017201E704000003E8".format(ip_address, mac_address)
+        ))
+        self.assertEqual(client._transactions[0x01FE][3], "108101FE02880105FF017201E704000003E8")
+
+    def test_dispatchUDPEvent_notification(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        # INF
+        self.assertTrue(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 108100000EF0010EF0017301D50400123456".format(ip_address, mac_address)
+        ))
+        # INFC
+        self.assertTrue(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0019 1081000202880105FF017401EA0B07E5010200000000001234".format(ip_address, mac_address)
+        ))
+        self.assertEqual(client._notifications, [
+            "108100000EF0010EF0017301D50400123456",
+            "1081000202880105FF017401EA0B07E5010200000000001234"
+        ])
+        # 上限を超えた場合は古い通知から破棄する
+        for i in range(client.NOTIFICATION_QUEUE_SIZE):
+            client._dispatchUDPEvent(
+                "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 108100000EF0010EF0017301D50400123456".format(ip_address, mac_address)
+            )
+        self.assertEqual(len(client._notifications), client.NOTIFICATION_QUEUE_SIZE)
+        self.assertNotIn("1081000202880105FF017401EA0B07E5010200000000001234", client._notifications)
+
+    def test_dispatchUDPEvent_notification_rejected(self):
+        ip_address = self.createIPv6Address()
+        other_address = "FE80:0000:0000:0000:0000:0000:0000:0001"
+        mac_address = self.createMacAddress()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        # 接続前
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000302880105FF017301E704000003E8".format(ip_address, mac_address)
+        ))
+        client._ip_address = ip_address
+        # 送信元が接続先のスマートメータではない
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {1} 0E1A 0E1A {2} 1 0012 1081000302880105FF017301E704000003E8".format(other_address, ip_address, mac_address)
+        ))
+        # ECHONET Liteのポートではない
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0001 {1} 1 0012 1081000302880105FF017301E704000003E8".format(ip_address, mac_address)
+        ))
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0001 0E1A {1} 1 0012 1081000302880105FF017301E704000003E8".format(ip_address, mac_address)
+        ))
+        # ECHONET Liteのヘッダではない
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1082000302880105FF017301E704000003E8".format(ip_address, mac_address)
+        ))
+        self.assertEqual(client._notifications, [])
+
+    def test_dispatchUDPEvent_notification_binary(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        data = b"\x10\x81\x00\x03\x02\x88\x01\x05\xFF\x01\x73\x01\xE7\x04\x00\x00\x03\xE8"
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        self.assertFalse(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0001 {1} 1 0012 ".format(ip_address, mac_address).encode() + data
+        ))
+        self.assertTrue(client._dispatchUDPEvent(
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 ".format(ip_address, mac_address).encode() + data
+        ))
+        self.assertEqual(client._notifications, [data])
+
+    def test_processNotifications(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0019 1081000202880105FF017401EA0B07E5010200000000001234\r\n".format(ip_address, mac_address),
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000302880105FF017301E704000003E8\r\n".format(ip_address, mac_address),
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n"
         ]
+        UART.any = MagicMock()
+        # 返信の応答は返信後に届く
+        UART.any.side_effect = itertools.chain(
+            [len(responses[0]), len(responses[1]), 0, len(responses[2]), len(responses[3])],
+            itertools.repeat(0)
+        )
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
-        actual = client._findFrameFromResponseEvents(events, data)
-        expected = {
-            "EHD1": 0x10,
-            "EHD2": 0x81,
-            "TID" : 0x01FE,
-            "SEOJ": 0x028801,
-            "DEOJ": 0x05FF01,
-            "ESV" : 0x72,
-            "OPC" : 0x01,
-            "EPC" : 0xE7,
-            "PDC" : 0x04,
-            "EDT" : "000003E8"
-        }
-        self.assertEqual(actual, expected)
+        client._ip_address = ip_address
+        client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
+        callback = MagicMock()
+        client.addNotificationCallback(callback)
+        self.assertEqual(client.processNotifications(), 2)
+        self.assertEqual(callback.call_args_list, [
+            call(0xEA, {"year": 2021, "mon": 1, "mday": 2, "hour": 0, "min": 0, "sec": 0, "power": 466.0}),
+            call(0xE7, 1000)
+        ])
+        # INFCにはINFC_Resを返信する
+        UART.write.assert_called_once_with(
+            "SKSENDTO 1 {} 0E1A 1 000E ".format(ip_address).encode() +
+            b"\x10\x81\x00\x02\x05\xFF\x01\x02\x88\x01\x7A\x01\xEA\x00"
+        )
+        self.assertEqual(client._notifications, [])
+        self.assertEqual(client.processNotifications(), 0)
+
+    def test_processNotifications_malformed(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            # EDTが短い定時積算電力量計測値
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0010 1081000202880105FF017401EA020102\r\n".format(ip_address, mac_address),
+            # OPCとプロパティの数が一致しない
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 000E 1081000302880105FF017302E700\r\n".format(ip_address, mac_address),
+            # 送信元のインスタンスコードが0x02
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000402880205FF017401E704000003E8\r\n".format(ip_address, mac_address),
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n"
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain(
+            [len(responses[0]), len(responses[1]), len(responses[2]), 0] + [len(line) for line in responses[3:]],
+            itertools.repeat(0)
+        )
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
+        callback = MagicMock(side_effect=RuntimeError("callback failed"))
+        client.addNotificationCallback(callback)
+        # 解析できない通知や通知先の例外があっても残りの通知を処理する
+        self.assertEqual(client.processNotifications(), 2)
+        self.assertEqual(callback.call_args_list, [call(0xE7, 1000)])
+        # INFC_Resは通知の送信元オブジェクト宛に返信する
+        self.assertEqual(UART.write.call_args_list, [
+            call(
+                "SKSENDTO 1 {} 0E1A 1 000E ".format(ip_address).encode() +
+                b"\x10\x81\x00\x02\x05\xFF\x01\x02\x88\x01\x7A\x01\xEA\x00"
+            ),
+            call(
+                "SKSENDTO 1 {} 0E1A 1 000E ".format(ip_address).encode() +
+                b"\x10\x81\x00\x04\x05\xFF\x01\x02\x88\x02\x7A\x01\xE7\x00"
+            )
+        ])
+        self.assertEqual(client._notifications, [])
+
+    def test_pipelined_transactions(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            # 2つ目の問い合わせの応答が先に届く
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000202880105FF017201E00400012345\r\n".format(ip_address, mac_address),
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000102880105FF017201E704000003E8\r\n".format(ip_address, mac_address)
+        ]
+        UART.any = MagicMock()
+        side_effect = []
+        for line in responses:
+            side_effect.append(len(line))
+        side_effect += [0] * 100
+        UART.any.side_effect = side_effect
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        tid_power = client.beginGetProperties([0xE7])
+        tid_energy = client.beginGetProperties([0xE0])
+        self.assertEqual(set(client._transactions.keys()), {tid_power, tid_energy})
+        self.assertEqual(client.waitGetProperties(tid_energy, [0xE0]), {0xE0: 0x12345})
+        self.assertEqual(client.waitGetProperties(tid_power, [0xE7]), {0xE7: 1000})
+        self.assertEqual(client._transactions, {})
+        self.assertEqual(UART.write.call_count, 2)
+
+    def test_received_transaction_not_expired(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            # 1つ目の問い合わせの応答は2つ目の送信中に届く
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000102880105FF017201E704000003E8\r\n".format(ip_address, mac_address),
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        tid_power = client.beginGetProperties([0xE7])
+        client.beginGetProperties([0xE0])
+        self.assertIsNotNone(client._transactions[tid_power][3])
+        # 期限を過ぎても応答を受信済みのトランザクションは次の送信で破棄しない
+        utime.ticks += 60000
+        client.beginGetProperties([0xE8])
+        self.assertEqual(client.waitGetProperties(tid_power, [0xE7]), {0xE7: 1000})
+
+    def test_expired_transaction_discarded(self):
+        ip_address = self.createIPv6Address()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        tid_power = client.beginGetProperties([0xE7])
+        # 応答を受信しないまま期限を過ぎたトランザクションは次の送信で破棄される
+        utime.ticks += 60000
+        client.beginGetProperties([0xE0])
+        self.assertNotIn(tid_power, client._transactions)
+        with self.assertRaises(wisun.ReadTimeoutError):
+            client.waitGetProperties(tid_power, [0xE7])
+
+    def test_beginTransaction_failed(self):
+        ip_address = self.createIPv6Address()
+        responses = [
+            "FAIL ER04\r\n",
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = [len(responses[0]), 0]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        frame = client._createEchonetLiteFrame(epc = 0xE7, tid = 0x0001)
+        with self.assertRaises(wisun.UnexpectedResponseError):
+            client._beginTransaction(ip_address, frame)
+        self.assertEqual(client._transactions, {})
+
+    def test_waitTransaction_timeout(self):
+        ip_address = self.createIPv6Address()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+        ]
+        UART.any = MagicMock()
+        side_effect = []
+        for line in responses:
+            side_effect.append(len(line))
+        UART.any.side_effect = itertools.chain(side_effect, itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        frame = client._createEchonetLiteFrame(epc = 0xE7, tid = 0x0001)
+        tid = client._beginTransaction(ip_address, frame)
+        with self.assertRaises(wisun.ReadTimeoutError) as cm:
+            client._waitTransaction(tid)
+        self.assertIn("(SKSENDTO)", str(cm.exception))
+        self.assertEqual(client._transactions, {})
+        # 送信時点から SENDTO_READ_WAIT_TIME_MS + SENDTO_RETRY_WAIT_TIME_MS * SENDTO_RETRY_COUNT
+        self.assertEqual(utime.ticks, 10500)
 
     def test_createEchonetLiteFrame(self):
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
@@ -429,6 +775,18 @@ class TestBP35A1Client(unittest.TestCase):
         expected = b'\x10\x81\x00\x01\x05\xFF\x01\x02\x88\x01\x61\x01\xE5\x01\x63'
         self.assertEqual(frame, expected)
 
+    def test_createEchonetLiteFrame_multiple_properties(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = client._createEchonetLiteFrame(epc = [0xE7, 0xE8, 0xE0], tid = 0x0002)
+        self.assertIsInstance(frame, bytes)
+        expected = b'\x10\x81\x00\x02\x05\xFF\x01\x02\x88\x01\x62\x03\xE7\x00\xE8\x00\xE0\x00'
+        self.assertEqual(frame, expected)
+
+    def test_createEchonetLiteFrame_multiple_properties_with_edt(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        with self.assertRaises(ValueError):
+            client._createEchonetLiteFrame(epc = [0xE5, 0xE7], esv = 0x61, edt = b'\x63')
+
     def test_createExpectedEchonetLiteResponseLeadingFrame(self):
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         frame = b'\x10\x81\x01\xFE\x05\xFF\x01\x02\x88\x01\x62\x01\xE7\x00'
@@ -479,6 +837,78 @@ class TestBP35A1Client(unittest.TestCase):
         }
         self.assertEqual(data, expected)
 
+    def test_parseEchonetLiteProperties(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = "1081000202880105FF017203E704000003E8E80400140000E00400012345"
+        expected = {
+            0xE7: "000003E8",
+            0xE8: "00140000",
+            0xE0: "00012345",
+        }
+        self.assertEqual(client._parseEchonetLiteProperties(frame), expected)
+
+    def test_parseEchonetLiteProperties_not_available(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = "1081000202880105FF015203E704000003E8E800E00400012345"
+        expected = {
+            0xE7: "000003E8",
+            0xE8: None,
+            0xE0: "00012345",
+        }
+        self.assertEqual(client._parseEchonetLiteProperties(frame), expected)
+
+    def test_parseEchonetLiteProperties_too_short(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = "1081000202880105FF017203E704000003E8E80400140000"
+        with self.assertRaises(ValueError) as cm:
+            client._parseEchonetLiteProperties(frame)
+        self.assertEqual(str(cm.exception), "Frame data too short.")
+
+    def test_parseEchonetLiteFrame_bytes(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = b"\x10\x81\x01\xFE\x02\x88\x01\x05\xFF\x01\x72\x01\xE7\x04\x00\x00\x03\xE8"
+        expected = client._parseEchonetLiteFrame("108101FE02880105FF017201E704000003E8")
+        # EDTは16進数表記の文字列に変換せずバイト列のまま取り出す
+        expected["EDT"] = b"\x00\x00\x03\xE8"
+        self.assertEqual(client._parseEchonetLiteFrame(frame), expected)
+        frame = b"\x10\x81\x00\x01\x02\x88\x01\x05\xFF\x01\x52\x01\xE7\x00"
+        self.assertIsNone(client._parseEchonetLiteFrame(frame)["EDT"])
+        with self.assertRaises(ValueError) as cm:
+            client._parseEchonetLiteFrame(frame[0:13])
+        self.assertEqual(str(cm.exception), "Frame data too short.")
+
+    def test_parseEchonetLiteProperties_bytes(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        frame = b"\x10\x81\x00\x02\x02\x88\x01\x05\xFF\x01\x52\x03\xE7\x04\x00\x00\x03\xE8\xE8\x00\xE0\x04\x00\x01\x23\x45"
+        expected = {
+            0xE7: b"\x00\x00\x03\xE8",
+            0xE8: None,
+            0xE0: b"\x00\x01\x23\x45",
+        }
+        self.assertEqual(client._parseEchonetLiteProperties(frame), expected)
+        with self.assertRaises(ValueError) as cm:
+            client._parseEchonetLiteProperties(frame[0:-1])
+        self.assertEqual(str(cm.exception), "Frame data too short.")
+
+    def test_toHexString(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        self.assertEqual(client._toHexString(b""), "")
+        self.assertEqual(client._toHexString(b"\x00\x00\x0A\xFF"), "00000AFF")
+
+    def test_decodeEDT(self):
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        self.assertEqual(client._decodeEDT("000003E8"), 1000)
+        self.assertEqual(client._decodeEDT(b"\x00\x00\x03\xE8"), 1000)
+        self.assertEqual(client._decodeEDT("07E50C1F", 0, 2), 2021)
+        self.assertEqual(client._decodeEDT(b"\x07\xE5\x0C\x1F", 0, 2), 2021)
+        self.assertEqual(client._decodeEDT("07E50C1F", 3, 1), 31)
+        self.assertEqual(client._decodeEDT(memoryview(b"\x07\xE5\x0C\x1F"), 2), 0x0C1F)
+        for edt in ("07E5", b"\x07\xE5"):
+            with self.assertRaises(ValueError):
+                client._decodeEDT(edt, 1, 2)
+            with self.assertRaises(ValueError):
+                client._decodeEDT(edt, 2)
+
     def test_convertUnsignedToSigned(self):
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertEqual(client._convertUnsignedToSigned(0, 16), 0)
@@ -503,11 +933,11 @@ class TestBP35A1Client(unittest.TestCase):
 
     def test_clearBuffer(self):
         UART.any = MagicMock(return_value=0)
-        UART.readline = MagicMock(return_value="")
+        UART.read = MagicMock(return_value=b"")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.clearBuffer()
@@ -516,16 +946,16 @@ class TestBP35A1Client(unittest.TestCase):
     def test_isDeviceAvailable(self):
         UART.any = MagicMock()
         UART.any.side_effect = [8, 77, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = [
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines([
             "SKINFO\r\n",
             "EINFO {0} {1} 21 FFFF FFFE\r\n".format(self.createIPv6Address(), self.createMacAddress()),
             "OK\r\n"
-        ]
+        ])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertTrue(client.isDeviceAvailable())
@@ -533,11 +963,11 @@ class TestBP35A1Client(unittest.TestCase):
 
     def test_isDeviceAvailable_unavailable(self):
         UART.any = MagicMock(return_value=0)
-        UART.readline = MagicMock()
+        UART.read = MagicMock()
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertFalse(client.isDeviceAvailable())
@@ -548,16 +978,16 @@ class TestBP35A1Client(unittest.TestCase):
         mac_address = self.createMacAddress()
         UART.any = MagicMock()
         UART.any.side_effect = [8, 77, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = [
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines([
             "SKINFO\r\n",
             "EINFO {0} {1} 21 FFFF FFFE\r\n".format(ip_address, mac_address),
             "OK\r\n"
-        ]
+        ])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         actual = client.execGetInfo()
@@ -573,12 +1003,12 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execGetInfo_unexpected_response(self):
         UART.any = MagicMock()
         UART.any.side_effect = [8, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKINFO\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKINFO\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.UnexpectedResponseError) as cm:
@@ -589,11 +1019,11 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execEchoBack_on(self):
         UART.any = MagicMock()
         UART.any.side_effect = [4, 0]
-        UART.readline = MagicMock(return_value="OK\r\n")
+        UART.read = MagicMock(return_value=b"OK\r\n")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execEchoBack(True)
@@ -602,11 +1032,11 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execEchoBack_off(self):
         UART.any = MagicMock()
         UART.any.side_effect = [4, 0]
-        UART.readline = MagicMock(return_value="OK\r\n")
+        UART.read = MagicMock(return_value=b"OK\r\n")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execEchoBack(False)
@@ -615,12 +1045,12 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execSetAsciiMode_binary_to_ascii(self):
         UART.any = MagicMock()
         UART.any.side_effect = [7, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["OK 00\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["OK 00\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertTrue(client.execSetAsciiMode())
@@ -632,23 +1062,48 @@ class TestBP35A1Client(unittest.TestCase):
 
     def test_execSetAsciiMode_no_change(self):
         UART.any = MagicMock(return_value=7)
-        UART.readline = MagicMock(return_value="OK 01\r\n")
+        UART.read = MagicMock(return_value=b"OK 01\r\n")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertFalse(client.execSetAsciiMode())
         UART.write.assert_called_once_with("ROPT\r\n")
 
+    def test_execSetBinaryMode_ascii_to_binary(self):
+        UART.any = MagicMock()
+        UART.any.side_effect = [7, 4]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["OK 01\r\n", "OK\r\n"])
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        self.assertTrue(client.execSetBinaryMode())
+        UART.write.assert_has_calls([
+            call("ROPT\r\n"),
+            call("WOPT 00\r\n")
+        ])
+        self.assertTrue(client._binary_mode)
+
+    def test_execSetBinaryMode_no_change(self):
+        UART.any = MagicMock(return_value=7)
+        UART.read = MagicMock(return_value=b"OK 00\r\n")
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        self.assertFalse(client.execSetBinaryMode())
+        UART.write.assert_called_once_with("ROPT\r\n")
+        self.assertTrue(client._binary_mode)
+
     def test_execTerminateSession(self):
         UART.any = MagicMock(return_value=4)
-        UART.readline = MagicMock(return_value="OK\r\n")
+        UART.read = MagicMock(return_value=b"OK\r\n")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertTrue(client.execTerminateSession())
@@ -656,11 +1111,11 @@ class TestBP35A1Client(unittest.TestCase):
 
     def test_execTerminateSession_not_established(self):
         UART.any = MagicMock(return_value=11)
-        UART.readline = MagicMock(return_value="FAIL ER10\r\n")
+        UART.read = MagicMock(return_value=b"FAIL ER10\r\n")
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         self.assertFalse(client.execTerminateSession())
@@ -670,12 +1125,12 @@ class TestBP35A1Client(unittest.TestCase):
         password = "0123456789AB"
         UART.any = MagicMock()
         UART.any.side_effect = [25, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKSETPWD C " + password + "\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKSETPWD C " + password + "\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execSetPwd(password)
@@ -684,11 +1139,11 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execSetPwd_password_too_short(self):
         password = "0123456789A"
         UART.any = MagicMock()
-        UART.readline = MagicMock()
+        UART.read = MagicMock()
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(ValueError) as cm:
@@ -700,12 +1155,12 @@ class TestBP35A1Client(unittest.TestCase):
         rbid = "012345678901234567890123456789AB"
         UART.any = MagicMock()
         UART.any.side_effect = [44, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKSETRBID " + rbid + "\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKSETRBID " + rbid + "\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execSetRbId(rbid)
@@ -714,11 +1169,11 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execSetRbId_rbid_too_long(self):
         rbid = "012345678901234567890123456789ABC"
         UART.any = MagicMock()
-        UART.readline = MagicMock()
+        UART.read = MagicMock()
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(ValueError) as cm:
@@ -750,12 +1205,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.insert(2, 0)
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         actual_params = client.execScan()
@@ -787,17 +1242,14 @@ class TestBP35A1Client(unittest.TestCase):
             "  PairID:01234567B\r\n"
         ]
         UART.any = MagicMock()
-        side_effect = []
-        for line in responses:
-            side_effect.append(len(line))
-        side_effect += [0] * 100
-        UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        # エコーより前のEVENT 22はスキャンの完了とみなさず上限時刻まで受信を続ける
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         actual_params = client.execScan()
@@ -812,6 +1264,70 @@ class TestBP35A1Client(unittest.TestCase):
         self.assertEqual(actual_params, expected_params)
         UART.write.assert_called_once_with("SKSCAN 2 FFFFFFFF 6\r\n")
 
+    def test_execScan_wait_for_scan_completion(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "SKSCAN 2 FFFFFFFF 6\r\n",
+            "OK\r\n",
+            "EVENT 20 {0}\r\n".format(ip_address),
+            "EPANDESC\r\n",
+            "  Channel:21\r\n",
+            "  Channel Page:09\r\n",
+            "  Pan ID:8888\r\n",
+            "  Addr:{0}\r\n".format(mac_address),
+            "  LQI:E1\r\n",
+            "  PairID:01234567B\r\n",
+            "EVENT 22 {0}\r\n".format(ip_address),
+            "OK\r\n"
+        ]
+        UART.any = MagicMock()
+        # EPANDESCの後しばらくしてからスキャンの完了(EVENT 22)が届く
+        UART.any.side_effect = itertools.chain(
+            [len(line) for line in responses[0:10]], [0] * 5, [len(responses[10])], [0], [len(responses[11])],
+            itertools.repeat(0)
+        )
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        actual_params = client.execScan()
+        self.assertEqual(actual_params["PairID"], "01234567B")
+        self.assertEqual(UART.read.call_count, 11)
+        # スキャンの完了は次のコマンドの応答として扱われない
+        self.assertEqual(client._writeAndReadline("SKSREG S2 21", "OK"), ["OK"])
+
+    def test_execScan_echo_back_off(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            # 前回のスキャンの完了
+            "EVENT 22 {0}\r\n".format(ip_address),
+            "OK\r\n",
+            "EVENT 20 {0}\r\n".format(ip_address),
+            "EPANDESC\r\n",
+            "  Channel:21\r\n",
+            "  Channel Page:09\r\n",
+            "  Pan ID:8888\r\n",
+            "  Addr:{0}\r\n".format(mac_address),
+            "  LQI:E1\r\n",
+            "  PairID:01234567B\r\n",
+            "EVENT 22 {0}\r\n".format(ip_address)
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        actual_params = client.execScan()
+        self.assertEqual(actual_params["PairID"], "01234567B")
+        self.assertEqual(UART.read.call_count, len(responses))
+        # エコーバックが無効でもスキャンの完了を受信した時点で終了する
+        self.assertLess(utime.ticks, 1000)
+
     def test_execScan_read_timeout_error(self):
         responses = [
             "SKSCAN 2 FFFFFFFF 6\r\n",
@@ -821,14 +1337,13 @@ class TestBP35A1Client(unittest.TestCase):
         side_effect = []
         for line in responses:
             side_effect.append(len(line))
-        side_effect += [0] * 100
-        UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.any.side_effect = itertools.chain(side_effect, itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.ReadTimeoutError) as cm:
@@ -840,12 +1355,12 @@ class TestBP35A1Client(unittest.TestCase):
         channel = "21"
         UART.any = MagicMock()
         UART.any.side_effect = [14, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKSREG S2 21\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKSREG S2 21\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execSetChannel(channel)
@@ -855,12 +1370,12 @@ class TestBP35A1Client(unittest.TestCase):
         pan_id = "FEDC"
         UART.any = MagicMock()
         UART.any.side_effect = [16, 4]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKSREG S3 FEDC\r\n", "OK\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKSREG S3 FEDC\r\n", "OK\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execSetPanId(pan_id)
@@ -871,12 +1386,12 @@ class TestBP35A1Client(unittest.TestCase):
         converted_ip_address = self.createIPv6Address()
         UART.any = MagicMock()
         UART.any.side_effect = [25, 41]
-        UART.readline = MagicMock()
-        UART.readline.side_effect = ["SKLL64 " + mac_address + "\r\n", converted_ip_address + "\r\n"]
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(["SKLL64 " + mac_address + "\r\n", converted_ip_address + "\r\n"])
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         ip_address = client.execConvertAddress(mac_address)
@@ -899,12 +1414,12 @@ class TestBP35A1Client(unittest.TestCase):
         for line in responses:
             side_effect.append(len(line))
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.execJoin(ip_address)
@@ -927,12 +1442,12 @@ class TestBP35A1Client(unittest.TestCase):
         for line in responses:
             side_effect.append(len(line))
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.ConnectionError) as cm:
@@ -955,12 +1470,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -980,12 +1495,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1005,12 +1520,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1019,11 +1534,11 @@ class TestBP35A1Client(unittest.TestCase):
     def test_execGetStatus_exception_has_correct_command_head(self):
         ip_address = self.createIPv6Address()
         UART.any = MagicMock(return_value=0)
-        UART.readline = MagicMock()
+        UART.read = MagicMock()
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1033,11 +1548,11 @@ class TestBP35A1Client(unittest.TestCase):
 
     def test_execGetStatus_undefined_address(self):
         UART.any = MagicMock()
-        UART.readline = MagicMock()
+        UART.read = MagicMock()
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         with self.assertRaises(wisun.UndefinedAddressError) as cm:
@@ -1058,12 +1573,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1083,12 +1598,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1108,12 +1623,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1133,12 +1648,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1158,12 +1673,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1183,12 +1698,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1208,12 +1723,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1234,12 +1749,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1259,12 +1774,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1284,12 +1799,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1309,12 +1824,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1334,12 +1849,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1359,12 +1874,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1384,12 +1899,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1409,12 +1924,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1434,12 +1949,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1459,12 +1974,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1484,17 +1999,37 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
         self.assertEqual(client.execGetCurrentPowerConsumption(), -2147483647)
 
+    def test_execGetCurrentPowerConsumption_binary_mode(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address).encode(),
+            b"OK\r\n",
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 ".format(ip_address, mac_address).encode() +
+            b"\x10\x81\x00\x01\x02\x88\x01\x05\xFF\x01\x72\x01\xE7\x04\x00\x00\x0A\x0D\r\n"
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = responses
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        client._binary_mode = True
+        self.assertEqual(client.execGetCurrentPowerConsumption(), 0x0A0D)
+
     def test_execGetCurrentPowerConsumption_max(self):
         ip_address = self.createIPv6Address()
         mac_address = self.createMacAddress()
@@ -1509,12 +2044,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1534,12 +2069,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1559,12 +2094,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1584,12 +2119,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1609,12 +2144,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1630,6 +2165,36 @@ class TestBP35A1Client(unittest.TestCase):
         }
         self.assertEqual(actual, expected)
 
+    def test_execGetLast30MinutesPowerConsumption_binary_mode(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address).encode(),
+            b"OK\r\n",
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0019 ".format(ip_address, mac_address).encode() +
+            b"\x10\x81\x00\x01\x02\x88\x01\x05\xFF\x01\x72\x01\xEA\x0B\x27\x0F\x0C\x01\x17\x3B\x1E\x05\xF5\xE0\xFF\r\n"
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = responses
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        client._binary_mode = True
+        actual = client.execGetLast30MinutesPowerConsumption()
+        expected = {
+            "year": 9999,
+            "mon": 12,
+            "mday": 1,
+            "hour": 23,
+            "min": 59,
+            "sec": 30,
+            "power": 99999999
+        }
+        self.assertEqual(actual, expected)
+
     def test_execGetLast30MinutesPowerConsumption_with_calc_params(self):
         ip_address = self.createIPv6Address()
         mac_address = self.createMacAddress()
@@ -1644,12 +2209,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1680,17 +2245,45 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
         self.assertTrue(client.execSetTargetDayForHistory(99))
 
+    def test_execSetTargetDayForHistory_failed(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            # 書き込み要求不可応答(SetC_SNA)
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 000F 1081000102880105FF015101E50163\r\n".format(ip_address, mac_address)
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        self.assertFalse(client.execSetTargetDayForHistory(99))
+
+        # 応答がない場合
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+        ]
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read.side_effect = self.encodeLines(responses)
+        self.assertFalse(client.execSetTargetDayForHistory(99))
+
     def test_execGetTargetDayForHistory(self):
         ip_address = self.createIPv6Address()
         mac_address = self.createMacAddress()
@@ -1705,12 +2298,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1730,12 +2323,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1762,12 +2355,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1781,6 +2374,32 @@ class TestBP35A1Client(unittest.TestCase):
         expected["powers"] += [None] * 45
         self.assertEqual(actual, expected)
 
+    def test_execGetPowerConsumptionHistory_binary_mode(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        edt = b"\x00\x01\x00\x10\xF4\x47\x00\x10\xF4\x48\x00\x10\xF4\x49" + b"\xFF\xFF\xFF\xFE" * 45
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address).encode(),
+            b"OK\r\n",
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 00D0 ".format(ip_address, mac_address).encode() +
+            b"\x10\x81\x00\x01\x02\x88\x01\x05\xFF\x01\x72\x01\xE2\xC2" + edt + b"\r\n"
+        ]
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([len(line) for line in responses], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = responses
+        UART.write = MagicMock()
+
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        client._binary_mode = True
+        actual = client.execGetPowerConsumptionHistory()
+        expected = {
+            "day": 1,
+            "powers": [1111111, 1111112, 1111113] + [None] * 45
+        }
+        self.assertEqual(actual, expected)
+
     def test_execGetPowerConsumptionHistory_with_calc_params(self):
         ip_address = self.createIPv6Address()
         mac_address = self.createMacAddress()
@@ -1795,12 +2414,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1828,12 +2447,12 @@ class TestBP35A1Client(unittest.TestCase):
             side_effect.append(len(line))
         side_effect += [0] * 100
         UART.any.side_effect = side_effect
-        UART.readline = MagicMock()
-        UART.readline.side_effect = responses
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
         UART.write = MagicMock()
 
         UART.any.reset_mock()
-        UART.readline.reset_mock()
+        UART.read.reset_mock()
         UART.write.reset_mock()
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client._ip_address = ip_address
@@ -1848,6 +2467,94 @@ class TestBP35A1Client(unittest.TestCase):
         expected["powers"] += [None] * 45
         self.assertEqual(actual, expected)
 
+    def test_execGetProperties(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 001E 1081000102880105FF017203E704000003E8E80400140000E00400012345\r\n".format(ip_address, mac_address)
+        ]
+        UART.any = MagicMock()
+        side_effect = []
+        for line in responses:
+            side_effect.append(len(line))
+        side_effect += [0] * 100
+        UART.any.side_effect = side_effect
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        actual = client.execGetProperties([0xE7, 0xE8, 0xE0])
+        expected = {
+            0xE7: 1000,
+            0xE8: 0x00140000,
+            0xE0: 0x12345,
+        }
+        self.assertEqual(actual, expected)
+        expected_command = (
+            "SKSENDTO 1 {} 0E1A 1 0012 ".format(ip_address).encode("utf-8") +
+            b"\x10\x81\x00\x01\x05\xFF\x01\x02\x88\x01\x62\x03\xE7\x00\xE8\x00\xE0\x00"
+        )
+        UART.write.assert_called_once_with(expected_command)
+
+    def test_execGetProperties_no_response(self):
+        ip_address = self.createIPv6Address()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+        ]
+        UART.any = MagicMock()
+        side_effect = []
+        for line in responses:
+            side_effect.append(len(line))
+        UART.any.side_effect = itertools.chain(side_effect, itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        with self.assertRaises(wisun.ReadTimeoutError):
+            client.execGetProperties([0xE7, 0xE8, 0xE0])
+
+    def test_execGetMeasurements(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        responses = [
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 001A 1081000102880105FF015203E704FFFFFC18E800E00400012345\r\n".format(ip_address, mac_address)
+        ]
+        UART.any = MagicMock()
+        side_effect = []
+        for line in responses:
+            side_effect.append(len(line))
+        side_effect += [0] * 100
+        UART.any.side_effect = side_effect
+        UART.read = MagicMock()
+        UART.read.side_effect = self.encodeLines(responses)
+        UART.write = MagicMock()
+
+        UART.any.reset_mock()
+        UART.read.reset_mock()
+        UART.write.reset_mock()
+        client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
+        client._ip_address = ip_address
+        client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
+        actual = client.execGetMeasurements()
+        self.assertEqual(actual["watt"], -1000)
+        self.assertIsNone(actual["ampere"])
+        self.assertAlmostEqual(actual["power"], 7456.5)
+
     def test_getMaxIntegralPowerConsumption(self):
         client = wisun.BP35A1Client(uart=UART, utime=utime, logging=logging)
         client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
@@ -1859,3 +2566,118 @@ class TestBP35A1Client(unittest.TestCase):
         self.assertAlmostEqual(client.getMaxIntegralPowerConsumption(3), 99.9)
         self.assertAlmostEqual(client.getMaxIntegralPowerConsumption(2), 9.9)
         self.assertAlmostEqual(client.getMaxIntegralPowerConsumption(1), .9)
+
+class TestAsyncBP35A1Client(unittest.TestCase):
+    def setUp(self):
+        utime.ticks = 0
+        utime.sleep_ms = MagicMock()
+
+    def createIPv6Address(self):
+        return "FE80:0000:0000:0000:1234:5678:9ABC:DEF0"
+
+    def createMacAddress(self):
+        return "123456789ABCDEF0"
+
+    def setResponses(self, chunks):
+        UART.any = MagicMock()
+        UART.any.side_effect = itertools.chain([0 if chunk is None else len(chunk) for chunk in chunks], itertools.repeat(0))
+        UART.read = MagicMock()
+        UART.read.side_effect = [chunk.encode() for chunk in chunks if chunk is not None]
+        UART.write = MagicMock()
+
+    def test_execScanAsync(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        self.setResponses([
+            "SKSCAN 2 FFFFFFFF 6\r\nOK\r\n", None,
+            "EVENT 20 {0}\r\nEPANDESC\r\n  Channel:21\r\n  Channel Page:09\r\n  Pan ID:8888\r\n".format(ip_address),
+            "  Addr:{0}\r\n  LQI:E1\r\n  PairID:01234567B\r\n".format(mac_address), None, None,
+            "EVENT 22 {0}\r\n".format(ip_address)
+        ])
+        client = wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        actual_params = uasyncio.run(client.execScanAsync())
+        self.assertEqual(actual_params["Addr"], mac_address)
+        self.assertEqual(UART.read.call_count, 4)
+
+    def test_execScanAsync_echo_back_off(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        self.setResponses([
+            "OK\r\n", None,
+            "EVENT 20 {0}\r\nEPANDESC\r\n  Channel:21\r\n  Channel Page:09\r\n  Pan ID:8888\r\n".format(ip_address),
+            "  Addr:{0}\r\n  LQI:E1\r\n  PairID:01234567B\r\n".format(mac_address), None,
+            "EVENT 22 {0}\r\n".format(ip_address)
+        ])
+        client = wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        actual_params = uasyncio.run(client.execScanAsync())
+        self.assertEqual(actual_params["PairID"], "01234567B")
+        self.assertLess(utime.ticks, 1000)
+
+    def test_execJoinAsync(self):
+        ip_address = self.createIPv6Address()
+        self.setResponses(["OK\r\n", None, None, "EVENT 21 {} 00\r\n".format(ip_address), None, "EVENT 25 {}\r\n".format(ip_address)])
+        client = wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        uasyncio.run(client.execJoinAsync(ip_address))
+        self.assertEqual(client._ip_address, ip_address)
+        UART.write.assert_called_once_with("SKJOIN {}\r\n".format(ip_address))
+        # 応答待ちの間は処理を止めずにイベントループに制御を返す
+        utime.sleep_ms.assert_not_called()
+        self.assertEqual(utime.ticks, 30)
+
+    def test_execGetMeasurementsAsync(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        self.setResponses([
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            None,
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 001A 1081000102880105FF015203E704FFFFFC18E800E00400012345\r\n".format(ip_address, mac_address)
+        ])
+        client = wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        client._ip_address = ip_address
+        client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
+        actual = uasyncio.run(client.execGetMeasurementsAsync())
+        self.assertEqual(actual["watt"], -1000)
+        self.assertIsNone(actual["ampere"])
+        self.assertAlmostEqual(actual["power"], 7456.5)
+        utime.sleep_ms.assert_not_called()
+
+    def test_concurrent_requests(self):
+        ip_address = self.createIPv6Address()
+        mac_address = self.createMacAddress()
+        self.setResponses([
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            None,
+            "OK\r\n",
+            "EVENT 21 {} 00\r\n".format(ip_address),
+            "OK\r\n",
+            None,
+            # 2つ目の問い合わせの応答が先に届く
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0019 1081000202880105FF017201EA0B07E5010200000000001234\r\n".format(ip_address, mac_address),
+            None,
+            "ERXUDP {0} {0} 0E1A 0E1A {1} 1 0012 1081000102880105FF017201E704000003E8\r\n".format(ip_address, mac_address)
+        ])
+        client = wisun.AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+        client._ip_address = ip_address
+        client.setPowerConsumptionCalcParams(factor=1, unit=0.1)
+        ticks = []
+
+        async def ticker():
+            # 問い合わせの応答待ちの間も他のタスクが動き続ける
+            for _ in range(5):
+                ticks.append(utime.ticks)
+                await uasyncio.sleep_ms(1)
+
+        async def main():
+            return await uasyncio.gather(
+                client.execGetCurrentPowerConsumptionAsync(),
+                client.execGetLast30MinutesPowerConsumptionAsync(),
+                ticker()
+            )
+
+        watt, last30, _ = uasyncio.run(main())
+        self.assertEqual(watt, 1000)
+        self.assertEqual(last30["power"], 466.0)
+        self.assertEqual(len(ticks), 5)
+        self.assertEqual(client._transactions, {})
+        self.assertEqual(UART.write.call_count, 2)
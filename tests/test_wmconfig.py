@@ -143,7 +143,11 @@ class TestWMConfig(unittest.TestCase):
         self.assertTrue(config.config.wattmeter.warning.beep)
         self.assertEqual(config.config.wattmeter.caution.watt, 2000)
         self.assertTrue(config.config.wattmeter.caution.beep)
+        self.assertEqual(config.config.wattmeter.demand.watt, 1800)
+        self.assertTrue(config.config.wattmeter.demand.beep)
         self.assertEqual(config.config.wattmeter.update_interval, 15)
+        self.assertEqual(config.config.wattmeter.adaptive_interval.min, 5)
+        self.assertEqual(config.config.wattmeter.adaptive_interval.max, 300)
         self.assertEqual(config.config.wattmeter.beep_volume, 5)
         self.assertFalse(config.config.wattmeter.auto_reboot)
         self.assertTrue(config.config.wattmeter.sync_cache)
@@ -152,6 +156,7 @@ class TestWMConfig(unittest.TestCase):
         self.assertEqual(config.config.display.sleep.end, "6:00")
         self.assertEqual(config.config.display.sleep.start_time, 82800)
         self.assertEqual(config.config.display.sleep.duration, 25200)
+        self.assertTrue(config.config.display.light_sleep)
 
         self.assertEqual(config.cache.channel, "21")
         self.assertEqual(config.cache.pan_id, "8888")
@@ -178,12 +183,15 @@ class TestWMConfig(unittest.TestCase):
         self.assertEqual(config.config.wattmeter.max.watt, 3000)
         self.assertIsNone(config.config.wattmeter.warning)
         self.assertIsNone(config.config.wattmeter.caution)
+        self.assertIsNone(config.config.wattmeter.demand)
         self.assertEqual(config.config.wattmeter.update_interval, 30)
+        self.assertIsNone(config.config.wattmeter.adaptive_interval)
         self.assertEqual(config.config.wattmeter.beep_volume, 3)
         self.assertTrue(config.config.wattmeter.auto_reboot)
         self.assertFalse(config.config.wattmeter.sync_cache)
         self.assertEqual(config.config.display.brightness, 50)
         self.assertIsNone(config.config.display.sleep)
+        self.assertFalse(config.config.display.light_sleep)
 
         self.assertIsNone(config.cache.channel)
         self.assertIsNone(config.cache.pan_id)
@@ -589,6 +597,88 @@ class TestWMConfig(unittest.TestCase):
             self.assertIn("wattmeter.caution.watt", str(cm.exception))
             self.assertIn("wattmeter.warning.watt", str(cm.exception))
 
+    def test_load_wattmeter_adaptive_interval_min_greater_than_max(self):
+        uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
+
+        config = wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_config_path = os.path.join(tmpdir, "config_invalid.json")
+            config.CONFIG_FILE_PATH = tmp_config_path
+            config.CACHE_FILE_PATH = self.getAssetFilePath("notexists.json")
+
+            config_min = self.getAssetJson("config_min.json")
+            config_min["wattmeter"]["adaptive_interval"] = {
+                "min": 60,
+                "max": 30
+            }
+            with open(tmp_config_path, "w") as f:
+                json.dump(config_min, f)
+
+            with self.assertRaises(wmconfig.InvalidConfigError) as cm:
+                config.load()
+            self.assertIn("wattmeter.adaptive_interval.min", str(cm.exception))
+            self.assertIn("wattmeter.adaptive_interval.max", str(cm.exception))
+
+    def test_load_wattmeter_adaptive_interval_not_int(self):
+        uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
+
+        config = wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_config_path = os.path.join(tmpdir, "config_invalid.json")
+            config.CONFIG_FILE_PATH = tmp_config_path
+            config.CACHE_FILE_PATH = self.getAssetFilePath("notexists.json")
+
+            config_min = self.getAssetJson("config_min.json")
+            config_min["wattmeter"]["adaptive_interval"] = {
+                "min": 5
+            }
+            with open(tmp_config_path, "w") as f:
+                json.dump(config_min, f)
+
+            with self.assertRaises(wmconfig.InvalidConfigError) as cm:
+                config.load()
+            self.assertIn("wattmeter.adaptive_interval.max must be an integer", str(cm.exception))
+
+    def test_load_wattmeter_demand_watt_not_int(self):
+        uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
+
+        config = wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_config_path = os.path.join(tmpdir, "config_invalid.json")
+            config.CONFIG_FILE_PATH = tmp_config_path
+            config.CACHE_FILE_PATH = self.getAssetFilePath("notexists.json")
+
+            config_min = self.getAssetJson("config_min.json")
+            config_min["wattmeter"]["demand"] = {
+                "watt": "1800"
+            }
+            with open(tmp_config_path, "w") as f:
+                json.dump(config_min, f)
+
+            with self.assertRaises(wmconfig.InvalidConfigError) as cm:
+                config.load()
+            self.assertIn("wattmeter.demand.watt must be an integer", str(cm.exception))
+
+    def test_load_wattmeter_demand_watt_too_small(self):
+        uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
+
+        config = wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_config_path = os.path.join(tmpdir, "config_invalid.json")
+            config.CONFIG_FILE_PATH = tmp_config_path
+            config.CACHE_FILE_PATH = self.getAssetFilePath("notexists.json")
+
+            config_min = self.getAssetJson("config_min.json")
+            config_min["wattmeter"]["demand"] = {
+                "watt": 0
+            }
+            with open(tmp_config_path, "w") as f:
+                json.dump(config_min, f)
+
+            with self.assertRaises(wmconfig.InvalidConfigError) as cm:
+                config.load()
+            self.assertIn("wattmeter.demand.watt must be greater than 0", str(cm.exception))
+
     def test_load_wattmeter_display_brightness_not_int(self):
         uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
 
@@ -609,6 +699,26 @@ class TestWMConfig(unittest.TestCase):
                 config.load()
             self.assertIn("display.brightness must be an integer", str(cm.exception))
 
+    def test_load_wattmeter_display_light_sleep_not_bool(self):
+        uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
+
+        config = wmconfig.WMConfig(ujson=ujson, uos=uos, logging=logging)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_config_path = os.path.join(tmpdir, "config_invalid.json")
+            config.CONFIG_FILE_PATH = tmp_config_path
+            config.CACHE_FILE_PATH = self.getAssetFilePath("notexists.json")
+
+            config_min = self.getAssetJson("config_min.json")
+            config_min["display"] = {
+                "light_sleep": 1
+            }
+            with open(tmp_config_path, "w") as f:
+                json.dump(config_min, f)
+
+            with self.assertRaises(wmconfig.InvalidConfigError) as cm:
+                config.load()
+            self.assertIn("display.light_sleep must be a boolean", str(cm.exception))
+
     def test_load_wattmeter_display_brightness_too_small(self):
         uos.ADD_ENTRIES.append(("config_invalid.json", 0x8000, 0))
 
@@ -9,8 +9,7 @@ class M5Wattmeter:
     Examples
     --------
     from m5stack import lcd, axp, speaker
-    from machine import UART
-    import utime, ujson, uos, wifiCfg, ntptime
+    import machine, utime, ujson, uos, wifiCfg, ntptime, uheapq, uasyncio, array
     from wmlogging import Logger as logging
 
     logging.basicConfig(
@@ -20,17 +19,24 @@ class M5Wattmeter:
 
     wm = M5Wattmeter(
         vlcd=VirtualLCD(lcd=lcd, axp=axp),
-        client=BP35A1Client(uart=UART, utime=utime, logging=logging),
+        client=AsyncBP35A1Client(uart=machine.UART, utime=utime, logging=logging, uasyncio=uasyncio),
         config=WMConfig(ujson=ujson, uos=uos, logging=logging),
         logging=logging,
         wifiCfg=wifiCfg,
         utime=utime,
         ntptime=ntptime,
-        speaker=speaker
+        speaker=speaker,
+        heapq=uheapq,
+        uasyncio=uasyncio,
+        machine=machine,
+        array=array
     )
 
     wm.prepare()
-    wm.startTaskLoop()
+    uasyncio.run(wm.runTaskLoop())
+
+    uasyncio v3 (MicroPython 1.13以降) を使用できない場合は
+    uasyncio=None とBP35A1Clientを渡して startTaskLoop() でタスクを実行する
 
     Attributes
     ----------
@@ -48,16 +54,29 @@ class M5Wattmeter:
         execScan() (SKSCAN)失敗時のリトライ回数
     JOIN_RETRY : int
         execJoin() (SKJOIN)失敗時のリトライ回数
-    TASK_LOOP_WAIT_SEC : int
-        タスク実行ループの1ループごとの待機時間(秒)
+    TASK_LOOP_MAX_WAIT_SEC : int
+        タスク実行ループの1ループごとの最大の待機時間(秒)
+        通常は次のタスクの起動時刻まで待機するがそれが長い場合でもこの時間で1度ループする
     NTP_UPDATE_INTERVAL : int
         NTPとの時刻同期を行う間隔(秒)
-    DISPLAY_UPDATE_INTERVAL : int
-        ディスプレイ(LCD)の表示を更新する間隔(秒)
+    CLOCK_UPDATE_INTERVAL : int
+        表示する時刻を更新する間隔(秒)
+        時刻(utime.time())がこの秒数で割り切れる時に更新する
+    NOTIFICATION_INTERVAL : int
+        スマートメータからのプロパティ値通知を処理する間隔(秒)
     CACHE_SYNC_DELAY : int
         キャッシュを書き込むまでの遅延時間(秒)
         ボタンを押して表示を切り替えた後に設定内容をキャッシュに書き込むまでの待機時間
         ボタンが続けて押された場合に都度キャッシュ書き込みが行われないよう待機する
+    VOLATILITY_WATT : int
+        消費電力量の取得間隔を短くする変化量(W)
+        wattmeter.adaptive_interval を設定した場合に使用する
+    VOLATILITY_RATIO : float
+        消費電力量の取得間隔を短くする変化率
+        前回の値からの変化が VOLATILITY_WATT とこの割合の大きい方以上の場合に間隔を短くする
+    THRESHOLD_MARGIN : float
+        消費電力量の取得間隔を短くする注意・警告・需要電力の設定値からの割合
+        設定値にこの割合を減じた値以上の場合は間隔を短くする
     """
 
     WIFI_CONNECT_TIMEOUT = 15
@@ -68,12 +87,19 @@ class M5Wattmeter:
 
     JOIN_RETRY = 3
 
+    TASK_LOOP_MAX_WAIT_SEC = 60
+
     NTP_UPDATE_INTERVAL = 86400  # 24時間
-    DISPLAY_UPDATE_INTERVAL = 5
+    CLOCK_UPDATE_INTERVAL = 60
+    NOTIFICATION_INTERVAL = 5
 
     CACHE_SYNC_DELAY = 60
 
-    def __init__(self, *, vlcd, client, config, logging, wifiCfg, utime, ntptime, speaker):
+    VOLATILITY_WATT = 100
+    VOLATILITY_RATIO = 0.1
+    THRESHOLD_MARGIN = 0.1
+
+    def __init__(self, *, vlcd, client, config, logging, wifiCfg, utime, ntptime, speaker, heapq, uasyncio=None, machine=None, array=None):
         """
         Parameters
         ----------
@@ -93,6 +119,21 @@ class M5Wattmeter:
             ntptimeモジュール
         speaker : object
             m5stack.speaker
+        heapq : object
+            uheapqモジュール
+            タスクの待ち行列に使用する
+        uasyncio : object | None
+            uasyncioモジュール
+            指定した場合はclientにAsyncBP35A1Clientを渡して runTaskLoop() でタスクを実行する
+            Noneの場合は execLaunchableTask() でタスクを実行する
+        machine : object | None
+            machineモジュール
+            指定した場合は display.light_sleep の設定に従い
+            ディスプレイ消灯中のタスクの待機に machine.lightsleep() を使用する
+            ライトスリープを使用する場合はスマートメータからのプロパティ値通知を受け取らない
+        array : object | None
+            arrayモジュール
+            指定した場合は消費電力量の時系列と統計値を記録する
         """
         self.vlcd = vlcd
         self.client = client
@@ -102,13 +143,28 @@ class M5Wattmeter:
         self.utime = utime
         self.ntptime = ntptime
         self.speaker = speaker
+        self.heapq = heapq
+        self.uasyncio = uasyncio
+        self.machine = machine
 
         self.ntp_client = None
-        self._tasks = []
-        self._state = WMState(config=config)
+        self._tasks = []  # [起動時刻, 追加順, タスク] のヒープ
+        self._task_keys = {}  # keyを指定したタスク
+        self._task_sequence = 0
+        self._clock_ms = 0  # タスクの起動時刻の基準となる経過時間(ミリ秒)
+        self._clock_ticks = None
+        self._state = WMState(config=config, array=array)
         self._display_sleep = False
         self._scheduled_sleeping = False
         self._prepared = False
+        self._notification_registered = False
+        self._task_error = None
+        self._running_coroutines = 0  # 実行中のコルーチンのタスク数
+        self._update_task = None  # 消費電力量取得タスク
+        self._update_interval = None  # 消費電力量の取得間隔(秒)
+        self._last_polled_watt = None
+        self._display_observed = False
+        self._task_loop_event = None if uasyncio is None else uasyncio.Event()
 
     def _prepareWiFi(self):
         """
@@ -166,6 +222,8 @@ class M5Wattmeter:
             # 一度時刻同期していれば大幅に狂うことはないという前提で
             # エラーの記録だけ行いタスクループの停止(例外の送出)はしない
             self.logging.e(e)
+        # 修正された時刻で表示する時刻の更新時刻を計算し直す
+        self._updateClock()
 
     def _prepareClient(self, force_scan=False):
         """
@@ -278,6 +336,12 @@ class M5Wattmeter:
 
         self.vlcd.showProgress(22 / total_steps, "Device ready")
         self.client.setPowerConsumptionCalcParams(factor=cache.factor, unit=cache.unit)
+        if self._isLightSleepEnabled():
+            # ライトスリープ中に届いた通知は失われるため通知は受け取らず定期取得の値のみ使用する
+            self.logging.info("light sleep enabled: notifications are not used")
+        elif not self._notification_registered:
+            self.client.addNotificationCallback(self._receiveNotification)
+            self._notification_registered = True
         self.config.saveCacheIfChanged()
 
     def _prepareTask(self):
@@ -286,21 +350,28 @@ class M5Wattmeter:
         """
         # 時刻定期更新タスク
         self.addTask(
-            launch_time=self.utime.time()+self.NTP_UPDATE_INTERVAL,
+            delay=self.NTP_UPDATE_INTERVAL,
             func=self._updateTime,
             interval=self.NTP_UPDATE_INTERVAL
         )
         # 消費電力量取得
-        self.addTask(
-            launch_time=10,
-            func=self._updateCurrentPowerConsumption,
-            interval=self.config.config.wattmeter.update_interval
+        self._update_interval = self.config.config.wattmeter.update_interval
+        self._update_task = self.addTask(
+            delay=0,
+            func=self._updateCurrentPowerConsumption if self.uasyncio is None else self._updateCurrentPowerConsumptionAsync,
+            interval=self._update_interval
         )
-        # ディスプレイ更新
+        # ディスプレイ更新(表示内容が変化した時)
+        if not self._display_observed:
+            self._state.addObserver(self._requestDisplayUpdate)
+            self._display_observed = True
+        # 表示する時刻の更新
+        self._updateClock()
+        # プロパティ値通知の処理
         self.addTask(
-            launch_time=11,
-            func=self._updateDisplay,
-            interval=self.DISPLAY_UPDATE_INTERVAL
+            delay=0,
+            func=self._processNotifications if self.uasyncio is None else self._processNotificationsAsync,
+            interval=self.NOTIFICATION_INTERVAL
         )
         # sleep設定
         self._addScheduledSleepTask()
@@ -360,7 +431,8 @@ class M5Wattmeter:
         外部への表示内容の更新を行う
 
         現在の状態をもとにディスプレイ表示の更新を行う
-        表示内容に変化があると更新するのではなく定期的に現在(最新)の状態をもとに更新する
+        状態の表示内容が変化した時に _requestDisplayUpdate() からタスクとして実行される
+        ディスプレイが消灯している間は描画せず状態の確認のみ行う
         メソッド名は"display"だがBeep音もここで鳴らしている
 
         現在の状態が注意や警告に悪化した場合は
@@ -368,8 +440,8 @@ class M5Wattmeter:
         * ディスプレイが消灯している場合 → 点灯する
         * Beepの設定がある → Beep音を鳴らす
         """
-        self._state.setTime(self.utime.localtime())
-        self.vlcd.update(self._state)
+        if not self._display_sleep:
+            self.vlcd.update(self._state)
 
         if self._scheduled_sleeping:
             return
@@ -379,7 +451,9 @@ class M5Wattmeter:
             self.toggleSleep()  # Wake up
 
         if self._state.isStatusCaution():
-            if self.config.config.wattmeter.caution and self.config.config.wattmeter.caution.beep:
+            caution = self.config.config.wattmeter.caution
+            demand = self.config.config.wattmeter.demand
+            if (caution and caution.beep) or (demand and demand.beep and self._state.isDemandExceeded()):
                 # Caution beep
                 self.beep((523, 100), (None, 80), (659, 100))
         elif self._state.isStatusWarning():
@@ -387,18 +461,166 @@ class M5Wattmeter:
                 # Warning beep
                 self.beep((523, 100), (None, 80), (659, 100), (None, 80), (784, 100))
 
+    def _requestDisplayUpdate(self, state):
+        """
+        ディスプレイ更新のタスクを追加する
+
+        WMStateの表示内容が変化した時に呼び出される
+        続けて変化した場合も実行待ちのタスクに1つにまとめる
+
+        Parameters
+        ----------
+        state : object
+            表示内容が変化したWMStateオブジェクト
+        """
+        self.addTask(delay=0, func=self._updateDisplay, key="updateDisplay")
+        # 待機中のタスク実行ループがすぐに描画するように再開させる
+        self.interruptTaskLoop()
+
+    def _updateClock(self):
+        """
+        表示する時刻を更新する
+
+        現在の時刻を設定して次の CLOCK_UPDATE_INTERVAL 秒の区切りに再度実行する
+        分が変わると表示内容の変化としてディスプレイが更新される
+        """
+        timestamp = self.utime.time()
+        self._state.setTime(self.utime.localtime(timestamp))
+        self.addWallClockTask(
+            timestamp=timestamp - timestamp % self.CLOCK_UPDATE_INTERVAL + self.CLOCK_UPDATE_INTERVAL,
+            func=self._updateClock,
+            key="updateClock"
+        )
+
     def _updateCurrentPowerConsumption(self):
         """
         現在の消費電力量を更新する
 
-        現在の消費電力量を取得して更新する
+        瞬時電力計測値と積算電力量計測値を1回の問い合わせで取得して更新する
+        積算電力量計測値は需要電力の予測の補正に使用する
+        """
+        try:
+            self._setMeasurements(self.client.execGetMeasurements())
+        except Exception as e:
+            self._state.reportError(e)
+            self.logging.exception(e)
+
+    async def _updateCurrentPowerConsumptionAsync(self):
+        """
+        現在の消費電力量を更新する
+
+        _updateCurrentPowerConsumption() のコルーチン版
         """
         try:
-            self._state.setCurrentWatt(self.client.execGetCurrentPowerConsumption())
+            self._setMeasurements(await self.client.execGetMeasurementsAsync())
         except Exception as e:
             self._state.reportError(e)
             self.logging.exception(e)
 
+    def _setMeasurements(self, measurements):
+        """
+        スマートメータから取得した計測値を設定する
+
+        Parameters
+        ----------
+        measurements : dict
+            BP35A1Client.execGetMeasurements() の戻り値
+
+        Raises
+        ------
+        WiSUNError
+            瞬時電力計測値を取得できなかった場合に発生する
+        """
+        if measurements["watt"] is None:
+            # 瞬時電力を取得できなかった場合は表示や統計値を更新しない
+            raise WiSUNError("Current power consumption is not available.")
+        timestamp = self.utime.time()
+        self._state.setCurrentWatt(measurements["watt"], timestamp)
+        if measurements["power"] is not None:
+            self._state.setIntegralPowerConsumption(measurements["power"], timestamp)
+        self._adaptUpdateInterval()
+
+    def _adaptUpdateInterval(self):
+        """
+        消費電力量の取得間隔を調整する
+
+        wattmeter.adaptive_interval が設定されている場合に
+        消費電力量の変化が大きい場合や注意・警告・需要電力の設定値に近い場合は最短の間隔にし、
+        そうでない場合は最長の間隔まで取得ごとに間隔を2倍に延ばす
+        消費電力量を取得できなかった場合や比較する前回の値がない場合は間隔を変更しない
+        """
+        adaptive = self.config.config.wattmeter.adaptive_interval
+        watt = self._state.getCurrentWatt()
+        if watt is None:
+            # 取得できなかった回は前回の値を残して次の取得時に比較する
+            return
+        previous = self._last_polled_watt
+        self._last_polled_watt = watt
+        if adaptive is None or self._update_task is None or previous is None:
+            return
+
+        hurry = False
+        change = watt - previous if watt > previous else previous - watt
+        if change >= max(self.VOLATILITY_WATT, previous * self.VOLATILITY_RATIO):
+            hurry = True
+        config_wm = self.config.config.wattmeter
+        for threshold in (config_wm.caution, config_wm.warning):
+            if threshold is not None and watt >= threshold.watt * (1 - self.THRESHOLD_MARGIN):
+                hurry = True
+        if config_wm.demand is not None:
+            forecast = self._state.getDemandForecast()
+            if forecast is not None and forecast >= config_wm.demand.watt * (1 - self.THRESHOLD_MARGIN):
+                hurry = True
+
+        if hurry:
+            interval = adaptive.min
+        else:
+            interval = min(self._update_interval * 2, adaptive.max)
+        if interval != self._update_interval:
+            self.logging.debug("update interval: " + str(interval))
+            self._update_interval = interval
+            self.setTaskInterval(self._update_task, interval)
+
+    def _processNotifications(self):
+        """
+        スマートメータからのプロパティ値通知を処理する
+        """
+        try:
+            self.client.processNotifications()
+        except Exception as e:
+            self.logging.exception(e)
+
+    async def _processNotificationsAsync(self):
+        """
+        スマートメータからのプロパティ値通知を処理する
+
+        _processNotifications() のコルーチン版
+        """
+        try:
+            await self.client.processNotificationsAsync()
+        except Exception as e:
+            self.logging.exception(e)
+
+    def _receiveNotification(self, epc, value):
+        """
+        スマートメータからのプロパティ値通知を受け取る
+
+        30分毎に通知される定時積算電力量計測値(EPC=0xEA)を保持して
+        需要電力の予測の起点とする
+
+        Parameters
+        ----------
+        epc : int
+            通知されたプロパティ
+        value : dict | int | None
+            通知された値
+        """
+        if epc == 0xEA and value is not None:
+            self.logging.debug("last 30 minutes power consumption: " + str(value))
+            self._state.setLast30MinutesPowerConsumption(value)
+            timestamp = self.utime.mktime((value["year"], value["mon"], value["mday"], value["hour"], value["min"], value["sec"], 0, 0))
+            self._state.setIntegralPowerConsumption(value["power"], timestamp)
+
     def _addScheduledSleepTask(self):
         """
         時間によるディスプレイの消灯/点灯タスクを追加する
@@ -412,26 +634,45 @@ class M5Wattmeter:
         day_start_timestamp = self.utime.mktime((year, month, mday, 0, 0, 0, 0, 0))
         if day_start_timestamp + sleep.start_time > timestamp:
             # スリープ開始時刻以前→スリープタスク追加
-            self.addTask(
-                launch_time=day_start_timestamp + sleep.start_time,
+            self.addWallClockTask(
+                timestamp=day_start_timestamp + sleep.start_time,
                 func=self.scheduledSleep,
-                interval=None
+                key="scheduledSleep"
             )
         elif day_start_timestamp + sleep.start_time + sleep.duration > timestamp:
             # スリープ開始時刻以降終了時刻未満→ウェイクアップタスク追加
-            self.addTask(
-                launch_time=day_start_timestamp + sleep.start_time + sleep.duration,
+            self.addWallClockTask(
+                timestamp=day_start_timestamp + sleep.start_time + sleep.duration,
                 func=self.scheduledWakeUp,
-                interval=None
+                key="scheduledSleep"
             )
         else:
             # スリープ終了時刻以降→翌日のスリープタスク追加
-            self.addTask(
-                launch_time=day_start_timestamp + sleep.start_time + 86400,
+            self.addWallClockTask(
+                timestamp=day_start_timestamp + sleep.start_time + 86400,
                 func=self.scheduledSleep,
-                interval=None
+                key="scheduledSleep"
             )
 
+    def _now(self):
+        """
+        タスクの起動時刻の基準となる現在の経過時間を取得する
+
+        utime.ticks_ms() の差分を積算した値を使用する
+        NTPによる時刻の修正の影響を受けずticks_ms()の桁あふれ(ラップアラウンド)があっても単調に増加する
+        桁あふれの周期の半分以上呼び出されない場合は正しく計算できないがタスクループで定期的に呼び出される
+
+        Returns
+        -------
+        int
+            経過時間(ミリ秒)
+        """
+        ticks = self.utime.ticks_ms()
+        if self._clock_ticks is not None:
+            self._clock_ms += self.utime.ticks_diff(ticks, self._clock_ticks)
+        self._clock_ticks = ticks
+        return self._clock_ms
+
     def _getTask(self, time):
         """
         指定した時間で実行すべきタスクをひとつ取得する
@@ -441,8 +682,8 @@ class M5Wattmeter:
         Parameters
         ----------
         time : int
-            タイムスタンプ
-            起動時刻が指定タイムスタンプ以前の最も起動時間が小さいタスクをひとつ取得する
+            _now() の経過時間(ミリ秒)
+            起動時刻が指定時間以前の最も起動時間が小さいタスクをひとつ取得する
 
         Returns
         -------
@@ -450,38 +691,210 @@ class M5Wattmeter:
             実行すべきタスク
             タスクがない場合はNone
         """
-        if len(self._tasks) < 1:
-            return None
-        if self._tasks[0]["t"] > time:
-            return None
-        return self._tasks.pop(0)
-
-    def addTask(self, *, launch_time, func, interval=None):
+        tasks = self._tasks
+        while len(tasks) > 0:
+            if tasks[0][2] is None:
+                # 取り消されたタスク
+                self.heapq.heappop(tasks)
+                continue
+            if tasks[0][0] > time:
+                return None
+            task = self.heapq.heappop(tasks)[2]
+            task["e"] = None
+            if task["k"] is not None and self._task_keys.get(task["k"]) is task:
+                del self._task_keys[task["k"]]
+            return task
+        return None
+
+    def addTask(self, *, delay, func, interval=None, key=None):
         """
         タスクを追加する
 
+        タスクの起動時刻は utime.ticks_ms() をもとにした経過時間で管理する
+        NTPによる時刻の修正で実行間隔が乱れないよう時刻(utime.time())は使用しない
+
+        keyを指定した場合は同じkeyの実行待ちのタスクを置き換える
+        ボタン操作のたびに追加される遅延実行のタスクなどを1つにまとめるために使用する
+
         Parameters
         ----------
-        launch_time : int
-            タスクを実行するタイムスタンプ
-            即座(次のループ)に実行したい場合は0など十分に小さい数を指定する
+        delay : int | float
+            タスクを実行するまでの時間(秒)
+            即座(次のループ)に実行したい場合は0を指定する
         func : function
             実行するタスクの関数
             例外のハンドリングは関数内で行う(例外が投げられると以後の処理は全て止まる)
-        interval : int | None
-            タスクを繰り返し実行する場合の間隔
+            uasyncioを使用する場合はコルーチン関数も指定できる
+        interval : int | float | None
+            タスクを繰り返し実行する場合の間隔(秒)
             指定した秒数の間隔でタスクを繰り返し実行する
-            間隔はタスクの実行開始時から計算される(launch_timeや終了時点してからではない)
+            間隔は予定していた起動時刻から計算される(実際の実行開始時や終了時点からではない)
+            実行が遅れて起動時刻を過ぎた回は飛ばす
             Noneの場合は繰り返さない(1度だけ実行)
+        key : str | None
+            タスクを識別する名前
+            同じkeyのタスクが実行待ちの場合はそのタスクの起動時刻と内容を置き換える
+
+        Returns
+        -------
+        dict
+            追加したタスク
+            cancelTask(), rescheduleTask() に使用する
         """
+        launch_time = self._now() + int(delay * 1000)
+        if interval is not None:
+            interval = int(interval * 1000)
+        task = self._task_keys.get(key) if key is not None else None
+        if task is not None:
+            task["f"] = func
+            task["i"] = interval
+            self._scheduleTask(task, launch_time)
+            return task
         task = {
-            "t": launch_time,
+            "t": launch_time,  # 起動時刻(_now()の経過時間)
             "f": func,
-            "i": interval
+            "i": interval,  # 繰り返し間隔(ミリ秒)
+            "k": key,
+            "e": None,  # 待ち行列のエントリ
+            "c": False  # 取り消し済み
         }
         self.logging.debug(task)
-        self._tasks.append(task)
-        self._tasks.sort(key=lambda task: task["t"])
+        self._pushTask(task)
+        if key is not None:
+            self._task_keys[key] = task
+        return task
+
+    def addWallClockTask(self, *, timestamp, func, key=None):
+        """
+        指定した時刻に1度だけ実行するタスクを追加する
+
+        時刻(utime.time())を経過時間に変換して追加する
+        時間によるディスプレイの消灯/点灯など時刻を基準とするタスクに使用する
+
+        Parameters
+        ----------
+        timestamp : int
+            タスクを実行するタイムスタンプ
+        func : function
+            実行するタスクの関数
+        key : str | None
+            タスクを識別する名前
+
+        Returns
+        -------
+        dict
+            追加したタスク
+        """
+        delay = timestamp - self.utime.time()
+        return self.addTask(delay=delay if delay > 0 else 0, func=func, interval=None, key=key)
+
+    def _pushTask(self, task):
+        """
+        タスクを待ち行列に追加する
+
+        Parameters
+        ----------
+        task : dict
+            追加するタスク
+        """
+        self._task_sequence += 1
+        entry = [task["t"], self._task_sequence, task]
+        task["e"] = entry
+        self.heapq.heappush(self._tasks, entry)
+
+    def cancelTask(self, task):
+        """
+        タスクを取り消す
+
+        繰り返しのタスクの場合は以後の繰り返しも行わない
+
+        Parameters
+        ----------
+        task : dict
+            addTask() で追加したタスク
+        """
+        task["c"] = True
+        if task["e"] is not None:
+            # 待ち行列からの削除は取り出す時に行う
+            task["e"][2] = None
+            task["e"] = None
+        if task["k"] is not None and self._task_keys.get(task["k"]) is task:
+            del self._task_keys[task["k"]]
+
+    def rescheduleTask(self, task, delay):
+        """
+        タスクの起動時刻を変更する
+
+        Parameters
+        ----------
+        task : dict
+            addTask() で追加したタスク
+        delay : int | float
+            タスクを実行するまでの時間(秒)
+        """
+        self._scheduleTask(task, self._now() + int(delay * 1000))
+
+    def setTaskInterval(self, task, interval):
+        """
+        繰り返しのタスクの実行間隔を変更する
+
+        待ち行列にある場合は前回の起動時刻から新しい間隔で次の起動時刻を計算し直す
+        (既に過ぎている場合は即座に実行する)
+
+        Parameters
+        ----------
+        task : dict
+            addTask() で追加したタスク
+        interval : int | float
+            タスクを繰り返し実行する間隔(秒)
+        """
+        interval = int(interval * 1000)
+        if task["e"] is not None and task["i"] is not None:
+            launch_time = task["t"] - task["i"] + interval
+            now = self._now()
+            self._scheduleTask(task, launch_time if launch_time > now else now)
+        task["i"] = interval
+
+    def _scheduleTask(self, task, launch_time):
+        """
+        タスクの起動時刻を設定して待ち行列に追加する
+
+        待ち行列にある場合は以前の起動時刻のエントリを取り消す
+
+        Parameters
+        ----------
+        task : dict
+            addTask() で追加したタスク
+        launch_time : int
+            起動時刻(_now()の経過時間)
+        """
+        if task["e"] is not None:
+            task["e"][2] = None
+        task["t"] = launch_time
+        task["c"] = False
+        self._pushTask(task)
+        if task["k"] is not None:
+            self._task_keys[task["k"]] = task
+
+    def getNextTaskDelay(self):
+        """
+        次のタスクの起動時刻までの時間を取得する
+
+        Returns
+        -------
+        int | None
+            次のタスクの起動時刻までの時間(ミリ秒)
+            起動時刻を過ぎたタスクがある場合は0
+            タスクがない場合はNone
+        """
+        tasks = self._tasks
+        while len(tasks) > 0 and tasks[0][2] is None:
+            # 取り消されたタスク
+            self.heapq.heappop(tasks)
+        if len(tasks) < 1:
+            return None
+        delay = tasks[0][0] - self._now()
+        return delay if delay > 0 else 0
 
     def execLaunchableTask(self):
         """
@@ -493,22 +906,157 @@ class M5Wattmeter:
             タスクが実行された場合はTrue
             実行すべきタスクがなかった場合はFalse
         """
-        timestamp = self.utime.time()
-        task = self._getTask(timestamp)
+        now = self._now()
+        task = self._getTask(now)
         if task is None:
             return False
-        self.logging.debug(timestamp)
+        self.logging.debug(now)
         try:
-            task["f"]()
+            result = task["f"]()
+            if self.uasyncio is not None and hasattr(result, "send"):
+                # コルーチンは完了を待たずにイベントループのタスクとして実行する
+                self._running_coroutines += 1
+                self.uasyncio.create_task(self._runTaskCoroutine(result))
         finally:
-            if task["i"] is not None:
-                self.addTask(
-                    launch_time=timestamp+task["i"],
-                    func=task["f"],
-                    interval=task["i"]
-                )
+            if task["i"] is not None and not task["c"] and task["e"] is None:
+                # 予定の起動時刻を基準に次の起動時刻を決める(遅れて過ぎた回は飛ばす)
+                interval = task["i"]
+                launch_time = task["t"] + interval
+                if launch_time <= now and interval > 0:
+                    launch_time += (now - launch_time) // interval * interval + interval
+                self._scheduleTask(task, launch_time)
         return True
 
+    async def _runTaskCoroutine(self, coroutine):
+        """
+        コルーチンのタスクを実行する
+
+        タスク内で発生した例外は runTaskLoop() から送出する
+
+        Parameters
+        ----------
+        coroutine : object
+            実行するコルーチン
+        """
+        try:
+            await coroutine
+        except Exception as e:
+            self._task_error = e
+            self.interruptTaskLoop()
+        finally:
+            self._running_coroutines -= 1
+
+    def _isLightSleepEnabled(self):
+        """
+        設定でライトスリープが有効になっているか判定する
+
+        Returns
+        -------
+        bool
+            machineが指定されていて display.light_sleep が有効な場合はTrue
+        """
+        if self.machine is None:
+            return False
+        display = self.config.config.display
+        return display is not None and display.light_sleep is True
+
+    def _canLightSleep(self):
+        """
+        タスクの待機にライトスリープを使用できるか判定する
+
+        ディスプレイが消灯していてスマートメータの応答を待っているタスクがない場合に使用できる
+        ライトスリープ中はUARTの受信ができないため応答待ちの間は使用しない
+        同じ理由でスマートメータからのプロパティ値通知(ERXUDP)も失われるため
+        通知を受け取る関数が登録されている間は使用しない
+        ライトスリープを有効にした場合は prepare() で通知を受け取る関数を登録せず
+        定時積算電力量などは消費電力量の定期取得の値のみで更新する
+        Wi-SUNモジュールはライトスリープ中も動作しているためセッションは維持される
+
+        Returns
+        -------
+        bool
+            ライトスリープを使用できる場合はTrue
+        """
+        if not self._display_sleep or self._running_coroutines > 0 or self._notification_registered:
+            return False
+        return self._isLightSleepEnabled()
+
+    async def runTaskLoop(self):
+        """
+        タスクを実行し続ける
+
+        起動可能なタスクを実行して次のタスクの起動時刻まで待機することを繰り返す
+        待機中でも interruptTaskLoop() が呼び出された場合はすぐにループする
+        ライトスリープを使用できる場合は machine.lightsleep() で待機する(ボタン操作などで起床する)
+        コルーチンのタスクはイベントループの中で並行して実行されるため
+        スマートメータの応答を待つ間もディスプレイ更新などの他のタスクが実行される
+
+        Raises
+        ------
+        Exception
+            タスク内で処理されなかった例外
+        """
+        uasyncio = self.uasyncio
+        event = self._task_loop_event
+        max_wait = self.TASK_LOOP_MAX_WAIT_SEC * 1000
+        while True:
+            # タスクの実行中に再開の要求があった場合も待機しないようにタスクの実行前にクリアする
+            event.clear()
+            while self.execLaunchableTask():
+                pass
+            if self._task_error is not None:
+                raise self._task_error
+            delay = self.getNextTaskDelay()
+            if delay is None or delay > max_wait:
+                delay = max_wait
+            if self._canLightSleep():
+                self.machine.lightsleep(delay)
+                # 起床後はイベントループの他のタスクに制御を渡してから次のタスクを確認する
+                await uasyncio.sleep_ms(0)
+                continue
+            try:
+                await uasyncio.wait_for_ms(event.wait(), delay)
+            except uasyncio.TimeoutError:
+                pass
+
+    def startTaskLoop(self):
+        """
+        タスクを実行し続ける
+
+        runTaskLoop() の同期版
+        uasyncio v3 を使用できない環境(UIFlow 1.11.5 / MicroPython 1.12)で使用する
+        次のタスクの起動時刻まで utime.sleep_ms() で1度だけ待機する
+        待機は interruptTaskLoop() で中断されないがボタン操作による表示の変更は
+        ボタンの処理の中で描画されるため待機の終了を待たない
+        スマートメータの応答待ちの間は他のタスクは実行されない
+
+        Raises
+        ------
+        Exception
+            タスク内で処理されなかった例外
+        """
+        max_wait = self.TASK_LOOP_MAX_WAIT_SEC * 1000
+        while True:
+            while self.execLaunchableTask():
+                pass
+            delay = self.getNextTaskDelay()
+            if delay is None or delay > max_wait:
+                delay = max_wait
+            if self._canLightSleep():
+                self.machine.lightsleep(delay)
+            else:
+                self.utime.sleep_ms(delay)
+
+    def interruptTaskLoop(self):
+        """
+        待機中のタスク実行ループを再開させる
+
+        ボタン操作などでタスクを追加した場合に次のタスクの起動時刻を計算し直すために呼び出す
+        runTaskLoop() を使用していない場合は何もしない
+        """
+        if self._task_loop_event is not None:
+            self._task_loop_event.set()
+
     def toggleSleep(self):
         """
         ディスプレイの点灯と消灯を交互に切り替える
@@ -521,10 +1069,12 @@ class M5Wattmeter:
         if self._display_sleep:
             self.logging.info("Wake up")
             self.vlcd.wakeUp()
+            self._display_sleep = False
+            self._renderDisplay()
         else:
             self.logging.info("Sleep")
             self.vlcd.sleep()
-        self._display_sleep = not self._display_sleep
+            self._display_sleep = True
         return self._display_sleep
 
     def scheduledSleep(self):
@@ -545,8 +1095,20 @@ class M5Wattmeter:
         self.vlcd.wakeUp()
         self._display_sleep = False
         self._scheduled_sleeping = False
+        self._renderDisplay()
         self._addScheduledSleepTask()
 
+    def _renderDisplay(self):
+        """
+        現在の状態をすぐにディスプレイに描画する
+
+        消灯中に描画を止めていたディスプレイを点灯した際に使用する
+        準備が完了していない場合は描画しない(準備中の進捗表示を上書きしないため)
+        """
+        if not self._prepared or self._display_sleep:
+            return
+        self.vlcd.update(self._state)
+
     def toggleFlip(self):
         """
         ディスプレイの上下を反転する
@@ -562,9 +1124,10 @@ class M5Wattmeter:
             self._updateDisplay()
         if self.config.config.wattmeter.sync_cache:
             self.addTask(
-                launch_time=self.utime.time()+self.CACHE_SYNC_DELAY,
+                delay=self.CACHE_SYNC_DELAY,
                 func=self.config.saveCacheIfChanged,
-                interval=None
+                interval=None,
+                key="saveCache"
             )
 
     def beep(self, *args):
@@ -601,9 +1164,10 @@ class M5Wattmeter:
             self._updateDisplay()
         if self.config.config.wattmeter.sync_cache:
             self.addTask(
-                launch_time=self.utime.time()+self.CACHE_SYNC_DELAY,
+                delay=self.CACHE_SYNC_DELAY,
                 func=self.config.saveCacheIfChanged,
-                interval=None
+                interval=None,
+                key="saveCache"
             )
 
 
@@ -630,6 +1194,14 @@ class WMState:
     CONTINUOUS_ERROR_LIMIT : int
         連続したエラーを許容する回数
         エラー数がここで指定した回数に到達すると例外を発生させる
+    WATT_SERIES : tuple
+        消費電力量の時系列の (期間(秒), 記録数) の組
+        期間がNoneの時系列は取得した値をそのまま記録する
+    WATT_STATS : tuple
+        消費電力量の統計値を求める (期間(秒), バケット数) の組
+    WATT_STATS_MAX : int
+        分位数を求める消費電力量の上限(W)
+        wattmeter.max.watt の設定範囲の上限にあわせる
     """
     STATUS_NORMAL  = 0
     STATUS_CAUTION = 10
@@ -637,19 +1209,49 @@ class WMState:
 
     CONTINUOUS_ERROR_LIMIT = 10
 
-    def __init__(self, *, config):
+    WATT_SERIES = (
+        (None, 120),  # 取得値
+        (60, 60),  # 1分 x 1時間
+        (600, 144),  # 10分 x 24時間
+        (3600, 168),  # 1時間 x 7日
+    )
+
+    WATT_STATS = (
+        (300, 30),  # 5分(10秒単位)
+        (3600, 60),  # 1時間(1分単位)
+        (86400, 96),  # 24時間(15分単位)
+    )
+    WATT_STATS_MAX = 10000
+
+    def __init__(self, *, config, array=None):
         """
         Parameters
         ----------
         config : object
             WMConfigクラスインタンス
+        array : object | None
+            arrayモジュール
+            指定した場合は消費電力量の時系列と統計値を記録する
         """
         self.config = config
+        self._watt_series = []
+        self._watt_stats = []
+        if array is not None:
+            for period, size in self.WATT_SERIES:
+                self._watt_series.append(TimeSeries(array=array, size=size, period=period))
+            for window, buckets in self.WATT_STATS:
+                self._watt_stats.append(
+                    WindowStats(array=array, window=window, buckets=buckets, max_value=self.WATT_STATS_MAX)
+                )
         self._date_parts = None
         self._current_watt = 0
+        self._last_30_minutes_power = None
+        self._demand = DemandForecaster()
         self._current_status = self.STATUS_NORMAL
         self._is_status_escalated = False
         self._continuous_error_count = 0
+        self._version = 0  # 表示内容が変化するたびに増やす
+        self._observers = []
 
     def setTime(self, parts):
         """
@@ -661,7 +1263,12 @@ class WMState:
             日時の要素で構成されたtuple
             utime.localtime() の戻り値
         """
+        previous = self._date_parts
         self._date_parts = parts
+        # 表示する月・日・時・分が変わった場合
+        if previous is None or previous[4] != parts[4] or previous[3] != parts[3] \
+                or previous[2] != parts[2] or previous[1] != parts[1]:
+            self._changed()
 
     def getTime(self, format=None):
         """
@@ -701,7 +1308,7 @@ class WMState:
             sec=sec
         )
 
-    def setCurrentWatt(self, watt):
+    def setCurrentWatt(self, watt, time=None):
         """
         現在の消費電力量を設定する
 
@@ -709,11 +1316,58 @@ class WMState:
         ----------
         watt : int
             現在の消費電力量(W)
+        time : int | None
+            消費電力量を取得した時刻(秒)
+            指定した場合は消費電力量の時系列と統計値に記録して需要電力を予測する
         """
+        previous_watt = self._current_watt
+        previous_status = self._current_status
         self._current_watt = watt
+        if time is not None:
+            self._demand.add(watt, time)
+            for series in self._watt_series:
+                series.add(watt, time)
+            for stats in self._watt_stats:
+                stats.add(watt, time)
         self._updateStatus()
+        if watt != previous_watt or self._current_status != previous_status:
+            self._changed()
         self._continuous_error_count = 0
 
+    def addObserver(self, callback):
+        """
+        表示内容の変化を受け取る関数を登録する
+
+        Parameters
+        ----------
+        callback : function
+            表示内容が変化した時に呼び出す関数
+            callback(state) の形式でWMStateオブジェクトを受け取る
+        """
+        self._observers.append(callback)
+
+    def _changed(self):
+        """
+        表示内容の版数を増やして登録された関数に通知する
+        """
+        self._version += 1
+        for callback in self._observers:
+            callback(self)
+
+    def getVersion(self):
+        """
+        表示内容の版数を取得する
+
+        消費電力量・状態・表示する日時(分単位)のいずれかが変化するたびに増える
+        版数が同じであれば表示内容は変わっていない
+
+        Returns
+        -------
+        int
+            表示内容の版数
+        """
+        return self._version
+
     def getCurrentWatt(self):
         """
         設定された消費電力量を取得する
@@ -725,6 +1379,115 @@ class WMState:
         """
         return self._current_watt
 
+    def getWattSeries(self, period=None):
+        """
+        消費電力量の時系列を取得する
+
+        Parameters
+        ----------
+        period : int | None
+            平均値を求める期間(秒)
+            WATT_SERIES に定義された期間を指定する
+            Noneの場合は取得した値をそのまま記録した時系列
+
+        Returns
+        -------
+        TimeSeries | None
+            消費電力量の時系列
+            該当する時系列がない場合はNone
+        """
+        for series in self._watt_series:
+            if series.period == period:
+                return series
+        return None
+
+    def getWattStats(self, window):
+        """
+        消費電力量の統計値を取得する
+
+        Parameters
+        ----------
+        window : int
+            統計値を求める期間(秒)
+            WATT_STATS に定義された期間を指定する
+
+        Returns
+        -------
+        WindowStats | None
+            消費電力量の統計値
+            該当する統計値がない場合はNone
+        """
+        for stats in self._watt_stats:
+            if stats.window == window:
+                return stats
+        return None
+
+    def setIntegralPowerConsumption(self, power, time):
+        """
+        積算電力量計測値を設定する
+
+        需要電力の予測に使用する
+
+        Parameters
+        ----------
+        power : float
+            積算電力量(kWh)
+        time : int
+            計測した時刻(秒)
+        """
+        self._demand.setEnergy(power, time)
+
+    def getDemandForecast(self):
+        """
+        30分間の需要電力の予測値を取得する
+
+        Returns
+        -------
+        int | None
+            現在の30分間の平均電力の予測値(W)
+            予測できない場合はNone
+        """
+        return self._demand.getForecast()
+
+    def isDemandExceeded(self):
+        """
+        需要電力の予測値が設定値を超えるかを判定する
+
+        Returns
+        -------
+        bool
+            wattmeter.demand が設定されていて予測値が設定値以上の場合はTrue
+        """
+        demand = self.config.config.wattmeter.demand
+        if demand is None:
+            return False
+        forecast = self._demand.getForecast()
+        return forecast is not None and forecast >= demand.watt
+
+    def setLast30MinutesPowerConsumption(self, record):
+        """
+        直近の定時積算電力量計測値を設定する
+
+        Parameters
+        ----------
+        record : dict
+            日時と積算電力量(kWh)のdict
+            BP35A1Client.execGetLast30MinutesPowerConsumption() の戻り値と同じ形式
+        """
+        self._last_30_minutes_power = record
+
+    def getLast30MinutesPowerConsumption(self):
+        """
+        設定された定時積算電力量計測値を取得する
+
+        Returns
+        -------
+        dict | None
+            日時と積算電力量(kWh)のdict
+            未設定の場合はNone
+        """
+        return self._last_30_minutes_power
+
     def _updateStatus(self):
         """
         現在の状態を更新する
@@ -734,6 +1497,7 @@ class WMState:
         注意: CAUTION
         警告: WARNING
         のいずれかに設定する
+        需要電力の予測値が設定値を超える場合も注意(CAUTION)とする
         """
         if self.config.config.wattmeter.warning is not None:
             if self._current_watt >= self.config.config.wattmeter.warning.watt:
@@ -747,6 +1511,11 @@ class WMState:
                     self._is_status_escalated = True
                 self._current_status = self.STATUS_CAUTION
                 return
+        if self.isDemandExceeded():
+            if self._current_status < self.STATUS_CAUTION:
+                self._is_status_escalated = True
+            self._current_status = self.STATUS_CAUTION
+            return
         self._is_status_escalated = False
         self._current_status = self.STATUS_NORMAL
 
@@ -829,6 +1598,634 @@ class WMState:
         raise ex
 
 
+class DemandForecaster:
+    """
+    30分単位の需要電力(デマンド)を予測するクラス
+
+    毎時00分と30分から始まる30分間(時限)の平均電力を予測する
+    瞬時電力計測値を台形近似で積算して時限内の使用電力量を求め、
+    時限の残りも最新の瞬時電力が続くとして時限終了時の使用電力量を予測する
+    時限内で最初に受け取った積算電力量計測値からそれまでに積算した使用電力量を差し引いて
+    時限の開始時点の積算電力量(起点)とし、その後に受け取った積算電力量計測値との差分で使用電力量を補正する
+    時限の開始時点の積算電力量(定時積算電力量計測値)を受け取った場合はその値を起点とする
+
+    Examples
+    --------
+    forecaster = DemandForecaster()
+    forecaster.add(1000, 0)
+    forecaster.add(3000, 900)
+    forecaster.getForecast()  # 2500
+
+    Attributes
+    ----------
+    WINDOW : int
+        時限の長さ(秒)
+    """
+    WINDOW = 1800
+
+    def __init__(self):
+        self._start = None  # 時限の開始時刻
+        self._energy = 0.0  # 時限内の使用電力量(Ws)
+        self._anchor = None  # 時限の開始時点の積算電力量(kWh)
+        self._last_time = None
+        self._last_watt = None
+
+    def _advance(self, time):
+        """
+        時刻を含む時限に進める
+
+        Parameters
+        ----------
+        time : int
+            時刻(秒)
+        """
+        start = time - time % self.WINDOW
+        if self._start is not None and start <= self._start:
+            return
+        self._start = start
+        self._energy = 0.0
+        self._anchor = None
+
+    def add(self, watt, time):
+        """
+        瞬時電力計測値を追加する
+
+        Parameters
+        ----------
+        watt : int
+            瞬時電力(W)
+        time : int
+            計測した時刻(秒)
+        """
+        self._advance(time)
+        if self._last_time is None:
+            # 最初の計測値は時限の開始から続いていたとみなす
+            self._energy += watt * (time - self._start)
+        elif time > self._last_time:
+            base = self._last_time if self._last_time > self._start else self._start
+            self._energy += (self._last_watt + watt) / 2 * (time - base)
+        else:
+            # 時刻が戻った場合は瞬時電力のみ更新する
+            self._last_watt = watt
+            return
+        self._last_time = time
+        self._last_watt = watt
+
+    def setEnergy(self, energy, time):
+        """
+        積算電力量計測値を設定する
+
+        時限の開始時点の値は起点として保持する
+        起点のない時限内の値からはそれまでに積算した使用電力量を差し引いた値を起点とする
+        起点のある時限内の値は起点との差分で時限内の使用電力量を置き換える
+
+        Parameters
+        ----------
+        energy : float
+            積算電力量(kWh)
+        time : int
+            計測した時刻(秒)
+        """
+        self._advance(time)
+        if time == self._start:
+            self._anchor = energy
+            return
+        if time < self._start:
+            return
+        if self._last_time is not None and time < self._last_time:
+            return
+        if self._anchor is None:
+            integrated = self._energy
+            if self._last_time is not None and time > self._last_time:
+                # 最後の瞬時電力計測値から計測時刻まで同じ電力が続いたとして積算する
+                base = self._last_time if self._last_time > self._start else self._start
+                integrated += self._last_watt * (time - base)
+            self._anchor = energy - integrated / 3600000
+            return
+        if energy < self._anchor:
+            return
+        self._energy = (energy - self._anchor) * 3600000
+        self._last_time = time
+
+    def getForecast(self):
+        """
+        時限の平均電力の予測値を取得する
+
+        Returns
+        -------
+        int | None
+            時限終了時の予測使用電力量を時限の長さで割った平均電力(W)
+            時限内の瞬時電力計測値がない場合はNone
+        """
+        if self._last_watt is None or self._last_time is None or self._last_time < self._start:
+            return None
+        remaining = self._start + self.WINDOW - self._last_time
+        return round((self._energy + self._last_watt * remaining) / self.WINDOW)
+
+
+class TimeSeries:
+    """
+    固定長のリングバッファに値を記録する時系列クラス
+
+    値は array('h') に保持するため長時間動作してもメモリ使用量は変わらない
+    period を指定した場合は期間ごとの平均値を記録する
+    値を受け取るたびに集計中の期間の合計を更新し、期間が変わった時点で平均値を書き込む
+    値が記録されなかった期間には MISSING を書き込む
+
+    Examples
+    --------
+    series = TimeSeries(array=array, size=60, period=60)
+    series.add(1234, 0)
+    series.add(1000, 30)
+    series.add(800, 60)
+    series.getValue(0)  # 1117
+
+    Attributes
+    ----------
+    MISSING : int
+        値が記録されなかったことをあらわす値
+    MIN_VALUE : int
+        記録できる最小値
+    MAX_VALUE : int
+        記録できる最大値
+        範囲外の値は最小値又は最大値として記録する
+    """
+    MISSING = -32768
+    MIN_VALUE = -32767
+    MAX_VALUE = 32767
+
+    def __init__(self, *, array, size, period=None):
+        """
+        Parameters
+        ----------
+        array : object
+            arrayモジュール
+        size : int
+            記録する値の数
+        period : int | None
+            平均値を求める期間(秒)
+            Noneの場合は受け取った値をそのまま記録する
+        """
+        self.size = size
+        self.period = period
+        self._values = array.array("h", [self.MISSING] * size)
+        self._head = 0  # 次に書き込む位置
+        self._length = 0  # 記録済みの値の数
+        self._slot = None  # 集計中の期間(time // period)
+        self._sum = 0
+        self._count = 0
+
+    def _push(self, value):
+        """
+        リングバッファに値を書き込む
+
+        Parameters
+        ----------
+        value : int
+            書き込む値
+        """
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.size
+        if self._length < self.size:
+            self._length += 1
+
+    def add(self, value, time=None):
+        """
+        値を追加する
+
+        Parameters
+        ----------
+        value : int
+            追加する値
+        time : int | None
+            値を取得した時刻(秒)
+            periodを指定した場合は必須
+        """
+        if value < self.MIN_VALUE:
+            value = self.MIN_VALUE
+        elif value > self.MAX_VALUE:
+            value = self.MAX_VALUE
+        if self.period is None:
+            self._push(value)
+            return
+
+        slot = time // self.period
+        if self._slot is not None and slot > self._slot:
+            self._push((self._sum + self._count // 2) // self._count)
+            # 値のなかった期間(最大でバッファの長さ分)
+            for _ in range(min(slot - self._slot - 1, self.size)):
+                self._push(self.MISSING)
+            self._slot = None
+        if self._slot is None:
+            self._slot = slot
+            self._sum = 0
+            self._count = 0
+        self._sum += value
+        self._count += 1
+
+    def getLength(self):
+        """
+        記録済みの値の数を取得する
+
+        periodを指定した場合は集計中の期間を含まない
+
+        Returns
+        -------
+        int
+            記録済みの値の数
+        """
+        return self._length
+
+    def getValue(self, index):
+        """
+        記録済みの値を取得する
+
+        Parameters
+        ----------
+        index : int
+            新しい方からの位置(0が最新)
+
+        Returns
+        -------
+        int
+            記録された値
+            値が記録されなかった期間の場合は MISSING
+
+        Raises
+        ------
+        IndexError
+            記録済みの範囲外の位置を指定した場合
+        """
+        if index < 0 or index >= self._length:
+            raise IndexError("TimeSeries index out of range")
+        return self._values[(self._head - 1 - index) % self.size]
+
+
+class RingQueue:
+    """
+    固定長の両端キュー
+
+    array('l') のリングバッファで先頭と末尾の両方から値を取り出せるキューを実装する
+
+    Examples
+    --------
+    queue = RingQueue(array=array, size=4)
+    queue.pushBack(1)
+    queue.pushBack(2)
+    queue.popFront()  # 1
+    """
+
+    def __init__(self, *, array, size):
+        """
+        Parameters
+        ----------
+        array : object
+            arrayモジュール
+        size : int
+            格納できる値の数
+        """
+        self.size = size
+        self._values = array.array("l", [0] * size)
+        self._head = 0  # 先頭の位置
+        self._length = 0
+
+    def isEmpty(self):
+        """
+        キューが空かを判定する
+
+        Returns
+        -------
+        bool
+            空の場合はTrue
+        """
+        return self._length == 0
+
+    def getFront(self):
+        """
+        先頭の値を取得する
+
+        Returns
+        -------
+        int
+            先頭の値
+        """
+        return self._values[self._head]
+
+    def getBack(self):
+        """
+        末尾の値を取得する
+
+        Returns
+        -------
+        int
+            末尾の値
+        """
+        return self._values[(self._head + self._length - 1) % self.size]
+
+    def pushBack(self, value):
+        """
+        末尾に値を追加する
+
+        Parameters
+        ----------
+        value : int
+            追加する値
+
+        Raises
+        ------
+        IndexError
+            キューに空きがない場合
+        """
+        if self._length >= self.size:
+            raise IndexError("RingQueue is full")
+        self._values[(self._head + self._length) % self.size] = value
+        self._length += 1
+
+    def popFront(self):
+        """
+        先頭の値を取り出す
+
+        Returns
+        -------
+        int
+            先頭の値
+        """
+        value = self._values[self._head]
+        self._head = (self._head + 1) % self.size
+        self._length -= 1
+        return value
+
+    def popBack(self):
+        """
+        末尾の値を取り出す
+
+        Returns
+        -------
+        int
+            末尾の値
+        """
+        self._length -= 1
+        return self._values[(self._head + self._length) % self.size]
+
+
+class WindowStats:
+    """
+    直近の一定期間(ウィンドウ)の統計値を逐次計算するクラス
+
+    期間をバケットに分割して、バケットごとの合計・件数・最小値・最大値を array に保持する
+    値の追加時はバケットの集計値と期間全体の合計を更新し、期間外になったバケットを差し引く
+    最小値と最大値はバケットの単調キューの先頭から求める
+    いずれも値の追加は(期間外になったバケットの処理を均して)定数時間で
+    メモリ使用量はバケット数で決まる
+
+    期間の境界はバケット単位のため、最大でバケット1つ分の古い値を含む
+
+    EWMAと分位数は期間を時定数とした指数移動平均と、指数的に減衰させたヒストグラムから求める
+    分位数はヒストグラムのビンの中で線形補間した近似値
+
+    Examples
+    --------
+    stats = WindowStats(array=array, window=3600, buckets=60, max_value=10000)
+    stats.add(1234, 0)
+    stats.add(1000, 30)
+    stats.getMean()  # 1117
+
+    Attributes
+    ----------
+    HISTOGRAM_BINS : int
+        分位数を求めるヒストグラムのビン数
+    HISTOGRAM_MAX_WEIGHT : float
+        ヒストグラムに加算する重みの上限
+        超えた場合はヒストグラム全体を正規化する
+    """
+    HISTOGRAM_BINS = 64
+    HISTOGRAM_MAX_WEIGHT = 1000000.0
+
+    def __init__(self, *, array, window, buckets, max_value):
+        """
+        Parameters
+        ----------
+        array : object
+            arrayモジュール
+        window : int
+            統計値を求める期間(秒)
+        buckets : int
+            期間を分割するバケットの数
+            windowを割り切れる数を指定する
+        max_value : int
+            分位数を求めるヒストグラムの上限値
+            上限値以上の値は最上位のビンに、0未満の値は最下位のビンに数える
+        """
+        self.window = window
+        self.max_value = max_value
+        self._buckets = buckets
+        self._bucket_width = window // buckets
+        self._sums = array.array("l", [0] * buckets)
+        self._counts = array.array("H", [0] * buckets)
+        self._mins = array.array("h", [0] * buckets)
+        self._maxs = array.array("h", [0] * buckets)
+        self._min_queue = RingQueue(array=array, size=buckets)  # 最小値が昇順になるバケット
+        self._max_queue = RingQueue(array=array, size=buckets)  # 最大値が降順になるバケット
+        self._slot = None  # 最新のバケット(time // バケットの期間)
+        self._sum = 0
+        self._count = 0
+        self._last_time = None
+        self._ewma = 0.0
+        self._histogram = array.array("f", [0.0] * self.HISTOGRAM_BINS)
+        self._histogram_weight = 1.0
+
+    def _advance(self, slot):
+        """
+        最新のバケットを進めて期間外になったバケットを取り除く
+
+        Parameters
+        ----------
+        slot : int
+            新しい最新のバケット
+        """
+        buckets = self._buckets
+        if self._slot is not None:
+            # 期間外になるバケット(最大でバケット数分)
+            start = self._slot - buckets + 1
+            end = min(self._slot, slot - buckets)
+            for expired in range(start, end + 1):
+                index = expired % buckets
+                self._sum -= self._sums[index]
+                self._count -= self._counts[index]
+                self._sums[index] = 0
+                self._counts[index] = 0
+        self._slot = slot
+        oldest = slot - buckets
+        while not self._min_queue.isEmpty() and self._min_queue.getFront() <= oldest:
+            self._min_queue.popFront()
+        while not self._max_queue.isEmpty() and self._max_queue.getFront() <= oldest:
+            self._max_queue.popFront()
+
+    def add(self, value, time):
+        """
+        値を追加する
+
+        Parameters
+        ----------
+        value : int
+            追加する値
+        time : int
+            値を取得した時刻(秒)
+        """
+        if value < TimeSeries.MIN_VALUE:
+            value = TimeSeries.MIN_VALUE
+        elif value > TimeSeries.MAX_VALUE:
+            value = TimeSeries.MAX_VALUE
+        slot = time // self._bucket_width
+        if self._slot is None or slot > self._slot:
+            self._advance(slot)
+        else:
+            # 時刻が戻った場合は最新のバケットに含める
+            slot = self._slot
+
+        index = slot % self._buckets
+        if self._counts[index] == 0:
+            self._mins[index] = value
+            self._maxs[index] = value
+        elif value < self._mins[index]:
+            self._mins[index] = value
+        elif value > self._maxs[index]:
+            self._maxs[index] = value
+        self._sums[index] += value
+        self._counts[index] += 1
+        self._sum += value
+        self._count += 1
+
+        queue = self._min_queue
+        while not queue.isEmpty() and self._mins[queue.getBack() % self._buckets] >= self._mins[index]:
+            queue.popBack()
+        queue.pushBack(slot)
+        queue = self._max_queue
+        while not queue.isEmpty() and self._maxs[queue.getBack() % self._buckets] <= self._maxs[index]:
+            queue.popBack()
+        queue.pushBack(slot)
+
+        if self._last_time is None:
+            self._ewma = float(value)
+        else:
+            elapsed = time - self._last_time
+            if elapsed > 0:
+                self._ewma += (value - self._ewma) * elapsed / (self.window + elapsed)
+                # 過去の値の重みを相対的に下げるために新しい値の重みを増やす
+                self._histogram_weight *= (self.window + elapsed) / self.window
+        self._last_time = time
+        if self._histogram_weight > self.HISTOGRAM_MAX_WEIGHT:
+            for i in range(self.HISTOGRAM_BINS):
+                self._histogram[i] /= self._histogram_weight
+            self._histogram_weight = 1.0
+        position = value * self.HISTOGRAM_BINS // self.max_value
+        if position < 0:
+            position = 0
+        elif position >= self.HISTOGRAM_BINS:
+            position = self.HISTOGRAM_BINS - 1
+        self._histogram[position] += self._histogram_weight
+
+    def getCount(self):
+        """
+        期間内の値の数を取得する
+
+        Returns
+        -------
+        int
+            期間内の値の数
+        """
+        return self._count
+
+    def getMin(self):
+        """
+        期間内の最小値を取得する
+
+        Returns
+        -------
+        int | None
+            最小値
+            期間内に値がない場合はNone
+        """
+        if self._count == 0:
+            return None
+        return self._mins[self._min_queue.getFront() % self._buckets]
+
+    def getMax(self):
+        """
+        期間内の最大値を取得する
+
+        Returns
+        -------
+        int | None
+            最大値
+            期間内に値がない場合はNone
+        """
+        if self._count == 0:
+            return None
+        return self._maxs[self._max_queue.getFront() % self._buckets]
+
+    def getMean(self):
+        """
+        期間内の平均値を取得する
+
+        Returns
+        -------
+        int | None
+            平均値(四捨五入した整数)
+            期間内に値がない場合はNone
+        """
+        if self._count == 0:
+            return None
+        return (self._sum + self._count // 2) // self._count
+
+    def getEWMA(self):
+        """
+        期間を時定数とした指数移動平均を取得する
+
+        Returns
+        -------
+        int | None
+            指数移動平均(四捨五入した整数)
+            値が追加されていない場合はNone
+        """
+        if self._last_time is None:
+            return None
+        return round(self._ewma)
+
+    def getQuantile(self, q):
+        """
+        分位数の近似値を取得する
+
+        Parameters
+        ----------
+        q : float
+            0から1の範囲の分位(95パーセンタイルは0.95)
+
+        Returns
+        -------
+        int | None
+            分位数の近似値
+            値が追加されていない場合はNone
+        """
+        total = 0.0
+        for weight in self._histogram:
+            total += weight
+        if total <= 0:
+            return None
+        target = total * q
+        accumulated = 0.0
+        last = 0
+        for i in range(self.HISTOGRAM_BINS):
+            weight = self._histogram[i]
+            if weight <= 0:
+                continue
+            last = i
+            if accumulated + weight >= target:
+                return round((i + (target - accumulated) / weight) * self.max_value / self.HISTOGRAM_BINS)
+            accumulated += weight
+        return round((last + 1) * self.max_value / self.HISTOGRAM_BINS)
+
+
 class NetworkError(Exception):
     """
     インターネット関連の例外
@@ -26,6 +26,12 @@ class VirtualLCD:
         表示方式
     FACE_LIST : tuple
         使用可能な表示方式のリスト
+    PRIMITIVE_* : int
+        drawPrimitives() で描画する図形の種類
+    ITEM_* : int
+        _render() で描画する表示項目の種類
+    TEXT_SIZE_CACHE_SIZE : int
+        _textSize() で保持する文字列の大きさの最大数
     """
 
     MARGIN_BOTTOM = 72
@@ -46,6 +52,21 @@ class VirtualLCD:
         FACE_HAKONE,
     )
 
+    PRIMITIVE_PIXEL    = 0
+    PRIMITIVE_LINE     = 1
+    PRIMITIVE_RECT     = 2
+    PRIMITIVE_TRIANGLE = 3
+
+    ITEM_TEXT      = 0
+    ITEM_7SEG      = 1
+    ITEM_COLON     = 2
+    ITEM_MINUS     = 3
+    ITEM_BAR       = 4
+    ITEM_BITMAP    = 5
+    ITEM_ROUNDRECT = 6
+
+    TEXT_SIZE_CACHE_SIZE = 32
+
     def __init__(self, *, lcd, axp):
         """
         Parameters
@@ -63,6 +84,16 @@ class VirtualLCD:
         self._current_font = lcd.FONT_Default
         self._current_face_index = 0
         self._current_face_func = self._faceBasicDark
+        self._rendered_version = None  # 最後に描画した表示内容の版数
+        self._segment_cache = {}  # AltFont7segのセグメントの図形
+        self._bitmap_cache = {}  # ビットマップを変換した区間
+        self._transform = None  # 仮想画面から実際の画面への座標変換
+        self._color_args_cache = {}  # 色の引数のdict
+        self._text_size_cache = {}  # フォントと文字列ごとの描画時の大きさ
+        self._display_list = None  # 前回描画した表示項目のリスト
+        self._display_bg = None  # 前回描画した背景色
+        self._static_items = None  # 静的な表示項目のリスト
+        self._static_layer = None  # 静的な表示項目を記録した描画命令
 
         screen_w, screen_h = lcd.screensize()
         lcd.sprite_create(screen_w, screen_h + self.MARGIN_BOTTOM, lcd.SPRITE_8BIT)
@@ -77,8 +108,27 @@ class VirtualLCD:
         """
         画面の向きを現在の設定に従いリセットする
         """
+        self._transform = self._createTransform()
         self._font()
 
+    def _createTransform(self):
+        """
+        仮想画面から実際の画面への座標変換を生成する
+
+        実際の座標は actual_x = x0 + dx * y, actual_y = y0 + dy * x となる
+        方形は左上の頂点を変換した後に幅と高さを入れ替え
+        actual_x += rx * height, actual_y += ry * width で実際の左上の頂点に補正する
+
+        Returns
+        -------
+        tuple (x0, dx, y0, dy, rx, ry)
+            座標変換の係数
+        """
+        if self._flip:
+            return (self._screen_w, -1, 0, 1, -1, 0)
+        else:
+            return (0, 1, self._screen_h, -1, 0, -1)
+
     def _font(self, font = None, rotate = 0):
         """
         使用するFontを設定する
@@ -134,6 +184,143 @@ class VirtualLCD:
         kwargs = self._createColorArgs(color)
         self._lcd.pixel(actual_x, actual_y, **kwargs)
 
+    def _line(self, x1, y1, x2, y2, color = -1):
+        """
+        (x1,y1)から(x2,y2)までの直線を描画する
+
+        Parameters
+        ----------
+        x1 : int
+            始点のx座標
+        y1 : int
+            始点のy座標
+        x2 : int
+            終点のx座標
+        y2 : int
+            終点のy座標
+        color : int
+            直線の色
+        """
+        actual_x1, actual_y1 = self._convertCoordinates(x1, y1)
+        actual_x2, actual_y2 = self._convertCoordinates(x2, y2)
+        kwargs = self._createColorArgs(color)
+        self._lcd.line(actual_x1, actual_y1, actual_x2, actual_y2, **kwargs)
+
+    def _compileBitmap(self, bitmap, width, height):
+        """
+        ビットマップを水平方向に連続するピクセルの区間に変換する
+
+        変換結果はビットマップごとにキャッシュする
+
+        Parameters
+        ----------
+        bitmap : int
+            (width * height)ビット目から順に左上を起点に1行ずつピクセルをあらわすビットマップ
+            最下位ビットは使用しない
+        width : int
+            ビットマップの幅
+        height : int
+            ビットマップの高さ
+
+        Returns
+        -------
+        tuple
+            区間の左端の位置と長さ (x, y, length) のtuple
+        """
+        key = (bitmap, width, height)
+        spans = self._bitmap_cache.get(key)
+        if spans is not None:
+            return spans
+        spans = []
+        mask = 1 << width * height
+        for py in range(height):
+            start = None
+            for px in range(width):
+                if bitmap & mask > 0:
+                    if start is None:
+                        start = px
+                elif start is not None:
+                    spans.append((start, py, px - start))
+                    start = None
+                mask >>= 1
+            if start is not None:
+                spans.append((start, py, width - start))
+        spans = tuple(spans)
+        self._bitmap_cache[key] = spans
+        return spans
+
+    def _drawBitmap(self, x, y, bitmap, width, height, color = -1):
+        """
+        x,yを左上としてビットマップを描画する
+
+        ピクセルごとではなく水平方向に連続するピクセルの区間ごとに直線として描画する
+
+        Parameters
+        ----------
+        x : int
+            描画位置左上のx座標
+        y : int
+            描画位置左上のy座標
+        bitmap : int
+            ビットマップ(_compileBitmap()を参照)
+        width : int
+            ビットマップの幅
+        height : int
+            ビットマップの高さ
+        color : int
+            描画する色
+        """
+        # 描画のたびに図形のリストを生成しないよう区間から直接描画する
+        lcd = self._lcd
+        kwargs = self._createColorArgs(color)
+        x0, dx, y0, dy, _, _ = self._transform
+        for px, py, length in self._compileBitmap(bitmap, width, height):
+            actual_x = x0 + dx * (y + py)
+            actual_y = y0 + dy * (x + px)
+            lcd.line(actual_x, actual_y, actual_x, actual_y + dy * (length - 1), **kwargs)
+
+    def drawPrimitives(self, primitives):
+        """
+        複数の図形をまとめて描画する
+
+        座標変換の係数をローカル変数に展開して1つのループで変換するため
+        図形ごとに _pixel() などを呼び出すよりも少ないオーバーヘッドで描画できる
+
+        Parameters
+        ----------
+        primitives : list
+            仮想画面の座標による図形のtupleのリスト
+            (PRIMITIVE_PIXEL, x, y, color)
+            (PRIMITIVE_LINE, x1, y1, x2, y2, color)
+            (PRIMITIVE_RECT, x, y, width, height, color, fillcolor)
+            (PRIMITIVE_TRIANGLE, x1, y1, x2, y2, x3, y3, color, fillcolor)
+
+        Raises
+        ------
+        ValueError
+            図形の種類が不正な場合
+        """
+        lcd = self._lcd
+        color_args = self._createColorArgs
+        x0, dx, y0, dy, rx, ry = self._transform
+        for p in primitives:
+            kind = p[0]
+            if kind == 1:  # PRIMITIVE_LINE
+                lcd.line(x0 + dx * p[2], y0 + dy * p[1], x0 + dx * p[4], y0 + dy * p[3], **color_args(p[5]))
+            elif kind == 2:  # PRIMITIVE_RECT
+                lcd.rect(x0 + dx * p[2] + rx * p[4], y0 + dy * p[1] + ry * p[3], p[4], p[3], **color_args(p[5], p[6]))
+            elif kind == 3:  # PRIMITIVE_TRIANGLE
+                lcd.triangle(
+                    x0 + dx * p[2], y0 + dy * p[1],
+                    x0 + dx * p[4], y0 + dy * p[3],
+                    x0 + dx * p[6], y0 + dy * p[5],
+                    **color_args(p[7], p[8])
+                )
+            elif kind == 0:  # PRIMITIVE_PIXEL
+                lcd.pixel(x0 + dx * p[2], y0 + dy * p[1], **color_args(p[3]))
+            else:
+                raise ValueError("Unknown primitive: {}".format(kind))
+
     def _rect(self, x, y, width, height, color = -1, fillcolor = -1):
         """
         x,yを左上の頂点として幅width, 高さheightの方形を描画する
@@ -153,14 +340,9 @@ class VirtualLCD:
         fillcolor : int
             方形の内側を塗りつぶす色
         """
-        lcd = self._lcd
-        actual_x, actual_y = self._convertCoordinates(x, y)
-        if self._flip:
-            actual_x -= height
-        else:
-            actual_y -= width
+        actual_x, actual_y, actual_width, actual_height = self._convertRect(x, y, width, height)
         kwargs = self._createColorArgs(color, fillcolor)
-        lcd.rect(actual_x, actual_y, height, width, **kwargs)
+        self._lcd.rect(actual_x, actual_y, actual_width, actual_height, **kwargs)
 
     def _roundRect(self, x, y, width, height, r, color = -1, fillcolor = -1):
         """
@@ -183,14 +365,9 @@ class VirtualLCD:
         fillcolor : int
             方形の内側を塗りつぶす色
         """
-        lcd = self._lcd
-        actual_x, actual_y = self._convertCoordinates(x, y)
-        if self._flip:
-            actual_x -= height
-        else:
-            actual_y -= width
+        actual_x, actual_y, actual_width, actual_height = self._convertRect(x, y, width, height)
         kwargs = self._createColorArgs(color, fillcolor)
-        lcd.roundrect(actual_x, actual_y, height, width, r, **kwargs)
+        self._lcd.roundrect(actual_x, actual_y, actual_width, actual_height, r, **kwargs)
 
     def _triangle(self, x1, y1, x2, y2, x3, y3, color = -1, fillcolor = -1):
         """
@@ -299,13 +476,31 @@ class VirtualLCD:
         tuple (x, y)
             実際に使用する座標
         """
-        if self._flip:
-            actual_x = self._screen_w - y
-            actual_y = x
-        else:
-            actual_x = y
-            actual_y = self._screen_h - x
-        return (actual_x, actual_y)
+        x0, dx, y0, dy, _, _ = self._transform
+        return (x0 + dx * y, y0 + dy * x)
+
+    def _convertRect(self, x, y, width, height):
+        """
+        方形の位置と大きさを仮想的なものから実際の値に変換する
+
+        Parameters
+        ----------
+        x : int
+            仮想画面の方形の左上のx座標
+        y : int
+            仮想画面の方形の左上のy座標
+        width : int
+            仮想画面の方形の水平方向の大きさ
+        height : int
+            仮想画面の方形の垂直方向の大きさ
+
+        Returns
+        -------
+        tuple (x, y, width, height)
+            実際に使用する方形の左上の座標と大きさ
+        """
+        x0, dx, y0, dy, rx, ry = self._transform
+        return (x0 + dx * y + rx * height, y0 + dy * x + ry * width, height, width)
 
     def _normalizeAngle(self, angle, offset = 0):
         """
@@ -345,12 +540,22 @@ class VirtualLCD:
         Returns
         -------
         dict {"color": color, "fillcolor": fillcolor}
-        """
-        kwargs = {}
-        if color >= 0:
-            kwargs["color"] = color
-        if fillcolor >= 0:
-            kwargs["fillcolor"] = fillcolor
+            色の組み合わせごとにキャッシュした同一のdictを返すため変更しないこと
+        """
+        # 描画のたびにdictを生成しないよう色ごとにキャッシュする
+        # キーのtupleも生成しないよう color, fillcolor の順に入れ子にする
+        by_fillcolor = self._color_args_cache.get(color)
+        if by_fillcolor is None:
+            by_fillcolor = {}
+            self._color_args_cache[color] = by_fillcolor
+        kwargs = by_fillcolor.get(fillcolor)
+        if kwargs is None:
+            kwargs = {}
+            if color >= 0:
+                kwargs["color"] = color
+            if fillcolor >= 0:
+                kwargs["fillcolor"] = fillcolor
+            by_fillcolor[fillcolor] = kwargs
         return kwargs
 
     def _begin(self):
@@ -362,6 +567,9 @@ class VirtualLCD:
     def _commit(self):
         """
         spriteへの描画を終了し画面に表示する
+
+        lcd.sprite_show() には転送する領域を指定できないため常にsprite全体を画面に転送する
+        _render() で変化した領域だけを描画した場合も転送量は変わらない
         """
         lcd = self._lcd
         lcd.sprite_deselect()
@@ -381,6 +589,9 @@ class VirtualLCD:
         """
         self._flip = (flip == True)
         self._resetOrientation()
+        self._segment_cache = {}
+        self._static_layer = None
+        self.invalidate()
 
     def setBrightness(self, brightness):
         """
@@ -431,6 +642,8 @@ class VirtualLCD:
             表示方式の値(FACE_*)
         """
         self._current_face_index = self.FACE_LIST.index(face)
+        self._static_layer = None
+        self.invalidate()
         if face == self.FACE_BASIC_DARK:
             self._current_face_func = self._faceBasicDark
         elif face == self.FACE_BASIC_LIGHT:
@@ -494,6 +707,7 @@ class VirtualLCD:
 
         self._commit()
         self.wakeUp()
+        self.invalidate()
 
         self._font(backup_font)
 
@@ -532,19 +746,307 @@ class VirtualLCD:
             detail_w = lcd.textWidth(detail)
             self._text(circle_x - int(detail_w / 2), circle_y + 60, detail, color=color)
         self._commit()
+        self.invalidate()
 
     def update(self, state):
         """
         表示を更新する
 
         設定されている現在の"FACE"で表示を更新する
+        前回の描画から表示内容(WMStateの版数)が変わっていない場合は描画しない
 
         Parameters
         ----------
         state : object
             表示内容を格納したWMStateオブジェクト
+
+        Returns
+        -------
+        bool
+            描画した場合はTrue
         """
+        version = state.getVersion()
+        if version == self._rendered_version:
+            return False
         self._current_face_func(state)
+        self._rendered_version = version
+        return True
+
+    def invalidate(self):
+        """
+        次の update() で表示内容が変わっていなくても描画させる
+
+        表示方式や向きの変更、エラーなど他の画面を表示した場合に呼び出す
+        次の描画では前回の表示項目との差分ではなく画面全体を描画する
+        """
+        self._rendered_version = None
+        self._display_list = None
+
+    def _render(self, items, static_items = None):
+        """
+        表示項目のリストを描画する
+
+        前回描画した表示項目のリストと比較して変化した表示項目の領域だけを
+        背景色で消去し、その領域に重なる表示項目を描画し直す
+        前回の描画が無い場合や背景色、表示項目の数、静的な表示項目が変わった場合は画面全体を描画する
+
+        静的な表示項目は最初に一度だけ描画命令を記録し(_recordLayer())
+        以降はその描画命令を再生して表示項目の下に描画する
+
+        変化した領域だけを描画しても lcd.sprite_show() はsprite全体を画面に転送するため
+        削減されるのはspriteへの描画処理で、画面への転送時間は変わらない
+
+        Parameters
+        ----------
+        items : list
+            表示項目 (x, y, width, height, kind, args) のリスト
+            x, y, width, height は表示項目が描画する仮想画面の領域
+            kind は表示項目の種類(ITEM_*)で、描画内容は kind と args だけで決まる
+        static_items : list
+            表示が変わらない背景の表示項目のリスト
+
+        Returns
+        -------
+        bool
+            画面を更新した場合はTrue
+        """
+        if static_items is None:
+            static_items = []
+        full = False
+        layer = self._static_layer
+        if layer is None or self._static_items != static_items:
+            layer = self._recordLayer(static_items)
+            self._static_layer = layer
+            self._static_items = static_items
+            full = True
+
+        previous = self._display_list
+        bg = self._bg
+        dirty = None
+        if not full and previous is not None and len(previous) == len(items) and self._display_bg == bg:
+            dirty = []
+            for old, new in zip(previous, items):
+                if old != new:
+                    # 座標変換の丸めで領域の境界のピクセルが残らないよう1ピクセル広げる
+                    dirty.append((old[0] - 1, old[1] - 1, old[0] + old[2] + 1, old[1] + old[3] + 1))
+                    if old[:4] != new[:4]:
+                        dirty.append((new[0] - 1, new[1] - 1, new[0] + new[2] + 1, new[1] + new[3] + 1))
+            if len(dirty) == 0:
+                return False
+
+        lcd = self._lcd
+        self._begin()
+        if dirty is None:
+            lcd.clear()
+            for entry in layer:
+                self._replay(entry[4])
+            for item in items:
+                self._drawItem(item)
+        else:
+            max_x = self._vscreen_w
+            max_y = self._vscreen_h
+            for x1, y1, x2, y2 in dirty:
+                x1 = max(x1, 0)
+                y1 = max(y1, 0)
+                x2 = min(x2, max_x)
+                y2 = min(y2, max_y)
+                if x1 < x2 and y1 < y2:
+                    self._rect(x1, y1, x2 - x1, y2 - y1, bg, bg)
+            for entry in layer:
+                for r in dirty:
+                    if entry[0] < r[2] and r[0] < entry[2] and entry[1] < r[3] and r[1] < entry[3]:
+                        self._replay(entry[4])
+                        break
+            for item in items:
+                x1 = item[0]
+                y1 = item[1]
+                x2 = x1 + item[2]
+                y2 = y1 + item[3]
+                for r in dirty:
+                    if x1 < r[2] and r[0] < x2 and y1 < r[3] and r[1] < y2:
+                        self._drawItem(item)
+                        break
+        self._commit()
+        self._display_list = items
+        self._display_bg = bg
+        return True
+
+    def _recordLayer(self, items):
+        """
+        表示項目を描画する代わりにlcdの描画命令を記録する
+
+        lcdモジュールには別のspriteやバッファの画素を転送(blit)する手段がないため
+        静的な表示項目は画素ではなく描画命令として記録して _render() で再生する
+        画面全体を描画する場合は毎回全ての描画命令を再生するためlcdの呼び出し回数は減らず
+        省略できるのは表示項目の生成と変換の処理と、変化した領域に重ならない項目の再生である
+
+        7セグメントの消灯セグメント(behind)は静的な表示項目にせず数字と同じ表示項目で描画する
+        静的な表示項目にすると数字が変わるたびに重なる消灯セグメントを全て再生した上で
+        点灯セグメントを描画し直すことになり描画命令がかえって増えるため
+
+        Parameters
+        ----------
+        items : list
+            表示項目のリスト
+
+        Returns
+        -------
+        list
+            表示項目の領域と記録した描画命令 (x1, y1, x2, y2, calls) のリスト
+            calls は _replay() で再生する
+        """
+        lcd = self._lcd
+        layer = []
+        try:
+            for item in items:
+                recorder = LCDRecorder()
+                self._lcd = recorder
+                self._drawItem(item)
+                x, y, width, height = item[0:4]
+                layer.append((x, y, x + width, y + height, recorder.calls))
+        finally:
+            self._lcd = lcd
+        return layer
+
+    def _replay(self, calls):
+        """
+        記録したlcdの描画命令を再生する
+
+        Parameters
+        ----------
+        calls : list
+            LCDRecorderで記録した描画命令のリスト
+        """
+        lcd = self._lcd
+        for name, args, kwargs in calls:
+            getattr(lcd, name)(*args, **kwargs)
+
+    def _drawItem(self, item):
+        """
+        表示項目を描画する
+
+        Parameters
+        ----------
+        item : tuple
+            表示項目 (x, y, width, height, kind, args)
+            _render() を参照
+        """
+        x, y, width, height, kind, args = item
+        if kind == self.ITEM_TEXT:
+            font, text, color = args
+            self._font(font)
+            self._text(x, y, text, color)
+        elif kind == self.ITEM_7SEG:
+            w, h, flags, color, behind_color = args
+            AltFont7seg.draw7seg(self, x, y, w, h, flags, color, behind_color)
+        elif kind == self.ITEM_COLON:
+            w, h, color = args
+            AltFont7seg.drawColon(self, x, y, w, h, color)
+        elif kind == self.ITEM_MINUS:
+            w, h, color = args
+            AltFont7seg.drawMinus(self, x, y, w, h, color)
+        elif kind == self.ITEM_BAR:
+            r, color, fill_percent, bg = args
+            self._drawBar(x, y, width, height, r, color, fill_percent, bg)
+        elif kind == self.ITEM_BITMAP:
+            bitmap, color = args
+            self._drawBitmap(x, y, bitmap, width, height, color)
+        elif kind == self.ITEM_ROUNDRECT:
+            r, color = args
+            self._roundRect(x, y, width, height, r, color=color)
+        else:
+            raise ValueError("Unknown item: {}".format(kind))
+
+    def _textItem(self, x, y, text, font, color):
+        """
+        文字列の表示項目を生成する
+
+        Parameters
+        ----------
+        x : int
+            文字の水平方向の描画開始位置
+        y : int
+            文字の垂直方向の描画開始位置
+        text : str
+            描画する文字列
+        font : int
+            使用するフォント
+            lcd.FONT_*
+        color : int
+            文字の色
+
+        Returns
+        -------
+        tuple
+            表示項目
+        """
+        w, h = self._textSize(text, font)
+        return (x, y, w, h, self.ITEM_TEXT, (font, text, color))
+
+    def _textSize(self, text, font):
+        """
+        文字列を描画した時の大きさを取得する
+
+        表示項目の生成のたびにlcdのフォントを切り替えないよう
+        フォントと文字列ごとに計測した大きさを保持する
+        保持する数が TEXT_SIZE_CACHE_SIZE に達した場合は全て破棄する
+
+        Parameters
+        ----------
+        text : str
+            計測する文字列
+        font : int
+            使用するフォント
+            lcd.FONT_*
+
+        Returns
+        -------
+        (int, int)
+            文字列の幅と高さ
+        """
+        key = (font, text)
+        size = self._text_size_cache.get(key)
+        if size is None:
+            if len(self._text_size_cache) >= self.TEXT_SIZE_CACHE_SIZE:
+                self._text_size_cache.clear()
+            lcd = self._lcd
+            self._font(font)
+            size = (lcd.textWidth(text), lcd.fontSize()[1])
+            self._text_size_cache[key] = size
+        return size
+
+    def _drawBar(self, x, y, w, h, r, color, fill_percent, bg):
+        """
+        グラフの棒の塗りつぶし部分を描画する
+
+        棒の外周は静的な表示項目として別に描画する
+
+        Parameters
+        ----------
+        x : int
+            棒の左上の水平位置
+        y : int
+            棒の左上の垂直位置
+        w : int
+            棒の幅
+        h : int
+            棒の高さ
+        r : int
+            棒の角の丸み半径
+        color : int
+            棒の色
+        fill_percent : float
+            棒を塗りつぶす割合
+            0.0-1.0
+        bg : int
+            背景色
+        """
+        if fill_percent > 0.99:
+            self._roundRect(x, y, w, h, r, color, color)
+        elif fill_percent > 0.01:
+            self._roundRect(x, y, w, h, r, color, color)
+            self._rect(x, y, w, int(h - h * fill_percent), bg, bg)
+            self._roundRect(x, y, w, h, r, color)
 
     def _faceBasic(self, state, fg, bg):
         """
@@ -561,26 +1063,22 @@ class VirtualLCD:
         """
         lcd = self._lcd
         self.setColor(fg, bg)
-        self._begin()
-        lcd.clear()
 
-        self._font(lcd.FONT_DejaVu56)
         watt_s = "{:d}".format(state.getCurrentWatt())
-        watt_w = lcd.textWidth(watt_s)
+        watt_w = self._textSize(watt_s, lcd.FONT_DejaVu56)[0]
         # lcd.textWidth("8888") = 139
         watt_x = int((self._vscreen_w - 139) / 2 + 139 - watt_w)
-        self._text(watt_x, 50, watt_s)
-
-        self._font(lcd.FONT_DejaVu24)
-        self._text(203, 74, "W")
 
-        self._font(lcd.FONT_DejaVu18)
         time_s = state.getTime("{hour:02d}:{min:02d}")
-        time_w = lcd.textWidth(time_s)
+        time_w = self._textSize(time_s, lcd.FONT_DejaVu18)[0]
         time_x = int((self._vscreen_w - time_w) / 2)
-        self._text(time_x, 10, time_s)
 
-        self._commit()
+        self._render([
+            self._textItem(watt_x, 50, watt_s, lcd.FONT_DejaVu56, fg),
+            self._textItem(time_x, 10, time_s, lcd.FONT_DejaVu18, fg),
+        ], [
+            self._textItem(203, 74, "W", lcd.FONT_DejaVu24, fg),
+        ])
 
     def _faceBasicDark(self, state):
         """
@@ -645,19 +1143,8 @@ class VirtualLCD:
         if config_wm.caution is not None:
             percent_caution = int(config_wm.caution.watt / max_watt * 100)
 
-        def draw_bar(x, y, w, h, r, color, fill_percent=0):
-            nonlocal lcd, bg
-            colors = {"color": color}
-            if fill_percent > 0.99:
-                colors["fillcolor"] = color
-            elif fill_percent > 0.01:
-                self._roundRect(x, y, w, h, r, color, color)
-                self._rect(x, y, w, int(h - h * fill_percent), bg, bg)
-            self._roundRect(x, y, w, h, r, **colors)
-
-        self._begin()
-        lcd.clear()
-
+        items = []
+        static_items = []
         bar_range = 20
         for i in range(5):
             percent_bar_upper = 100 - i * bar_range
@@ -668,21 +1155,26 @@ class VirtualLCD:
                 color = lcd.YELLOW
             else:
                 color = lcd.GREEN
-            draw_bar(6, 7 + 26 * i, 80, 18, 5, color, fill_percent)
+            # 描画が変わらない範囲の割合は同じ値にまとめて表示項目の比較で一致させる
+            if fill_percent > 0.99:
+                fill_percent = 1
+            elif fill_percent <= 0.01:
+                fill_percent = 0
+            items.append((6, 7 + 26 * i, 80, 18, self.ITEM_BAR, (5, color, fill_percent, bg)))
+            static_items.append((6, 7 + 26 * i, 80, 18, self.ITEM_ROUNDRECT, (5, color)))
 
         # ワット数
-        self._font(lcd.FONT_DejaVu40)
         watt_text = "{:d}".format(state.getCurrentWatt())
-        self._text(105 + (118 - lcd.textWidth(watt_text)), 75, watt_text)
+        watt_w = self._textSize(watt_text, lcd.FONT_DejaVu40)[0]
+        items.append(self._textItem(105 + (118 - watt_w), 75, watt_text, lcd.FONT_DejaVu40, fg))
         # 単位(W)
-        self._font(lcd.FONT_DejaVu18)
-        self._text(210, 112, "W")
+        static_items.append(self._textItem(210, 112, "W", lcd.FONT_DejaVu18, fg))
         # パーセント
-        self._font(lcd.FONT_DejaVu24)
         percent_text = "{:d}%".format(percent_current)
-        self._text(130 + (71 - lcd.textWidth(percent_text)), 40, percent_text)
+        percent_w = self._textSize(percent_text, lcd.FONT_DejaVu24)[0]
+        items.append(self._textItem(130 + (71 - percent_w), 40, percent_text, lcd.FONT_DejaVu24, fg))
 
-        self._commit()
+        self._render(items, static_items)
 
     def _face7seg(self, state):
         """
@@ -693,7 +1185,6 @@ class VirtualLCD:
         state : object
             表示内容を格納したWMStateオブジェクト
         """
-        lcd = self._lcd
         if state.isStatusWarning():
             fg = 0xFFB536
             bg = 0x4C2012
@@ -708,10 +1199,9 @@ class VirtualLCD:
             behind = 0x6C7373
         self.setColor(fg, bg)
 
-        self._begin()
-        lcd.clear()
-        AltFont7seg.drawWatt(self, 3, 29, 24, 10, state.getCurrentWatt(), fg, behind)
-        self._commit()
+        items = []
+        AltFont7seg.drawWatt(self, 3, 29, 24, 10, state.getCurrentWatt(), fg, behind, items=items)
+        self._render(items)
 
     def _faceHakone(self, state):
         """
@@ -739,35 +1229,43 @@ class VirtualLCD:
             normal_color = fg
         self.setColor(fg, bg)
 
-        def draw_16x15(x, y, bitmap, color):
-            nonlocal self
-            mask = 1 << 16*15
-            for py in range(15):
-                for px in range(16):
-                    if bitmap & mask > 0:
-                        self._pixel(x+px, y+py, color=color)
-                    mask >>= 1
-
-        self._begin()
-        lcd.clear()
-        AltFont7seg.drawDate(self, 10, 10, 10, 4, state.getTime("{mon:02d}"), state.getTime("{mday:02d}"), fg, behind)
-        AltFont7seg.drawTime(self, 106, 10, 10, 4, state.getTime("{hour:02d}:{min:02d}"), fg, behind)
-        AltFont7seg.drawWatt(self, 0, 53, 20, 8, state.getCurrentWatt(), fg, behind)
-
-        # 警告
-        draw_16x15(203, 14, 0x1AB07FA2303E2F687528BD3C0E431FF8FFFE1FF810081FF810081FF81008, warning_color)
-        draw_16x15(220, 14, 0x08C00C8008841FFE1080608000827FFF00001FFC1008100810081FF81008, warning_color)
-        self._roundRect(200, 8, 38, 25, 5, color=warning_color)
-        # 注意
-        draw_16x15(203, 43, 0x210010C0004008046BFE28401040104417FE604020402040204020442FFE, caution_color)
-        draw_16x15(220, 43, 0x00C000843FFE041002227FFF08080FF808080FF8080002841452241227FA, caution_color)
-        self._roundRect(200, 38, 38, 25, 5, color=caution_color)
-        # 平常
-        draw_16x15(203, 74, 0x00087FFE010021081110092009200104FFFE010001000100010001000100, normal_color)
-        draw_16x15(220, 74, 0x1190091029243FFE40044FF408100FF001001FFC11081108110811380100, normal_color)
-        self._roundRect(200, 68, 38, 25, 5, color=normal_color)
-
-        self._commit()
+        items = []
+        AltFont7seg.drawDate(self, 10, 10, 10, 4, state.getTime("{mon:02d}"), state.getTime("{mday:02d}"), fg, behind, items=items)
+        AltFont7seg.drawTime(self, 106, 10, 10, 4, state.getTime("{hour:02d}:{min:02d}"), fg, behind, items=items)
+        AltFont7seg.drawWatt(self, 0, 53, 20, 8, state.getCurrentWatt(), fg, behind, items=items)
+
+        # 点灯していない表示枠は静的な表示項目として描画しておく
+        # (描画しないセグメントは桁ごとに点灯するセグメントと合わせて描画する方が描画命令が少ない)
+        static_items = []
+
+        bitmap = self.ITEM_BITMAP
+        roundrect = self.ITEM_ROUNDRECT
+        badges = (
+            # 警告
+            (warning_color, (
+                (203, 14, 16, 15, bitmap, (0x1AB07FA2303E2F687528BD3C0E431FF8FFFE1FF810081FF810081FF81008, )),
+                (220, 14, 16, 15, bitmap, (0x08C00C8008841FFE1080608000827FFF00001FFC1008100810081FF81008, )),
+                (200, 8, 38, 25, roundrect, (5, )),
+            )),
+            # 注意
+            (caution_color, (
+                (203, 43, 16, 15, bitmap, (0x210010C0004008046BFE28401040104417FE604020402040204020442FFE, )),
+                (220, 43, 16, 15, bitmap, (0x00C000843FFE041002227FFF08080FF808080FF8080002841452241227FA, )),
+                (200, 38, 38, 25, roundrect, (5, )),
+            )),
+            # 平常
+            (normal_color, (
+                (203, 74, 16, 15, bitmap, (0x00087FFE010021081110092009200104FFFE010001000100010001000100, )),
+                (220, 74, 16, 15, bitmap, (0x1190091029243FFE40044FF408100FF001001FFC11081108110811380100, )),
+                (200, 68, 38, 25, roundrect, (5, )),
+            )),
+        )
+        for color, parts in badges:
+            target = items if color == fg else static_items
+            for x, y, w, h, kind, args in parts:
+                target.append((x, y, w, h, kind, args + (color, )))
+
+        self._render(items, static_items)
 
 class AltFont7seg:
     """
@@ -794,14 +1292,12 @@ class AltFont7seg:
     )
 
     @staticmethod
-    def __drawHorizon(vlcd, x, y, w, h, color):
+    def __horizonPrimitives(x, y, w, h):
         """
-        7segの水平方向のセグメントを描画する
+        7segの水平方向のセグメントを構成する図形を返す
 
         Parameters
         ----------
-        vlcd : object
-            VirtualLCDオブジェクト
         x : int
             描画位置左上のx座標
         y : int
@@ -810,23 +1306,26 @@ class AltFont7seg:
             セグメントの幅
         h : int
             セグメントの高さ
-        color : int
-            色
+
+        Returns
+        -------
+        tuple
+            仮想画面の座標による三角形(x1, y1, x2, y2, x3, y3)と方形(x, y, width, height)のtuple
         """
         hh = round(h / 2)
-        vlcd._triangle(x+hh, y+hh, x+h, y, x+h, y+h-1, color, color)
-        vlcd._triangle(x+h+hh+w, y+hh, x+h+w, y, x+h+w, y+h-1, color, color)
-        vlcd._rect(x+h, y, w, h, color, color)
+        return (
+            (x+hh, y+hh, x+h, y, x+h, y+h-1),
+            (x+h+hh+w, y+hh, x+h+w, y, x+h+w, y+h-1),
+            (x+h, y, w, h),
+        )
 
     @staticmethod
-    def __drawVertical(vlcd, x, y, w, h, color):
+    def __verticalPrimitives(x, y, w, h):
         """
-        7segの垂直方向のセグメントを描画する
+        7segの垂直方向のセグメントを構成する図形を返す
 
         Parameters
         ----------
-        vlcd : object
-            VirtualLCDオブジェクト
         x : int
             描画位置左上のx座標
         y : int
@@ -835,13 +1334,116 @@ class AltFont7seg:
             セグメントの幅
         h : int
             セグメントの高さ
+
+        Returns
+        -------
+        tuple
+            仮想画面の座標による三角形(x1, y1, x2, y2, x3, y3)と方形(x, y, width, height)のtuple
+        """
+        hw = round(w / 2)
+        return (
+            (x+hw, y+hw, x+1, y+w, x+w-1, y+w),
+            (x+hw, y+w+h+hw, x+1, y+w+h, x+w-1, y+w+h),
+            (x, y+w, w, h),
+        )
+
+    @staticmethod
+    def __compile(vlcd, primitives):
+        """
+        図形の座標を描画位置(0, 0)の実際の座標からの差分に変換する
+
+        仮想画面から実際の画面への座標変換は平行移動を含む線形な変換のため
+        描画位置の実際の座標に差分を加えれば図形の実際の座標になる
+
+        Parameters
+        ----------
+        vlcd : object
+            VirtualLCDオブジェクト
+        primitives : tuple
+            仮想画面の座標による図形のtuple
+
+        Returns
+        -------
+        tuple
+            実際の画面の座標の差分による三角形(6要素)と方形(4要素: x, y, width, height)のtuple
+        """
+        origin_x, origin_y = vlcd._convertCoordinates(0, 0)
+        compiled = []
+        for p in primitives:
+            if len(p) == 6:
+                x1, y1 = vlcd._convertCoordinates(p[0], p[1])
+                x2, y2 = vlcd._convertCoordinates(p[2], p[3])
+                x3, y3 = vlcd._convertCoordinates(p[4], p[5])
+                compiled.append((
+                    x1 - origin_x, y1 - origin_y,
+                    x2 - origin_x, y2 - origin_y,
+                    x3 - origin_x, y3 - origin_y
+                ))
+            else:
+                x, y, width, height = vlcd._convertRect(p[0], p[1], p[2], p[3])
+                compiled.append((x - origin_x, y - origin_y, width, height))
+        return tuple(compiled)
+
+    @classmethod
+    def __getSegments(cls, vlcd, w, h):
+        """
+        7segの各セグメントの図形を取得する
+
+        初回の使用時に実際の画面の座標に変換してVirtualLCDにキャッシュする
+        キャッシュは VirtualLCD.setFlip() で破棄される
+
+        Parameters
+        ----------
+        vlcd : object
+            VirtualLCDオブジェクト
+        w : int
+            セグメントの幅
+        h : int
+            セグメントの高さ
+
+        Returns
+        -------
+        tuple
+            上位のビットのセグメントから順に __compile() で変換した図形のtuple
+        """
+        key = (w, h, vlcd._flip)
+        segments = vlcd._segment_cache.get(key)
+        if segments is None:
+            segments = (
+                cls.__compile(vlcd, cls.__horizonPrimitives(0, 0, w, h)),
+                cls.__compile(vlcd, cls.__verticalPrimitives(0, 1, h, w)),
+                cls.__compile(vlcd, cls.__verticalPrimitives(w+h, 1, h, w)),
+                cls.__compile(vlcd, cls.__horizonPrimitives(0, w+h+3, w, h)),
+                cls.__compile(vlcd, cls.__verticalPrimitives(0, 5+w+h, h, w)),
+                cls.__compile(vlcd, cls.__verticalPrimitives(w+h, 5+w+h, h, w)),
+                cls.__compile(vlcd, cls.__horizonPrimitives(0, (w+h)*2+7, w, h)),
+            )
+            vlcd._segment_cache[key] = segments
+        return segments
+
+    @staticmethod
+    def __drawSegment(lcd, x, y, segment, color):
+        """
+        変換済みのセグメントの図形を描画する
+
+        Parameters
+        ----------
+        lcd : object
+            lcdモジュール
+        x : int
+            描画位置の実際の画面のx座標
+        y : int
+            描画位置の実際の画面のy座標
+        segment : tuple
+            __compile() で変換した図形のtuple
         color : int
             色
         """
-        hw = round(w / 2)
-        vlcd._triangle(x+hw, y+hw, x+1, y+w, x+w-1, y+w, color, color)
-        vlcd._triangle(x+hw, y+w+h+hw, x+1, y+w+h, x+w-1, y+w+h, color, color)
-        vlcd._rect(x, y+w, w, h, color, color)
+        for p in segment:
+            if len(p) == 6:
+                lcd.triangle(x+p[0], y+p[1], x+p[2], y+p[3], x+p[4], y+p[5], color=color, fillcolor=color)
+            else:
+                lcd.rect(x+p[0], y+p[1], p[2], p[3], color=color, fillcolor=color)
 
     @staticmethod
     def __getColor(flags, mask, color, behind_color):
@@ -897,7 +1499,9 @@ class AltFont7seg:
             文字の幅
         """
         if color is not None:
-            cls.__drawHorizon(vlcd, x, y+w+h+3, w, h, color)
+            # 7segの水平中のセグメントと同じ
+            actual_x, actual_y = vlcd._convertCoordinates(x, y)
+            cls.__drawSegment(vlcd._lcd, actual_x, actual_y, cls.__getSegments(vlcd, w, h)[3], color)
         return 2*h+w
 
     @classmethod
@@ -969,37 +1573,53 @@ class AltFont7seg:
         int
             文字の幅
         """
-        c = cls.__getColor(flags, 0b1000000, color, behind_color)
-        if c is not None:
-            cls.__drawHorizon(vlcd, x, y, w, h, c)
-
-        c = cls.__getColor(flags, 0b0100000, color, behind_color)
-        if c is not None:
-            cls.__drawVertical(vlcd, x, y+1, h, w, c)
-
-        c = cls.__getColor(flags, 0b0010000, color, behind_color)
-        if c is not None:
-            cls.__drawVertical(vlcd, x+w+h, y+1, h, w, c)
-
-        c = cls.__getColor(flags, 0b0001000, color, behind_color)
-        if c is not None:
-            cls.__drawHorizon(vlcd, x, y+w+h+3, w, h, c)
-
-        c = cls.__getColor(flags, 0b0000100, color, behind_color)
-        if c is not None:
-            cls.__drawVertical(vlcd, x, y+5+w+h, h, w, c)
+        lcd = vlcd._lcd
+        actual_x, actual_y = vlcd._convertCoordinates(x, y)
+        mask = 0b1000000
+        for segment in cls.__getSegments(vlcd, w, h):
+            c = cls.__getColor(flags, mask, color, behind_color)
+            if c is not None:
+                cls.__drawSegment(lcd, actual_x, actual_y, segment, c)
+            mask >>= 1
+        return 2*h+w
 
-        c = cls.__getColor(flags, 0b0000010, color, behind_color)
-        if c is not None:
-            cls.__drawVertical(vlcd, x+w+h, y+5+w+h, h, w, c)
+    @staticmethod
+    def __put(vlcd, items, x, y, w, h, kind, args):
+        """
+        1文字を表示項目に追加する、または描画する
 
-        c = cls.__getColor(flags, 0b0000001, color, behind_color)
-        if c is not None:
-            cls.__drawHorizon(vlcd, x, y+(w+h)*2+7, w, h, c)
-        return 2*h+w
+        Parameters
+        ----------
+        vlcd : object
+            VirtualLCDオブジェクト
+        items : list | None
+            表示項目のリスト
+            Noneの場合は追加せずに直接描画する
+        x : int
+            描画位置左上のx座標
+        y : int
+            描画位置左上のy座標
+        w : int
+            セグメントの幅
+        h : int
+            セグメントの高さ
+        kind : int
+            表示項目の種類(VirtualLCD.ITEM_*)
+        args : tuple
+            表示項目の引数
+        """
+        if kind == VirtualLCD.ITEM_COLON:
+            item_w = h
+        else:
+            item_w = 2*h+w
+        item = (x, y, item_w, 3*h+2*w+7, kind, args)
+        if items is None:
+            vlcd._drawItem(item)
+        else:
+            items.append(item)
 
     @classmethod
-    def drawWatt(cls, vlcd, x, y, width, height, watt, color, behind_color, *, margin=3):
+    def drawWatt(cls, vlcd, x, y, width, height, watt, color, behind_color, *, margin=3, items=None):
         """
         7-seg形式でワット数を描画する
 
@@ -1024,11 +1644,14 @@ class AltFont7seg:
             描画しないセグメントの色
         margin : int
             文字間の幅
+        items : list
+            指定した場合は描画せずに1文字ずつ表示項目として追加する
         """
         minus_color = behind_color
         if watt < 0:
             minus_color = color
-        x += cls.drawMinus(vlcd, x, y, width, height, minus_color) + margin
+        cls.__put(vlcd, items, x, y, width, height, VirtualLCD.ITEM_MINUS, (width, height, minus_color))
+        x += 2*height+width + margin
         watt = abs(watt)
         if watt > 9999:
             watt = 9999
@@ -1038,10 +1661,11 @@ class AltFont7seg:
                 flags = 0
             else:
                 flags = cls.FLAGS[int(c)]
-            x += cls.draw7seg(vlcd, x, y, width, height, flags, color, behind_color) + margin
+            cls.__put(vlcd, items, x, y, width, height, VirtualLCD.ITEM_7SEG, (width, height, flags, color, behind_color))
+            x += 2*height+width + margin
 
     @classmethod
-    def drawDate(cls, vlcd, x, y, width, height, mon, mday, color, behind_color, *, margin=3, md_margin=6):
+    def drawDate(cls, vlcd, x, y, width, height, mon, mday, color, behind_color, *, margin=3, md_margin=6, items=None):
         """
         7-seg形式で月と日を描画する
 
@@ -1071,16 +1695,19 @@ class AltFont7seg:
             文字間の幅
         md_margin : int
             月と日の間の幅
+        items : list
+            指定した場合は描画せずに1文字ずつ表示項目として追加する
         """
         for c in mon + " " + mday:
             if c == " ":
                 x += md_margin
                 continue
             flags = cls.FLAGS[int(c)]
-            x += cls.draw7seg(vlcd, x, y, width, height, flags, color, behind_color) + margin
+            cls.__put(vlcd, items, x, y, width, height, VirtualLCD.ITEM_7SEG, (width, height, flags, color, behind_color))
+            x += 2*height+width + margin
 
     @classmethod
-    def drawTime(cls, vlcd, x, y, width, height, time_str, color, behind_color, *, margin=3):
+    def drawTime(cls, vlcd, x, y, width, height, time_str, color, behind_color, *, margin=3, items=None):
         """
         7-seg形式で時刻を描画する
 
@@ -1104,12 +1731,58 @@ class AltFont7seg:
             描画しないセグメントの色
         margin : int
             文字間の幅
+        items : list
+            指定した場合は描画せずに1文字ずつ表示項目として追加する
         """
         for c in time_str:
             if c == ":":
-                x += cls.drawColon(vlcd, x, y, width, height, color) + margin
+                cls.__put(vlcd, items, x, y, width, height, VirtualLCD.ITEM_COLON, (width, height, color))
+                x += height + margin
             else:
                 flags = cls.FLAGS[int(c)]
-                x += cls.draw7seg(vlcd, x, y, width, height, flags, color, behind_color) + margin
+                cls.__put(vlcd, items, x, y, width, height, VirtualLCD.ITEM_7SEG, (width, height, flags, color, behind_color))
+                x += 2*height+width + margin
+
+class LCDRecorder:
+    """
+    lcdモジュールの描画命令を記録するクラス
+
+    VirtualLCDのlcdの代わりに使用して描画命令を記録し VirtualLCD._replay() で再生する
+
+    Attributes
+    ----------
+    calls : list
+        記録した描画命令 (関数名, 引数, キーワード引数) のリスト
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def font(self, *args, **kwargs):
+        self.calls.append(("font", args, kwargs))
+
+    def text(self, *args, **kwargs):
+        self.calls.append(("text", args, kwargs))
+
+    def pixel(self, *args, **kwargs):
+        self.calls.append(("pixel", args, kwargs))
+
+    def line(self, *args, **kwargs):
+        self.calls.append(("line", args, kwargs))
+
+    def rect(self, *args, **kwargs):
+        self.calls.append(("rect", args, kwargs))
+
+    def roundrect(self, *args, **kwargs):
+        self.calls.append(("roundrect", args, kwargs))
+
+    def triangle(self, *args, **kwargs):
+        self.calls.append(("triangle", args, kwargs))
+
+    def circle(self, *args, **kwargs):
+        self.calls.append(("circle", args, kwargs))
+
+    def arc(self, *args, **kwargs):
+        self.calls.append(("arc", args, kwargs))
 
 # <<< vlcd
@@ -56,13 +56,22 @@ class BP35A1Client:
         BP35A1との通信で最初の文字を待つ時間(ミリ秒)
     DEFAULT_READ_RETRY : int
         BP35A1からデータを受信する際のデフォルト再試行回数
+        受信待ちの上限時間の計算に使用する
     DEFAULT_READ_WAIT_TIME_MS : int
         BP35A1にコマンドを送信してから受信するまでに待機するデフォルトの時間(ミリ秒)
+        受信待ちの上限時間の計算に使用する
     DEFAULT_RETRY_WAIT_TIME_MS : int
         BP35A1からのデータを受信をリトライする際のデフォルトの待機時間(ミリ秒)
+        受信待ちの上限時間の計算に使用する
+    POLL_INTERVAL_MS : int
+        BP35A1からの受信データの有無を確認する間隔(ミリ秒)
+        受信データがあればbreak_wordsが見つかった時点で待機せずに処理を終了する
     MAX_LOOP_COUNT : int
         BP35A1からのデータ受信がループになった場合の最大繰り返し回数
         通常は発生しないが異常時に無限ループにならないための対策
+    RECEIVE_BUFFER_SIZE : int
+        BP35A1からの受信データを行に分割するためのバッファの大きさ(バイト)
+        最も長い行(積算電力量計測値履歴1のERXUDP)よりも大きくする
     SCAN_READ_WAIT_TIME_MS : int
         SKSCANコマンド実行時のコマンド実行後受信待ち時間(ミリ秒)
     SCAN_RETRY_WAIT_TIME_MS : int
@@ -81,6 +90,12 @@ class BP35A1Client:
         SKSENDTOコマンド実行時のリトライ待機時間(ミリ秒)
     SENDTO_RETRY_COUNT : int
         SKSENDTOコマンド実行時のリトライ回数
+    NOTIFICATION_QUEUE_SIZE : int
+        処理待ちのプロパティ値通知(INF, INFC)を保持する最大数
+        超えた場合は古い通知から破棄する
+    MEASUREMENT_EPCS : [int, int]
+        execGetMeasurements() で問い合わせるプロパティ
+        瞬時電力計測値, 瞬時電流計測値, 積算電力量計測値
     CRLF : str
         改行文字
         コマンドを区切る文字
@@ -97,7 +112,9 @@ class BP35A1Client:
     DEFAULT_READ_RETRY = 5
     DEFAULT_READ_WAIT_TIME_MS = 500
     DEFAULT_RETRY_WAIT_TIME_MS = 100
+    POLL_INTERVAL_MS = 10
     MAX_LOOP_COUNT = 200
+    RECEIVE_BUFFER_SIZE = 1024
 
     SCAN_READ_WAIT_TIME_MS = 5000
     SCAN_RETRY_WAIT_TIME_MS = 3000
@@ -110,6 +127,10 @@ class BP35A1Client:
     SENDTO_RETRY_WAIT_TIME_MS = 500
     SENDTO_RETRY_COUNT = 20
 
+    NOTIFICATION_QUEUE_SIZE = 8
+
+    MEASUREMENT_EPCS = [0xE7, 0xE8, 0xE0]
+
     CRLF = "\r\n"
 
     def __init__(self, *, uart, utime, logging):
@@ -127,8 +148,17 @@ class BP35A1Client:
         self._utime = utime
         self._client = self._createClient(uart)
         self._logging = logging
+        self._rx_buffer = bytearray(self.RECEIVE_BUFFER_SIZE)
+        self._rx_view = memoryview(self._rx_buffer)
+        self._rx_start = 0  # 未処理データの先頭位置
+        self._rx_end = 0    # 受信済みデータの末尾位置
+        self._rx_scan = 0   # 改行の探索が済んだ位置
+        self._binary_mode = False  # ERXUDPのデータ部がバイナリ(WOPT 00)の場合はTrue
         self._tid = 0
         self._ip_address = None
+        self._transactions = {}  # TIDをkeyとした応答待ちのトランザクション
+        self._notifications = []  # 処理待ちのプロパティ値通知
+        self._notification_callbacks = []
         self._factor = 1
         self._unit = 1
 
@@ -156,9 +186,235 @@ class BP35A1Client:
         )
         return client
 
-    def _writeAndReadline(self, command, break_words = None, *, max_retry = None, pre_wait = None, retry_wait = None, auto_crlf = True):
+    def _resetReceiveBuffer(self):
+        """
+        受信バッファ内の未処理データを破棄する
+        """
+        self._rx_start = 0
+        self._rx_end = 0
+        self._rx_scan = 0
+
+    def _receive(self):
+        """
+        BP35A1から受信可能なデータをまとめて受信バッファに読み込む
+
+        受信済みの行を取り出した分のバッファ領域は先頭に詰めてから読み込む
+
+        Returns
+        -------
+        int
+            デバイスが受信可能と通知したバイト数
+            0以下の場合は受信データなし
+        """
+        size = self._client.any()
+        if size <= 0:
+            return size
+        view = self._rx_view
+        start = self._rx_start
+        if start > 0:
+            remaining = self._rx_end - start
+            view[0:remaining] = view[start:self._rx_end]
+            self._rx_scan -= start
+            self._rx_end = remaining
+            self._rx_start = 0
+        free = len(self._rx_buffer) - self._rx_end
+        data = self._client.read(size if size < free else free)
+        if data is not None:
+            length = len(data)
+            view[self._rx_end:self._rx_end + length] = data
+            self._rx_end += length
+        return size
+
+    def _findUDPDataOffset(self, data, start, end):
+        """
+        ERXUDPイベントのデータ部の開始位置を探す
+
+        ERXUDP <SENDER> <DEST> <RPORT> <LPORT> <SENDERLLA> <SECURED> <DATALEN> <DATA>
+        の8つ目の空白の次の位置をデータ部の開始位置とする
+
+        Parameters
+        ----------
+        data : bytes | bytearray
+            ERXUDPイベントを含むバイト列
+        start : int
+            ERXUDPイベントの開始位置
+        end : int
+            探索を終了する位置
+
+        Returns
+        -------
+        int
+            データ部の開始位置
+            データ部の開始位置まで受信していない場合は-1
+            データ部の前に改行がある場合は-2
+        """
+        spaces = 0
+        i = start
+        while i < end:
+            c = data[i]
+            if c == 0x0A:  # LF
+                return -2
+            if c == 0x20:
+                spaces += 1
+                if spaces == 8:
+                    return i + 1
+            i += 1
+        return -1
+
+    def _nextBinaryUDPEvent(self):
+        """
+        受信バッファからバイナリ形式のERXUDPイベントを1つ取り出す
+
+        データ部は改行文字を含み得るため改行ではなくDATALENのバイト数をもとに取り出す
+
+        Returns
+        -------
+        bytes | None | bool
+            取り出したERXUDPイベント(末尾の改行を含まない)
+            イベントの末尾まで受信していない場合はNone
+            受信バッファの先頭がERXUDPイベントではない場合はFalse
+        """
+        buffer = self._rx_buffer
+        start = self._rx_start
+        end = self._rx_end
+        head = bytes(self._rx_view[start:start + 7 if start + 7 < end else end])
+        if not b"ERXUDP ".startswith(head):
+            return False
+        if len(head) < 7:
+            return None
+        data_start = self._findUDPDataOffset(buffer, start, end)
+        if data_start == -1:
+            return None
+        if data_start == -2:
+            return False
+        try:
+            data_length = int(bytes(self._rx_view[data_start - 5:data_start - 1]), 16)
+        except ValueError:
+            return False
+        data_end = data_start + data_length
+        if data_end + 2 > end:  # 末尾のCRLFまで待つ
+            return None
+        self._rx_start = data_end + 2
+        self._rx_scan = data_end + 2
+        return bytes(self._rx_view[start:data_end])
+
+    def _nextLine(self):
+        """
+        受信バッファから改行までの1行を取り出す
+
+        末尾の改行文字(空白文字)は取り除かれる
+        バッファが一杯になっても改行が見つからない場合はバッファの内容全体を1行とみなす
+        バイナリモードの場合ERXUDPイベントはデータ部の長さをもとに取り出す
+
+        Returns
+        -------
+        bytes | None
+            取り出した1行
+            改行まで受信していない場合はNone
+        """
+        buffer = self._rx_buffer
+        end = self._rx_end
+        if self._binary_mode and self._rx_start < end:
+            event = self._nextBinaryUDPEvent()
+            if event is None and (self._rx_start > 0 or end < len(buffer)):
+                return None
+            if event:
+                return event
+        i = self._rx_scan
+        while i < end:
+            if buffer[i] == 0x0A:  # LF
+                break
+            i += 1
+        else:
+            self._rx_scan = end
+            if self._rx_start > 0 or end < len(buffer):
+                return None
+            self._logging.warning(self.__class__.__name__ + " receive buffer overflow")
+        line_start = self._rx_start
+        line_end = i
+        while line_end > line_start and buffer[line_end - 1] <= 0x20:
+            line_end -= 1
+        next_start = i + 1 if i < end else end
+        self._rx_start = next_start
+        self._rx_scan = next_start
+        return bytes(self._rx_view[line_start:line_end])
+
+    def _readLines(self, command_head, searches, prefixes, response_lines):
+        """
+        受信済みのデータと受信可能なデータを1行ずつ処理する
+
+        ERXUDPイベントは全て _dispatchUDPEvent() に渡して応答待ちのトランザクションに振り分ける
+        バイナリモードの場合ERXUDPイベントはsearchesとprefixesの判定対象にならない
+
+        Parameters
+        ----------
+        command_head : str
+            実行中のコマンド名
+            例外のメッセージに使用する
+        searches : [bytes, bytes]
+            処理を終了する文字列のリスト
+        prefixes : (bytes, bytes) | None
+            結果として返す行の先頭の文字列
+            Noneの場合は全ての行を返す
+        response_lines : list | None
+            結果として返す行を追加するリスト
+            Noneの場合は結果を返さない
+
+        Returns
+        -------
+        bool
+            searchesのいずれかを含む行が見つかった場合はTrue
+
+        Raises
+        -------
+        ReadTimeoutError
+            受信処理がループになった場合に発生する
+        """
+        max_loop_count = self.MAX_LOOP_COUNT
+        loop_count = 0
+        while True:
+            line = self._nextLine()
+            while line is not None:
+                text = None
+                if line.startswith(b"ERXUDP "):
+                    if self._binary_mode:
+                        # データ部がバイナリのため振り分けのみ行い結果の行としては扱わない
+                        self._dispatchUDPEvent(line)
+                        line = self._nextLine()
+                        continue
+                    text = line.decode()
+                    self._dispatchUDPEvent(text)
+                found = False
+                for search_str in searches:
+                    if search_str in line:
+                        found = True
+                        break
+                if response_lines is not None:
+                    keep = found or prefixes is None
+                    if not keep:
+                        for prefix in prefixes:
+                            if line.startswith(prefix):
+                                keep = True
+                                break
+                    if keep:
+                        response_lines.append(line.decode() if text is None else text)
+                if found:
+                    return True
+                line = self._nextLine()
+            if loop_count >= max_loop_count or self._receive() <= 0:
+                break
+            loop_count += 1
+            self._logging.debug(self.__class__.__name__ + " waiting response. count = " + str(loop_count))
+        if loop_count >= max_loop_count:
+            raise ReadTimeoutError("Infinite loop detected. (" + command_head + ")")
+        return False
+
+    def _writeAndReadline(self, command, break_words = None, *, max_retry = None, pre_wait = None, retry_wait = None, auto_crlf = True, line_filter = None):
         """
-        BP35A1にコマンドを送信(write)して結果を1行ずつ受信(readline)する
+        BP35A1にコマンドを送信(write)して結果を1行ずつ受信する
+
+        受信データはまとめて受信バッファに読み込んで改行で分割する
+        文字列への変換(decode)は結果として返す行に対してのみ行う
 
         Parameters
         ----------
@@ -170,16 +426,23 @@ class BP35A1Client:
             リストを渡した場合はリスト内のいずれかの文字列が行の中に含まれていたら処理を終了する
             Noneの場合は繰り返しの上限回数まで処理を続ける
         max_retry : int
-            受信処理を繰り返す最大の回数(1を指定した場合は受信処理は最大2回行われる)
-            Noneの場合は DEFAULT_READ_RETRY 回数繰り返す
+            受信処理を繰り返す最大の回数
+            受信待ちの上限時間は pre_wait + retry_wait * max_retry (ミリ秒)
+            Noneの場合は DEFAULT_READ_RETRY
         pre_wait : int
             コマンドを送信してから受信処理を行う前に待機する時間(ミリ秒)
-            Noneの場合は DEFAULT_READ_WAIT_TIME_MS 待機する
+            実際には待機せず受信待ちの上限時間の計算にのみ使用する
+            Noneの場合は DEFAULT_READ_WAIT_TIME_MS
         retry_wait : int
             受信処理を繰り返す際に待機する時間(ミリ秒)
-            Noneの場合は DEFAULT_RETRY_WAIT_TIME_MS 待機する
+            実際には待機せず受信待ちの上限時間の計算にのみ使用する
+            Noneの場合は DEFAULT_RETRY_WAIT_TIME_MS
         auto_crlf : bool
             Trueの場合渡されたコマンドの末尾に改行が付加される
+        line_filter : str | (str, str)
+            指定した文字列で始まる行のみを結果として返す
+            break_wordsを含む行は常に結果に含まれる
+            Noneの場合は受信した全ての行を返す
 
         Returns
         -------
@@ -190,7 +453,33 @@ class BP35A1Client:
         Raises
         -------
         ReadTimeoutError
-            規定の処理時間(回数)内で指定されたbreak_wordsが見つからなかった場合に発生する
+            規定の処理時間内で指定されたbreak_wordsが見つからなかった場合に発生する
+        """
+        request = self._writeCommand(
+            command,
+            break_words,
+            max_retry  = max_retry,
+            pre_wait   = pre_wait,
+            retry_wait = retry_wait,
+            auto_crlf  = auto_crlf,
+            line_filter = line_filter
+        )
+        while not self._pollResponse(request):
+            self._utime.sleep_ms(self.POLL_INTERVAL_MS)
+        return request[3]
+
+    def _writeCommand(self, command, break_words, *, max_retry, pre_wait, retry_wait, auto_crlf, line_filter):
+        """
+        BP35A1にコマンドを送信(write)して受信待ちの状態を作成する
+
+        受信待ちの状態は _pollResponse() に渡して結果を受信する
+        引数は _writeAndReadline() と同じ
+
+        Returns
+        -------
+        list
+            受信待ちの状態
+            [コマンド名, 終了する文字列のリスト, 結果として返す行の先頭の文字列, 受信した行のリスト, 受信待ちの上限時刻, break_wordsの指定有無]
         """
         client = self._client
         utime = self._utime
@@ -212,41 +501,54 @@ class BP35A1Client:
             client.write(command + self.CRLF)
         else:
             client.write(command)
-        max_loop_count = self.MAX_LOOP_COUNT
-        response_lines = []
         searches = []
         if type(break_words) is str:
             searches.append(break_words)
         elif type(break_words) is list or type(break_words) is tuple:
             searches = list(break_words)
         logger.debug(class_name + " search words " + str(searches))
+        searches = [search_str.encode() for search_str in searches]
+        prefixes = None
+        if type(line_filter) is str:
+            prefixes = (line_filter.encode(),)
+        elif line_filter is not None:
+            prefixes = tuple(prefix.encode() for prefix in line_filter)
 
-        waits = [pre_wait]
-        waits += [retry_wait] * max_retry
-        for wait in waits:
-            utime.sleep_ms(wait)
-            loop_count = 0
-            while client.any() > 0 and loop_count < max_loop_count:
-                line = client.readline()
-                if line is not None:
-                    if type(line) is bytes:
-                        line = line.decode()
-                    line = line.rstrip()
-                    response_lines.append(line)
-                    for search_str in searches:
-                        if search_str in line:
-                            logger.debug(response_lines)
-                            return response_lines
-                loop_count += 1
-                logger.debug(class_name + " waiting response. count = " + str(loop_count))
-            if loop_count >= max_loop_count:
-                raise ReadTimeoutError("Infinite loop detected. (" + command_head + ")")
-        if break_words is not None:
-            raise ReadTimeoutError("Read timed out. (" + command_head + ")")
+        # 送信時点から受信待ちの上限時刻を決めて短い間隔で受信データの有無を確認する
+        deadline = utime.ticks_add(utime.ticks_ms(), pre_wait + retry_wait * max_retry)
+        return [command_head, searches, prefixes, [], deadline, break_words is not None]
 
-        return response_lines
+    def _pollResponse(self, request):
+        """
+        受信可能なデータを処理してコマンドの受信待ちが終了したかを判定する
+
+        Parameters
+        ----------
+        request : list
+            _writeCommand() で作成した受信待ちの状態
+
+        Returns
+        -------
+        bool
+            break_wordsが見つかったか受信待ちの上限時刻を過ぎた場合はTrue
+
+        Raises
+        -------
+        ReadTimeoutError
+            break_wordsの指定があり上限時刻までに見つからなかった場合に発生する
+        """
+        command_head, searches, prefixes, response_lines, deadline, required = request
+        if self._readLines(command_head, searches, prefixes, response_lines):
+            self._logging.debug(response_lines)
+            return True
+        utime = self._utime
+        if utime.ticks_diff(deadline, utime.ticks_ms()) > 0:
+            return False
+        if required:
+            raise ReadTimeoutError("Read timed out. (" + command_head + ")")
+        return True
 
-    def _sendUDPData(self, ip_address, data, break_words = None):
+    def _sendUDPData(self, ip_address, data, break_words = None, line_filter = None):
         """
         指定した宛先にUDPでデータを送信する
 
@@ -264,12 +566,47 @@ class BP35A1Client:
             送信するデータ
         break_words : str | [str, str]
             受信待ち処理終了のキーワード
+        line_filter : str | (str, str)
+            結果として返す行の先頭の文字列
+            Noneの場合は受信した全ての行を返す
 
         Returns
         -------
         list [str, str]
             受信した各行のリスト
         """
+        response = self._writeAndReadline(
+            self._createSendToCommand(ip_address, data),
+            break_words = break_words,
+            max_retry   = self.SENDTO_RETRY_COUNT,
+            pre_wait    = self.SENDTO_READ_WAIT_TIME_MS,
+            retry_wait  = self.SENDTO_RETRY_WAIT_TIME_MS,
+            auto_crlf   = False,
+            line_filter = line_filter
+        )
+        return response
+
+    def _createSendToCommand(self, ip_address, data):
+        """
+        指定した宛先にUDPでデータを送信するSKSENDTOコマンドを生成する
+
+        Parameters
+        ----------
+        ip_address : str
+            宛先のIPv6アドレス
+        data : bytes
+            送信するデータ
+
+        Returns
+        -------
+        bytes
+            SKSENDTOコマンド
+
+        Raises
+        -------
+        UndefinedAddressError
+            宛先のIPv6アドレスがNoneの場合に発生する
+        """
         if ip_address is None:
             raise UndefinedAddressError("IPv6 address must not be None.")
         command = "SKSENDTO 1 {ip_address} {port:04X} {sec:d} {data_len:04X} ".format(
@@ -278,15 +615,7 @@ class BP35A1Client:
             sec = 1,
             data_len = len(data)
         )
-        response = self._writeAndReadline(
-            command.encode("utf-8") + data,
-            break_words = break_words,
-            max_retry   = self.SENDTO_RETRY_COUNT,
-            pre_wait    = self.SENDTO_READ_WAIT_TIME_MS,
-            retry_wait  = self.SENDTO_RETRY_WAIT_TIME_MS,
-            auto_crlf   = False
-        )
-        return response
+        return command.encode("utf-8") + data
 
     def _extractUDPData(self, event):
         """
@@ -296,51 +625,307 @@ class BP35A1Client:
 
         Parameters
         ----------
-        event : str
+        event : str | bytes
             ERXUDPイベントの内容(改行を含まない)
+            バイナリモードの場合はbytes
 
         Returns
         -------
-        str
+        str | bytes
             受信データ
-        """
+            eventがbytesの場合はデータ部のバイト列
+
+        Raises
+        ------
+        ValueError
+            ERXUDPイベントの形式ではない場合に発生する
+        """
+        if type(event) is not str:
+            data_start = self._findUDPDataOffset(event, 0, len(event))
+            if data_start < 0:
+                raise ValueError("Invalid ERXUDP event.")
+            return event[data_start:]
         _, _, _, _, _, _, _, _, response_data = event.split(" ")
         return response_data
 
-    def _findFrameFromResponseEvents(self, events, sent_frame):
+    def _extractUDPHeader(self, event):
         """
-        送信したフレームに対応する応答を探して解析して返す
+        UDP受信通知から送信元と受信データ以外の項目を取り出す
 
-        SKSENDTOコマンドの送信後に受信したERXUDPイベント(複数)の中から送信したECHONET Liteフレームに対応する
-        応答を見つけてフレームデータを解析して返す
-        対応するフレームが複数見つかった場合は最初に受信したフレームを返す
+        ERXUDP <SENDER> <DEST> <RPORT> <LPORT> <SENDERLLA> <SECURED> <DATALEN> <DATA>
+        の<SENDER>から<DATALEN>までを取り出す
 
         Parameters
         ----------
-        events : list [str, str]
-            受信した内容文字列の配列
-            ASCIIモードでの応答にのみ対応
-        sent_frame : bytes
-            送信したフレームデータ
-            フレームデータのTID, EPCが一致する受信フレームを探す
+        event : str | bytes
+            ERXUDPイベントの内容(改行を含まない)
+            バイナリモードの場合はbytes
 
         Returns
         -------
-        dict | None
-            受信したECHONET Liteフレームデータを解析したdict
-            対応する応答を見つけられなかった場合はNone
+        [str, str, str, str, str, str, str]
+            <SENDER>から<DATALEN>までの各項目の文字列
+
+        Raises
+        ------
+        ValueError
+            ERXUDPイベントの形式ではない場合に発生する
         """
-        tid = int.from_bytes(sent_frame[2:4], "big")
-        epc = int.from_bytes(sent_frame[12:13], "big")
-        for event in events:
-            if not event.startswith("ERXUDP "):
-                continue
-            frame = self._parseEchonetLiteFrame(self._extractUDPData(event))
-            if frame["TID"] == tid and frame["EPC"] == epc:
-                return frame
+        if type(event) is not str:
+            data_start = self._findUDPDataOffset(event, 0, len(event))
+            if data_start < 0:
+                raise ValueError("Invalid ERXUDP event.")
+            event = bytes(event[0:data_start]).decode()
+        items = event.split(" ")
+        if len(items) < 9:
+            raise ValueError("Invalid ERXUDP event.")
+        return items[1:8]
+
+    def _isNotificationFromSmartMeter(self, event):
+        """
+        UDP受信通知が接続中のスマートメータからのECHONET Liteの通知かどうかを判定する
+
+        送信元のアドレスが接続先のスマートメータであり
+        送信元と受信側のポートがECHONET Liteのポート(0x0E1A)であることを確認する
+
+        Parameters
+        ----------
+        event : str | bytes
+            ERXUDPイベントの内容(改行を含まない)
+            バイナリモードの場合はbytes
+
+        Returns
+        -------
+        bool
+            接続中のスマートメータからの通知の場合はTrue
+        """
+        if self._ip_address is None:
+            return False
+        try:
+            sender, _, rport, lport, _, _, _ = self._extractUDPHeader(event)
+        except ValueError:
+            return False
+        return sender == self._ip_address and rport == "0E1A" and lport == "0E1A"
+
+    def _dispatchUDPEvent(self, event):
+        """
+        ERXUDPイベントを応答待ちのトランザクションに振り分ける
+
+        受信データのTIDで応答待ちのトランザクションを探して受信データを格納する
+        スマートメータからのプロパティ値通知(ESV=0x73, 0x74)は通知の処理待ちとして保持する
+        通知は接続中のスマートメータからECHONET Liteのポート宛に届いたもののみ保持する
+
+        Parameters
+        ----------
+        event : str | bytes
+            ERXUDPイベントの内容(改行を含まない)
+            バイナリモードの場合はbytes
+
+        Returns
+        -------
+        bool
+            応答待ちのトランザクションまたは通知の処理待ちに振り分けられた場合はTrue
+        """
+        try:
+            data = self._extractUDPData(event)
+            frame = self._parseEchonetLiteFrame(data)
+        except ValueError:
+            self._logging.debug(self.__class__.__name__ + " ignore non ECHONET Lite data")
+            return False
+        if frame["EHD1"] != 0x10 or frame["EHD2"] != 0x81:
+            self._logging.debug(self.__class__.__name__ + " ignore non ECHONET Lite data")
+            return False
+        if frame["ESV"] == 0x73 or frame["ESV"] == 0x74:
+            if not self._isNotificationFromSmartMeter(event):
+                self._logging.debug(self.__class__.__name__ + " ignore notification from unknown sender")
+                return False
+            # プロパティ値通知(INF, INFC)は processNotifications() で処理する
+            if len(self._notifications) >= self.NOTIFICATION_QUEUE_SIZE:
+                self._logging.warning(self.__class__.__name__ + " notification queue overflow")
+                self._notifications.pop(0)
+            self._notifications.append(data)
+            return True
+        transaction = self._transactions.get(frame["TID"])
+        if transaction is None or transaction[3] is not None:
+            self._logging.debug(self.__class__.__name__ + " unexpected frame. TID = " + str(frame["TID"]))
+            return False
+        leading_frame, epc, _, _ = transaction
+        if type(data) is str:
+            received_leading_frame = data[0:20].upper()
+        else:
+            received_leading_frame = self._toHexString(data[0:10])
+        if received_leading_frame != leading_frame or frame["EPC"] != epc:
+            self._logging.debug(self.__class__.__name__ + " unexpected frame. TID = " + str(frame["TID"]))
+            return False
+        transaction[3] = data
+        return True
+
+    def _beginTransaction(self, ip_address, frame):
+        """
+        ECHONET Liteフレームを送信して応答待ちのトランザクションとして登録する
+
+        SKSENDTOコマンドの完了(OK)までを待ち応答(ERXUDP)は待たない
+        応答は受信した時点でTIDをもとにトランザクションに振り分けられる
+        応答を待たずに続けて複数のフレームを送信できる
+
+        Parameters
+        ----------
+        ip_address : str
+            宛先のIPv6アドレス
+        frame : bytes
+            送信するECHONET Liteフレーム
+
+        Returns
+        -------
+        int
+            トランザクションID(TID)
+            _waitTransaction() で応答を取得する際に使用する
+
+        Raises
+        -------
+        UnexpectedResponseError
+            SKSENDTOコマンドが失敗した場合に発生する
+        """
+        tid = self._registerTransaction(frame)
+        try:
+            response = self._sendUDPData(ip_address, frame, ["OK", "FAIL "], "ERXUDP ")
+        except Exception:
+            self._transactions.pop(tid, None)
+            raise
+        self._confirmTransaction(tid, response)
+        return tid
+
+    def _registerTransaction(self, frame):
+        """
+        送信するECHONET Liteフレームを応答待ちのトランザクションとして登録する
+
+        Parameters
+        ----------
+        frame : bytes
+            送信するECHONET Liteフレーム
+
+        Returns
+        -------
+        int
+            トランザクションID(TID)
+        """
+        utime = self._utime
+        tid = int.from_bytes(frame[2:4], "big")
+        now = utime.ticks_ms()
+        # 応答を受信しないまま期限を過ぎたトランザクションを破棄する
+        # 応答を受信済みのものは _waitTransaction() で取得されるまで残す
+        for expired_tid in [t for t, v in self._transactions.items() if v[3] is None and utime.ticks_diff(v[2], now) < 0]:
+            del self._transactions[expired_tid]
+        deadline = utime.ticks_add(now, self.SENDTO_READ_WAIT_TIME_MS + self.SENDTO_RETRY_WAIT_TIME_MS * self.SENDTO_RETRY_COUNT)
+        self._transactions[tid] = [
+            self._createExpectedEchonetLiteResponseLeadingFrame(frame),
+            frame[12],  # 先頭のEPC
+            deadline,
+            None  # 受信データ
+        ]
+        return tid
+
+    def _confirmTransaction(self, tid, response):
+        """
+        SKSENDTOコマンドの結果を確認して失敗した場合はトランザクションを破棄する
+
+        Parameters
+        ----------
+        tid : int
+            トランザクションID(TID)
+        response : list [str, str]
+            SKSENDTOコマンドの結果
+
+        Raises
+        -------
+        UnexpectedResponseError
+            SKSENDTOコマンドが失敗した場合に発生する
+        """
+        if response[-1].startswith("FAIL "):
+            self._transactions.pop(tid, None)
+            raise UnexpectedResponseError("SKSENDTO returns " + response[-1])
+
+    def _waitTransaction(self, tid):
+        """
+        トランザクションの応答を待って受信データを返す
+
+        Parameters
+        ----------
+        tid : int
+            _beginTransaction() で取得したトランザクションID
+
+        Returns
+        -------
+        str | bytes
+            受信したECHONET Liteフレームデータの16進数表記文字列
+            バイナリモードの場合はバイト列
+
+        Raises
+        -------
+        ReadTimeoutError
+            トランザクションの期限までに応答を受信できなかった場合に発生する
+        """
+        while True:
+            data = self._pollTransaction(tid)
+            if data is not None:
+                return data
+            self._utime.sleep_ms(self.POLL_INTERVAL_MS)
+
+    def _pollTransaction(self, tid):
+        """
+        受信可能なデータを処理してトランザクションの応答を受信したかを判定する
+
+        Parameters
+        ----------
+        tid : int
+            _beginTransaction() で取得したトランザクションID
+
+        Returns
+        -------
+        str | bytes | None
+            受信したECHONET Liteフレームデータ
+            応答をまだ受信していない場合はNone
+
+        Raises
+        -------
+        ReadTimeoutError
+            トランザクションの期限までに応答を受信できなかった場合
+            または期限切れで破棄された場合に発生する
+        """
+        utime = self._utime
+        transaction = self._transactions.get(tid)
+        if transaction is None:
+            raise ReadTimeoutError("Read timed out. (SKSENDTO)")
+        if transaction[3] is None:
+            self._readLines("SKSENDTO", [], None, None)
+        if transaction[3] is not None:
+            del self._transactions[tid]
+            return transaction[3]
+        if utime.ticks_diff(transaction[2], utime.ticks_ms()) <= 0:
+            del self._transactions[tid]
+            raise ReadTimeoutError("Read timed out. (SKSENDTO)")
         return None
 
-    def _createEchonetLiteFrame(self, *, epc, tid = 0x01, esv = 0x62, edt = None):
+    def _requestFrame(self, ip_address, frame):
+        """
+        ECHONET Liteフレームを送信して対応する応答を解析して返す
+
+        Parameters
+        ----------
+        ip_address : str
+            宛先のIPv6アドレス
+        frame : bytes
+            送信するECHONET Liteフレーム
+
+        Returns
+        -------
+        dict
+            受信したECHONET Liteフレームデータを解析したdict
+            _parseEchonetLiteFrame() の戻り値
+        """
+        return self._parseEchonetLiteFrame(self._waitTransaction(self._beginTransaction(ip_address, frame)))
+
+    def _createEchonetLiteFrame(self, *, epc, tid = 0x01, esv = 0x62, edt = None, deoj = 0x028801):
         """
         ECHONET Liteフレームデータを生成する
 
@@ -353,17 +938,18 @@ class BP35A1Client:
               * クラスグループコード: 0x05
               * クラスコード: 0xFF
               * インスタンスコード: 0x01 (0x01-0x7F の範囲で変更可能)
-          * 相手先
+          * 相手先 (deojで変更可能)
             * 低圧スマート電力量メータクラス
               * クラスグループコード: 0x02
               * クラスコード: 0x88
               * インスタンスコード: 0x01 (0x01-0x7F の範囲で変更可能)
-        * OPCは1固定
+        * epcにリストを渡した場合はOPCがプロパティの数になる(EDTは指定できない)
 
         Parameters
         ----------
-        epc : int
+        epc : int | [int, int]
             ECHONET Liteプロパティ
+            リストを渡した場合は複数のプロパティを1つのフレームで要求する
         tid : int
             トランザクションID
         esv : int
@@ -372,6 +958,9 @@ class BP35A1Client:
             0x61 SetC 書き込み要求
         edt : bytes
             プロパティ値データ
+        deoj : int
+            相手先ECHONET Liteオブジェクト
+            デフォルトは低圧スマート電力量メータクラス(0x028801)
 
         Returns
         -------
@@ -382,8 +971,15 @@ class BP35A1Client:
         ehd2 = 0x81  # 形式1
 
         seoj = 0x05FF01  # 送信元ECHONET Liteオブジェクト
-        deoj = 0x028801  # 相手先ECHONET Liteオブジェクト
-        opc  = 0x01  # 要求数:1
+        if type(epc) is list or type(epc) is tuple:
+            if edt is not None:
+                raise ValueError("EDT can not be set to multiple properties.")
+            epcs = epc
+        else:
+            epcs = (epc,)
+        opc  = len(epcs)  # 要求数
+        if opc < 1:
+            raise ValueError("EPC must not be empty.")
         pdc  = 0x00  # EDTバイト数
         if edt is not None:
             pdc = len(edt)
@@ -395,10 +991,10 @@ class BP35A1Client:
             seoj.to_bytes(3, 'big') +
             deoj.to_bytes(3, 'big') +
             esv.to_bytes(1, 'big') +
-            opc.to_bytes(1, 'big') +
-            epc.to_bytes(1, 'big') +
-            pdc.to_bytes(1, 'big')
+            opc.to_bytes(1, 'big')
         )
+        for e in epcs:
+            frame += e.to_bytes(1, 'big') + pdc.to_bytes(1, 'big')
         if edt is not None:
             frame += edt
         return frame
@@ -433,38 +1029,18 @@ class BP35A1Client:
             expected_frame += "%02X" % b
         return expected_frame.upper()
 
-    def _createBreakWordsFromFrame(self, frame):
+    def _parseEchonetLiteFrame(self, frame):
         """
-        ECHONET Liteフレームからレスポンスの検索条件を生成する
+        ECHONET Liteフレームデータを解析して要素として取り出す
 
-        UDPデータを送信する _writeAndReadline() のbreak_wordsパラメータとして使用するリストを生成する
+        EPC, PDC, EDTは最初のプロパティのみ取り出す
+        OPCが2以上のフレームの全てのプロパティは _parseEchonetLiteProperties() で取り出す
 
         Parameters
         ----------
-        frame : bytes
-            要求のECHONET Liteフレーム
-
-        Returns
-        -------
-        tuple : (str, str)
-            break_wordsで使用する文字列のtuple
-            16進数表記の大文字と小文字
-        """
-        break_word = " " + self._createExpectedEchonetLiteResponseLeadingFrame(frame)
-        return (break_word, break_word.lower())
-
-    def _parseEchonetLiteFrame(self, frame):
-        """
-        ECHONET Liteフレームデータを解析して要素として取り出す
-
-        この関数では以下の条件を満たすフレームのみ解析できる
-        * OPCが1
-
-        Parameters
-        ----------
-        frame : str
-            フレームデータの16進数表記文字列
-            バイト列(例: b'\x00\xFF')ではない
+        frame : str | bytes
+            フレームデータの16進数表記文字列
+            バイナリモードで受信した場合はバイト列
 
         Returns
         -------
@@ -480,9 +1056,13 @@ class BP35A1Client:
             OPC : int
             EPC : int
             PDC : int
-            EDT : str
+            EDT : str | bytes
                 EDTはintではなく16進数表記の文字列
+                フレームデータがバイト列の場合はEDTもバイト列のまま取り出す
+                整数への変換は _decodeEDT() で行う
         """
+        if type(frame) is not str:
+            return self._parseEchonetLiteFrameBytes(frame)
         if len(frame) < 28:
             raise ValueError("Frame data too short.")
         data = {}
@@ -501,6 +1081,184 @@ class BP35A1Client:
             data["EDT"] = None
         return data
 
+    def _parseEchonetLiteFrameBytes(self, frame):
+        """
+        バイト列のECHONET Liteフレームデータを解析して要素として取り出す
+
+        16進数表記文字列の解析と異なり各要素をバイト単位で直接取り出す
+        EDTは16進数表記の文字列に変換せずバイト列のまま取り出す
+
+        Parameters
+        ----------
+        frame : bytes
+            フレームデータのバイト列
+
+        Returns
+        -------
+        dict
+            _parseEchonetLiteFrame() の戻り値と同じ形式のdict
+        """
+        if len(frame) < 14:
+            raise ValueError("Frame data too short.")
+        data = {}
+        data["EHD1"] = frame[0]
+        data["EHD2"] = frame[1]
+        data["TID"]  = frame[2] << 8 | frame[3]
+        data["SEOJ"] = frame[4] << 16 | frame[5] << 8 | frame[6]
+        data["DEOJ"] = frame[7] << 16 | frame[8] << 8 | frame[9]
+        data["ESV"]  = frame[10]
+        data["OPC"]  = frame[11]
+        data["EPC"]  = frame[12]
+        data["PDC"]  = frame[13]
+        if data["PDC"] > 0:
+            data["EDT"] = frame[14:]
+        else:
+            data["EDT"] = None
+        return data
+
+    def _toHexString(self, data):
+        """
+        バイト列を16進数表記(大文字)の文字列に変換する
+
+        Parameters
+        ----------
+        data : bytes
+            変換するバイト列
+
+        Returns
+        -------
+        str
+            16進数表記の文字列
+            1バイトにつき2文字
+        """
+        if len(data) == 0:
+            return ""
+        text = "{:X}".format(int.from_bytes(data, "big"))
+        return "0" * (len(data) * 2 - len(text)) + text
+
+    def _decodeEDT(self, edt, start = 0, size = None):
+        """
+        EDTの指定した範囲を符号なし整数(ビッグエンディアン)として取り出す
+
+        バイナリモードで受信したEDTは16進数表記の文字列に変換せずバイト列から直接変換する
+
+        Parameters
+        ----------
+        edt : str | bytes
+            EDTの16進数表記文字列
+            バイナリモードで受信した場合はバイト列
+        start : int
+            取り出す範囲の開始位置(バイト単位)
+        size : int | None
+            取り出す範囲のバイト数
+            Noneの場合は末尾まで
+
+        Returns
+        -------
+        int
+            指定した範囲の整数表現
+
+        Raises
+        ------
+        ValueError
+            EDTが指定した範囲を含んでいない場合に発生する
+        """
+        if type(edt) is str:
+            if size is None:
+                size = len(edt) // 2 - start
+            text = edt[start*2:(start+size)*2]
+            if size <= 0 or len(text) < size * 2:
+                raise ValueError("EDT too short.")
+            return int(text, 16)
+        if size is None:
+            size = len(edt) - start
+        if size <= 0 or len(edt) < start + size:
+            raise ValueError("EDT too short.")
+        return int.from_bytes(edt[start:start+size], "big")
+
+    def _parseEchonetLiteProperties(self, frame):
+        """
+        ECHONET Liteフレームデータから全てのプロパティを取り出す
+
+        OPCの数だけ続くEPC, PDC, EDTの組を解析する
+
+        Parameters
+        ----------
+        frame : str | bytes
+            フレームデータの16進数表記文字列
+            バイナリモードで受信した場合はバイト列
+
+        Returns
+        -------
+        dict {int: str | bytes | None}
+            EPCをkeyとしたEDTのdict
+            EDTはintではなく16進数表記の文字列
+            フレームデータがバイト列の場合はEDTもバイト列
+            PDCが0の場合(要求不可応答など)はNone
+
+        Raises
+        ------
+        ValueError
+            フレームデータがOPCの数のプロパティを含んでいない場合に発生する
+        """
+        if type(frame) is not str:
+            return self._parseEchonetLitePropertiesBytes(frame)
+        if len(frame) < 24:
+            raise ValueError("Frame data too short.")
+        opc = int(frame[22:24], 16)
+        properties = {}
+        offset = 24
+        for _ in range(opc):
+            if len(frame) < offset + 4:
+                raise ValueError("Frame data too short.")
+            epc = int(frame[offset:offset+2], 16)
+            pdc = int(frame[offset+2:offset+4], 16)
+            offset += 4
+            if pdc > 0:
+                edt = frame[offset:offset+pdc*2]
+                if len(edt) < pdc * 2:
+                    raise ValueError("Frame data too short.")
+                properties[epc] = edt
+                offset += pdc * 2
+            else:
+                properties[epc] = None
+        return properties
+
+    def _parseEchonetLitePropertiesBytes(self, frame):
+        """
+        バイト列のECHONET Liteフレームデータから全てのプロパティを取り出す
+
+        Parameters
+        ----------
+        frame : bytes
+            フレームデータのバイト列
+
+        Returns
+        -------
+        dict {int: bytes | None}
+            EPCをkeyとしたEDTのバイト列のdict
+            PDCが0の場合(要求不可応答など)はNone
+        """
+        if len(frame) < 12:
+            raise ValueError("Frame data too short.")
+        opc = frame[11]
+        properties = {}
+        offset = 12
+        for _ in range(opc):
+            if len(frame) < offset + 2:
+                raise ValueError("Frame data too short.")
+            epc = frame[offset]
+            pdc = frame[offset+1]
+            offset += 2
+            if pdc > 0:
+                if len(frame) < offset + pdc:
+                    raise ValueError("Frame data too short.")
+                properties[epc] = frame[offset:offset+pdc]
+                offset += pdc
+            else:
+                properties[epc] = None
+        return properties
+
     def _requestEDTAsIntFromSmartMeter(self, ip_address, epc):
         """
         スマートメータに問い合わせを行い応答のEDTをintとして取得する
@@ -519,13 +1277,26 @@ class BP35A1Client:
             問い合わせに適切な応答がなかった場合はNone
         """
         frame = self._createEchonetLiteFrame(epc=epc, tid=self._nextTransactionId())
-        search_frames = self._createBreakWordsFromFrame(frame)
-        response_frame = self._findFrameFromResponseEvents(self._sendUDPData(ip_address, frame, search_frames), frame)
-        if response_frame is None:
-            return None
+        return self._convertEDTToInt(self._requestFrame(ip_address, frame))
+
+    def _convertEDTToInt(self, response_frame):
+        """
+        応答のフレームのEDTをintに変換する
+
+        Parameters
+        ----------
+        response_frame : dict
+            _parseEchonetLiteFrame() の戻り値
+
+        Returns
+        -------
+        int | None
+            EDTの整数表現
+            EDTがない場合はNone
+        """
         if response_frame["EDT"] is None:
             return None
-        return int(response_frame["EDT"], 16)
+        return self._decodeEDT(response_frame["EDT"])
 
     def _convertUnsignedToSigned(self, digit, bit_size):
         """
@@ -569,6 +1340,7 @@ class BP35A1Client:
         デバイスのバッファ内に残ったデータをクリアする
         """
         self._writeAndReadline("", max_retry=1, pre_wait=1000, retry_wait=1000)
+        self._resetReceiveBuffer()
 
     def isDeviceAvailable(self):
         """
@@ -653,11 +1425,33 @@ class BP35A1Client:
             WOPTを実行し設定変更が行われた場合はTrue
         """
         response = self._writeAndReadline("ROPT", "OK")
+        self._binary_mode = False
         if response[-1].startswith("OK 00"):
             self._writeAndReadline("WOPT 01", "OK")
             return True
         return False
 
+    def execSetBinaryMode(self):
+        """
+        データ部の表示形式をバイナリに設定する
+
+        WOPT 00を実行してERXUDPイベントのデータ部の表示形式をバイナリに設定する
+        ASCII文字の場合に比べてUARTで受信するデータ量が半分になる
+        execSetAsciiMode() と同様にROPTを実行して現在の設定が01(ASCII文字)の場合のみWOPTによる設定を行う
+
+        Returns
+        -------
+        bool
+            WOPTを実行し設定変更が行われた場合はTrue
+        """
+        response = self._writeAndReadline("ROPT", "OK")
+        changed = False
+        if response[-1].startswith("OK 01"):
+            self._writeAndReadline("WOPT 00", "OK")
+            changed = True
+        self._binary_mode = True
+        return changed
+
     def execTerminateSession(self):
         """
         PANAセッションを終了する
@@ -716,6 +1510,8 @@ class BP35A1Client:
         チャンネルスキャンを実行する
 
         SKSCANを実行してチャンネルをスキャンする
+        EPANDESCイベントを受信した後もスキャンの完了(EVENT 22)までは受信を続ける
+        スキャンの完了を受信できないまま上限時刻を過ぎた場合は受信済みのEPANDESCイベントを使用する
 
         Returns
         -------
@@ -734,12 +1530,87 @@ class BP35A1Client:
         ReadTimeoutError
             規定の時間内に期待する応答を全て読み込めなかった場合に発生する例外
         """
-        response = self._writeAndReadline(
+        request = self._writeScanCommand()
+        try:
+            while not self._pollScanResponse(request):
+                self._utime.sleep_ms(self.POLL_INTERVAL_MS)
+        except ReadTimeoutError:
+            pass
+        return self._parseScanResponse(request[3])
+
+    def _writeScanCommand(self):
+        """
+        SKSCANを送信して受信待ちの状態を作成する
+
+        受信待ちの状態は _pollScanResponse() に渡して結果を受信する
+
+        Returns
+        -------
+        list
+            _writeCommand() の戻り値
+        """
+        # スキャンの完了(EVENT 22)で受信処理を区切る
+        return self._writeCommand(
             "SKSCAN 2 FFFFFFFF 6",
+            "EVENT 22",
             max_retry=self.SCAN_RETRY_COUNT,
             retry_wait=self.SCAN_RETRY_WAIT_TIME_MS,
-            pre_wait=self.SCAN_READ_WAIT_TIME_MS
+            pre_wait=self.SCAN_READ_WAIT_TIME_MS,
+            auto_crlf=True,
+            line_filter=None
         )
+
+    def _pollScanResponse(self, request):
+        """
+        受信可能なデータを処理してスキャンが完了したかを判定する
+
+        コマンドの応答(OK, EVENT 20, EPANDESC)より前に受信したEVENT 22は
+        前回のスキャンのものとして無視する
+        エコーバックを無効にしている場合もあるためコマンドのエコーは判定に使用しない
+
+        Parameters
+        ----------
+        request : list
+            _writeScanCommand() で作成した受信待ちの状態
+
+        Returns
+        -------
+        bool
+            コマンドの応答の後にEVENT 22を受信した場合はTrue
+
+        Raises
+        -------
+        ReadTimeoutError
+            上限時刻までにスキャンの完了を受信できなかった場合に発生する
+        """
+        response_lines = request[3]
+        while self._pollResponse(request):
+            if not response_lines[-1].startswith("EVENT 22"):
+                continue
+            for line in response_lines[:-1]:
+                if line == "OK" or line.startswith("EVENT 20") or line.startswith("EPANDESC"):
+                    return True
+        return False
+
+    def _parseScanResponse(self, response):
+        """
+        SKSCANの結果からEPANDESCイベントで通知された内容を取り出す
+
+        Parameters
+        ----------
+        response : list [str, str]
+            SKSCANの結果
+
+        Returns
+        -------
+        dict
+            execScan() の戻り値
+
+        Raises
+        -------
+        ReadTimeoutError
+            EPANDESCイベントの項目が揃っていない場合に発生する
+        """
         kv = {
             "Channel": None,
             "Channel Page": None,
@@ -833,6 +1704,24 @@ class BP35A1Client:
             max_retry=self.JOIN_RETRY_COUNT,
             retry_wait=self.JOIN_RETRY_WAIT_TIME_MS
         )
+        self._completeJoin(ip_address, response)
+
+    def _completeJoin(self, ip_address, response):
+        """
+        SKJOINの結果を確認して接続先のIPアドレスを保持する
+
+        Parameters
+        ----------
+        ip_address : str
+            接続先のIPv6アドレス
+        response : list [str, str]
+            SKJOINの結果
+
+        Raises
+        -------
+        ConnectionError
+            接続が完了しなかった場合に発生する
+        """
         last_line = response[-1]
         if last_line.startswith("EVENT 25"):  # 接続完了
             self._ip_address = ip_address
@@ -949,7 +1838,25 @@ class BP35A1Client:
             瞬時電力計測値(W)
             応答を得られなかった場合はNone
         """
-        return self._convertUnsignedToSigned(self._requestEDTAsIntFromSmartMeter(self._ip_address, 0xE7), 32)
+        return self._convertCurrentPowerConsumption(self._requestEDTAsIntFromSmartMeter(self._ip_address, 0xE7))
+
+    def _convertCurrentPowerConsumption(self, edt):
+        """
+        瞬時電力計測値(EPC=0xE7)のEDTをWに変換する
+
+        Parameters
+        ----------
+        edt : int | None
+            EDTの整数表現
+
+        Returns
+        -------
+        int | None
+            瞬時電力計測値(W)
+        """
+        if edt is None:
+            return None
+        return self._convertUnsignedToSigned(edt, 32)
 
     def execGetCurrentAmpere(self):
         """
@@ -965,7 +1872,23 @@ class BP35A1Client:
             単相2線式の場合T相の値はNone
             応答を得られなかった場合はNone
         """
-        edt = self._requestEDTAsIntFromSmartMeter(self._ip_address, 0xE8)
+        return self._convertCurrentAmpere(self._requestEDTAsIntFromSmartMeter(self._ip_address, 0xE8))
+
+    def _convertCurrentAmpere(self, edt):
+        """
+        瞬時電流計測値(EPC=0xE8)のEDTを(R相, T相)に変換する
+
+        Parameters
+        ----------
+        edt : int | None
+            EDTの整数表現
+
+        Returns
+        -------
+        tuple(int, int) | None
+            瞬時電流計測値(0.1A)
+            単相2線式の場合T相の値はNone
+        """
         if edt is None:
             return None
         r = self._convertUnsignedToSigned((edt >> 16) & 0xFFFF, 16)
@@ -974,6 +1897,141 @@ class BP35A1Client:
             t = None
         return (r, t)
 
+    def execGetProperties(self, epcs):
+        """
+        スマートメータから複数のプロパティを1回の問い合わせで取得する
+
+        OPCにプロパティの数を指定したフレームを1つ送信して全てのプロパティの応答を受け取る
+
+        Parameters
+        ----------
+        epcs : [int, int]
+            問い合わせるプロパティのリスト
+
+        Returns
+        -------
+        dict {int: int | None}
+            EPCをkeyとしたEDTの整数表現のdict
+            スマートメータが応答できなかったプロパティの値はNone
+        """
+        return self.waitGetProperties(self.beginGetProperties(epcs), epcs)
+
+    def beginGetProperties(self, epcs):
+        """
+        スマートメータにプロパティの問い合わせを送信する
+
+        応答は待たずにトランザクションIDを返す
+        続けて別の問い合わせを送信してから waitGetProperties() でそれぞれの応答を取得できる
+
+        Examples
+        --------
+        tid_power = client.beginGetProperties([0xE7])
+        tid_energy = client.beginGetProperties([0xE0])
+        power = client.waitGetProperties(tid_power, [0xE7])
+        energy = client.waitGetProperties(tid_energy, [0xE0])
+
+        Parameters
+        ----------
+        epcs : [int, int]
+            問い合わせるプロパティのリスト
+
+        Returns
+        -------
+        int
+            トランザクションID
+        """
+        frame = self._createEchonetLiteFrame(epc=list(epcs), tid=self._nextTransactionId())
+        return self._beginTransaction(self._ip_address, frame)
+
+    def waitGetProperties(self, tid, epcs):
+        """
+        beginGetProperties() で送信した問い合わせの応答を待って結果を返す
+
+        Parameters
+        ----------
+        tid : int
+            beginGetProperties() で取得したトランザクションID
+        epcs : [int, int]
+            問い合わせたプロパティのリスト
+
+        Returns
+        -------
+        dict {int: int | None}
+            EPCをkeyとしたEDTの整数表現のdict
+            スマートメータが応答できなかったプロパティの値はNone
+
+        Raises
+        -------
+        ReadTimeoutError
+            規定の時間内に応答を受信できなかった場合に発生する
+        """
+        return self._convertProperties(self._waitTransaction(tid), epcs)
+
+    def _convertProperties(self, data, epcs):
+        """
+        応答のECHONET LiteフレームデータからEDTの整数表現のdictを作成する
+
+        Parameters
+        ----------
+        data : str | bytes
+            受信したECHONET Liteフレームデータ
+        epcs : [int, int]
+            問い合わせたプロパティのリスト
+
+        Returns
+        -------
+        dict {int: int | None}
+            waitGetProperties() の戻り値
+        """
+        properties = self._parseEchonetLiteProperties(data)
+        result = {}
+        for epc in epcs:
+            edt = properties.get(epc)
+            result[epc] = None if edt is None else self._decodeEDT(edt)
+        self._logging.debug(result)
+        return result
+
+    def execGetMeasurements(self):
+        """
+        スマートメータから瞬時電力, 瞬時電流, 積算電力量を1回の問い合わせで取得する
+
+        瞬時電力計測値(EPC=0xE7), 瞬時電流計測値(EPC=0xE8), 積算電力量計測値(EPC=0xE0)を
+        execGetProperties()でまとめて問い合わせて結果を返す
+
+        Returns
+        -------
+        dict | None
+            計測値のdict
+            watt : int | None
+                瞬時電力計測値(W)
+            ampere : tuple(int, int) | None
+                瞬時電流計測値(0.1A)
+                (R相, T相)
+            power : float | None
+                積算電力量(kWh)
+        """
+        return self._convertMeasurements(self.execGetProperties(self.MEASUREMENT_EPCS))
+
+    def _convertMeasurements(self, properties):
+        """
+        瞬時電力, 瞬時電流, 積算電力量の問い合わせ結果を計測値のdictに変換する
+
+        Parameters
+        ----------
+        properties : dict {int: int | None}
+            execGetProperties() の戻り値
+
+        Returns
+        -------
+        dict
+            execGetMeasurements() の戻り値
+        """
+        return {
+            "watt"  : self._convertCurrentPowerConsumption(properties[0xE7]),
+            "ampere": self._convertCurrentAmpere(properties[0xE8]),
+            "power" : self._calcPowerConsumption(properties[0xE0]),
+        }
+
     def execGetLast30MinutesPowerConsumption(self):
         """
         スマートメータから定時積算電力量を取得する
@@ -1003,22 +2061,37 @@ class BP35A1Client:
             応答を得られなかった場合はNone
         """
         frame = self._createEchonetLiteFrame(epc=0xEA, tid=self._nextTransactionId())
-        search_frames = self._createBreakWordsFromFrame(frame)
-        response_frame = self._findFrameFromResponseEvents(self._sendUDPData(self._ip_address, frame, search_frames), frame)
-        if response_frame is None:
-            return None
-        edt = response_frame["EDT"]
+        response_frame = self._requestFrame(self._ip_address, frame)
+        result = self._parseLast30MinutesPowerConsumption(response_frame["EDT"])
+        self._logging.debug(result)
+        return result
+
+    def _parseLast30MinutesPowerConsumption(self, edt):
+        """
+        定時積算電力量計測値(EPC=0xEA)のEDTを解析する
+
+        Parameters
+        ----------
+        edt : str | bytes | None
+            EDTの16進数表記文字列
+            バイナリモードで受信した場合はバイト列
+
+        Returns
+        -------
+        dict | None
+            日時と計測値のdict
+            execGetLast30MinutesPowerConsumption() の戻り値と同じ形式
+        """
         if edt is None:
             return None
         result = {}
-        result["year"]  = int(edt[0:4], 16)
-        result["mon"]   = int(edt[4:6], 16)
-        result["mday"]  = int(edt[6:8], 16)
-        result["hour"]  = int(edt[8:10], 16)
-        result["min"]   = int(edt[10:12], 16)
-        result["sec"]   = int(edt[12:14], 16)
-        result["power"] = self._calcPowerConsumption(int(edt[14:22], 16))
-        self._logging.debug(result)
+        result["year"]  = self._decodeEDT(edt, 0, 2)
+        result["mon"]   = self._decodeEDT(edt, 2, 1)
+        result["mday"]  = self._decodeEDT(edt, 3, 1)
+        result["hour"]  = self._decodeEDT(edt, 4, 1)
+        result["min"]   = self._decodeEDT(edt, 5, 1)
+        result["sec"]   = self._decodeEDT(edt, 6, 1)
+        result["power"] = self._calcPowerConsumption(self._decodeEDT(edt, 7, 4))
         return result
 
     def execSetTargetDayForHistory(self, day):
@@ -1042,11 +2115,12 @@ class BP35A1Client:
         """
         edt = day.to_bytes(1, 'big')
         frame = self._createEchonetLiteFrame(epc=0xE5, tid=self._nextTransactionId(), esv=0x61, edt=edt)
-        search_frames = self._createBreakWordsFromFrame(frame)
-        response_frame = self._findFrameFromResponseEvents(self._sendUDPData(self._ip_address, frame, search_frames), frame)
-        if response_frame is None:
+        try:
+            response_frame = self._requestFrame(self._ip_address, frame)
+        except ReadTimeoutError:
             return False
-        return True
+        # 書き込み要求不可応答(SetC_SNA)の場合は設定できなかった
+        return response_frame["ESV"] != 0x51
 
     def execGetTargetDayForHistory(self):
         """
@@ -1084,20 +2158,16 @@ class BP35A1Client:
                 未測定のコマはNone
         """
         frame = self._createEchonetLiteFrame(epc=0xE2, tid=self._nextTransactionId())
-        search_frames = self._createBreakWordsFromFrame(frame)
-        response_frame = self._findFrameFromResponseEvents(self._sendUDPData(self._ip_address, frame, search_frames), frame)
-        if response_frame is None:
-            return None
+        response_frame = self._requestFrame(self._ip_address, frame)
         edt = response_frame["EDT"]
         if edt is None:
             return None
         result = {
-            "day": int(edt[0:4], 16)
+            "day": self._decodeEDT(edt, 0, 2)
         }
         powers = []
         for i in range(48):
-            offset = 4 + i * 8
-            power = int(edt[offset:offset+8], 16)
+            power = self._decodeEDT(edt, 2 + i * 4, 4)
             if power > 99999999:
                 """
                 未測定の場合はNone
@@ -1111,6 +2181,88 @@ class BP35A1Client:
         self._logging.debug(result)
         return result
 
+    def addNotificationCallback(self, callback):
+        """
+        スマートメータからのプロパティ値通知を受け取る関数を登録する
+
+        スマートメータは定時積算電力量計測値(EPC=0xEA)などを自発的に通知(INF, INFC)する
+        通知はどのコマンドの受信処理中に受信しても保持され processNotifications() で関数に渡される
+
+        Parameters
+        ----------
+        callback : function
+            callback(epc, value) の形式で呼び出される関数
+            epc : int
+                通知されたプロパティ
+            value : dict | int | None
+                定時積算電力量計測値(EPC=0xEA, 0xEB)の場合は
+                execGetLast30MinutesPowerConsumption() の戻り値と同じ形式のdict
+                それ以外の場合はEDTの整数表現
+        """
+        self._notification_callbacks.append(callback)
+
+    def processNotifications(self):
+        """
+        受信したプロパティ値通知を処理する
+
+        受信済みのデータを読み込んだ上で処理待ちの通知を登録された関数に渡す
+        応答が必要な通知(INFC)にはINFC_Res(ESV=0x7A)を返信する
+        コマンドの受信処理中には返信できないためコマンドを実行していない時に呼び出す
+        解析できない通知は例外をログに記録して破棄し残りの通知の処理を続ける
+
+        Returns
+        -------
+        int
+            処理した通知の数
+        """
+        self._readLines("INF", [], None, None)
+        count = 0
+        while len(self._notifications) > 0:
+            try:
+                response = self._deliverNotification(self._notifications.pop(0))
+            except Exception as e:
+                # 不正な通知は破棄して残りの通知の処理を続ける
+                self._logging.exception(e)
+                continue
+            if response is not None:
+                self._sendUDPData(self._ip_address, response, ["OK", "FAIL "])
+            count += 1
+        return count
+
+    def _deliverNotification(self, data):
+        """
+        プロパティ値通知を登録された関数に渡す
+
+        Parameters
+        ----------
+        data : str | bytes
+            通知のECHONET Liteフレームデータ
+
+        Returns
+        -------
+        bytes | None
+            返信するINFC_Resのフレーム
+            返信が不要な場合はNone
+        """
+        frame = self._parseEchonetLiteFrame(data)
+        properties = self._parseEchonetLiteProperties(data)
+        self._logging.info(self.__class__.__name__ + " notification received. EPC = " + str(list(properties.keys())))
+        for epc, edt in properties.items():
+            try:
+                if epc == 0xEA or epc == 0xEB:
+                    value = self._parseLast30MinutesPowerConsumption(edt)
+                else:
+                    value = None if edt is None else self._decodeEDT(edt)
+                for callback in self._notification_callbacks:
+                    callback(epc, value)
+            except Exception as e:
+                # 値の解析や通知先の関数で発生した例外でINFC_Resの返信を止めない
+                self._logging.exception(e)
+        if frame["ESV"] == 0x74 and self._ip_address is not None:
+            # INFC_Resは通知の送信元オブジェクト宛に返信する
+            return self._createEchonetLiteFrame(epc=list(properties.keys()), tid=frame["TID"], esv=0x7A, deoj=frame["SEOJ"])
+        return None
+
     def setPowerConsumptionCalcParams(self, *, factor, unit):
         """
         積算電力量を計算するためのパラメータを設定する
@@ -1170,6 +2322,287 @@ class BP35A1Client:
         """
         return self._calcPowerConsumption(10 ** significant_figures - 1)
 
+class AsyncBP35A1Client(BP35A1Client):
+    """
+    BP35A1の非同期クライアントクラス
+
+    BP35A1Clientの応答待ちの間にuasyncioのイベントループに制御を返すクラス
+    SKSCAN, SKJOIN, SKSENDTOの応答を待つ間もディスプレイ更新やボタン操作の処理を継続できる
+
+    応答待ちの長いコマンドはコルーチン(名前の末尾がAsync)として実行する
+    BP35A1Clientから継承したメソッドは従来通り応答を待つ間処理を止める(イベントループ開始前の準備処理向け)
+
+    UARTの送受信は1つのコマンドずつ行う必要があるためロックで排他する
+    SKSENDTOの応答(ERXUDP)はロックを保持せずTIDでトランザクションに振り分けるため
+    複数の問い合わせの応答を並行して待つことができる
+
+    Examples
+    --------
+    from machine import UART
+    import utime, uasyncio
+    from wmlogging import Logger as logging
+
+    client = AsyncBP35A1Client(uart=UART, utime=utime, logging=logging, uasyncio=uasyncio)
+    ...
+    client.execJoin(ip_address)
+
+    async def main():
+        watt = await client.execGetCurrentPowerConsumptionAsync()
+
+    uasyncio.run(main())
+    """
+
+    def __init__(self, *, uart, utime, logging, uasyncio):
+        """
+        Parameters
+        ----------
+        uart : object
+            machine.UARTクラス
+        utime : object
+            utimeモジュール
+        logging : object
+            Loggerクラス
+        uasyncio : object
+            uasyncioモジュール
+            応答待ちの間の待機(sleep_ms)とUART送受信の排他(Lock)に使用する
+        """
+        super().__init__(uart=uart, utime=utime, logging=logging)
+        self._uasyncio = uasyncio
+        self._lock = uasyncio.Lock()
+
+    async def _writeAndReadlineAsync(self, command, break_words = None, *, max_retry = None, pre_wait = None, retry_wait = None, auto_crlf = True, line_filter = None):
+        """
+        BP35A1にコマンドを送信(write)して結果を1行ずつ受信する
+
+        _writeAndReadline() のコルーチン版
+        受信データの確認の間隔ごとにイベントループに制御を返す
+
+        Returns
+        -------
+        list [str, str]
+            受信した各行のリスト
+
+        Raises
+        -------
+        ReadTimeoutError
+            規定の処理時間内で指定されたbreak_wordsが見つからなかった場合に発生する
+        """
+        async with self._lock:
+            request = self._writeCommand(
+                command,
+                break_words,
+                max_retry  = max_retry,
+                pre_wait   = pre_wait,
+                retry_wait = retry_wait,
+                auto_crlf  = auto_crlf,
+                line_filter = line_filter
+            )
+            while not self._pollResponse(request):
+                await self._uasyncio.sleep_ms(self.POLL_INTERVAL_MS)
+            return request[3]
+
+    async def _sendUDPDataAsync(self, ip_address, data, break_words = None, line_filter = None):
+        """
+        指定した宛先にUDPでデータを送信する
+
+        _sendUDPData() のコルーチン版
+
+        Returns
+        -------
+        list [str, str]
+            受信した各行のリスト
+        """
+        return await self._writeAndReadlineAsync(
+            self._createSendToCommand(ip_address, data),
+            break_words = break_words,
+            max_retry   = self.SENDTO_RETRY_COUNT,
+            pre_wait    = self.SENDTO_READ_WAIT_TIME_MS,
+            retry_wait  = self.SENDTO_RETRY_WAIT_TIME_MS,
+            auto_crlf   = False,
+            line_filter = line_filter
+        )
+
+    async def _beginTransactionAsync(self, ip_address, frame):
+        """
+        ECHONET Liteフレームを送信して応答待ちのトランザクションとして登録する
+
+        _beginTransaction() のコルーチン版
+
+        Returns
+        -------
+        int
+            トランザクションID(TID)
+        """
+        tid = self._registerTransaction(frame)
+        try:
+            response = await self._sendUDPDataAsync(ip_address, frame, ["OK", "FAIL "], "ERXUDP ")
+        except Exception:
+            self._transactions.pop(tid, None)
+            raise
+        self._confirmTransaction(tid, response)
+        return tid
+
+    async def _waitTransactionAsync(self, tid):
+        """
+        トランザクションの応答を待って受信データを返す
+
+        _waitTransaction() のコルーチン版
+        他のコマンドの応答を読み落とさないよう受信データの処理はロックを取得して行う
+
+        Returns
+        -------
+        str | bytes
+            受信したECHONET Liteフレームデータ
+        """
+        while True:
+            async with self._lock:
+                data = self._pollTransaction(tid)
+            if data is not None:
+                return data
+            await self._uasyncio.sleep_ms(self.POLL_INTERVAL_MS)
+
+    async def _requestFrameAsync(self, ip_address, frame):
+        """
+        ECHONET Liteフレームを送信して対応する応答を解析して返す
+
+        _requestFrame() のコルーチン版
+
+        Returns
+        -------
+        dict
+            _parseEchonetLiteFrame() の戻り値
+        """
+        tid = await self._beginTransactionAsync(ip_address, frame)
+        return self._parseEchonetLiteFrame(await self._waitTransactionAsync(tid))
+
+    async def execScanAsync(self):
+        """
+        チャンネルスキャンを実行する
+
+        execScan() のコルーチン版
+
+        Returns
+        -------
+        dict
+            execScan() の戻り値
+        """
+        async with self._lock:
+            request = self._writeScanCommand()
+            try:
+                while not self._pollScanResponse(request):
+                    await self._uasyncio.sleep_ms(self.POLL_INTERVAL_MS)
+            except ReadTimeoutError:
+                pass
+        return self._parseScanResponse(request[3])
+
+    async def execJoinAsync(self, ip_address):
+        """
+        指定されたIPアドレスに対して接続を行う
+
+        execJoin() のコルーチン版
+
+        Parameters
+        ----------
+        ip_address : str
+            接続先のIPv6アドレス
+        """
+        response = await self._writeAndReadlineAsync(
+            "SKJOIN " + ip_address,
+            ["EVENT 24", "EVENT 25"],
+            max_retry=self.JOIN_RETRY_COUNT,
+            retry_wait=self.JOIN_RETRY_WAIT_TIME_MS
+        )
+        self._completeJoin(ip_address, response)
+
+    async def execGetCurrentPowerConsumptionAsync(self):
+        """
+        スマートメータから瞬時電力計測値を取得する
+
+        execGetCurrentPowerConsumption() のコルーチン版
+
+        Returns
+        -------
+        int | None
+            瞬時電力計測値(W)
+        """
+        frame = self._createEchonetLiteFrame(epc=0xE7, tid=self._nextTransactionId())
+        response_frame = await self._requestFrameAsync(self._ip_address, frame)
+        return self._convertCurrentPowerConsumption(self._convertEDTToInt(response_frame))
+
+    async def execGetPropertiesAsync(self, epcs):
+        """
+        スマートメータから複数のプロパティを1回の問い合わせで取得する
+
+        execGetProperties() のコルーチン版
+
+        Parameters
+        ----------
+        epcs : [int, int]
+            問い合わせるプロパティのリスト
+
+        Returns
+        -------
+        dict {int: int | None}
+            execGetProperties() の戻り値
+        """
+        frame = self._createEchonetLiteFrame(epc=list(epcs), tid=self._nextTransactionId())
+        tid = await self._beginTransactionAsync(self._ip_address, frame)
+        return self._convertProperties(await self._waitTransactionAsync(tid), epcs)
+
+    async def execGetMeasurementsAsync(self):
+        """
+        スマートメータから瞬時電力, 瞬時電流, 積算電力量を1回の問い合わせで取得する
+
+        execGetMeasurements() のコルーチン版
+
+        Returns
+        -------
+        dict
+            execGetMeasurements() の戻り値
+        """
+        return self._convertMeasurements(await self.execGetPropertiesAsync(self.MEASUREMENT_EPCS))
+
+    async def execGetLast30MinutesPowerConsumptionAsync(self):
+        """
+        スマートメータから定時積算電力量を取得する
+
+        execGetLast30MinutesPowerConsumption() のコルーチン版
+
+        Returns
+        -------
+        dict | None
+            execGetLast30MinutesPowerConsumption() の戻り値
+        """
+        frame = self._createEchonetLiteFrame(epc=0xEA, tid=self._nextTransactionId())
+        response_frame = await self._requestFrameAsync(self._ip_address, frame)
+        return self._parseLast30MinutesPowerConsumption(response_frame["EDT"])
+
+    async def processNotificationsAsync(self):
+        """
+        受信したプロパティ値通知を処理する
+
+        processNotifications() のコルーチン版
+
+        Returns
+        -------
+        int
+            処理した通知の数
+        """
+        async with self._lock:
+            self._readLines("INF", [], None, None)
+        count = 0
+        while len(self._notifications) > 0:
+            try:
+                response = self._deliverNotification(self._notifications.pop(0))
+            except Exception as e:
+                # 不正な通知は破棄して残りの通知の処理を続ける
+                self._logging.exception(e)
+                continue
+            if response is not None:
+                await self._sendUDPDataAsync(self._ip_address, response, ["OK", "FAIL "])
+            count += 1
+        return count
+
 class DeviceError(Exception):
     """
     BP35A1デバイスに関連する例外
@@ -48,14 +48,17 @@ class WMConfig:
             },
             "warning": None,
             "caution": None,
+            "demand": None,
             "update_interval": 30,
+            "adaptive_interval": None,
             "beep_volume": 3,
             "auto_reboot": True,
             "sync_cache": False,
         },
         "display": {
             "brightness": 50,
-            "sleep": None
+            "sleep": None,
+            "light_sleep": False
         }
     }
     DEFAULT_CACHE = {
@@ -249,6 +252,24 @@ class WMConfig:
                 if config.wattmeter.caution.watt >= config.wattmeter.max.watt:
                     raise InvalidConfigError("wattmeter.caution.watt must be less than wattmeter.max.watt.")
 
+        # wattmeter.adaptive_interval.min/maxは数値で1 <= min <= max
+        if config.wattmeter.adaptive_interval is not None:
+            if not isinstance(config.wattmeter.adaptive_interval.min, int):
+                raise InvalidConfigError("wattmeter.adaptive_interval.min must be an integer.")
+            if not isinstance(config.wattmeter.adaptive_interval.max, int):
+                raise InvalidConfigError("wattmeter.adaptive_interval.max must be an integer.")
+            if config.wattmeter.adaptive_interval.min < 1:
+                raise InvalidConfigError("wattmeter.adaptive_interval.min must be greater than 0.")
+            if config.wattmeter.adaptive_interval.min > config.wattmeter.adaptive_interval.max:
+                raise InvalidConfigError("wattmeter.adaptive_interval.min must be less than or equal to wattmeter.adaptive_interval.max.")
+
+        # wattmeter.demand.wattは数値で1以上(30分間の平均電力)
+        if config.wattmeter.demand is not None:
+            if not isinstance(config.wattmeter.demand.watt, int):
+                raise InvalidConfigError("wattmeter.demand.watt must be an integer.")
+            if config.wattmeter.demand.watt < 1:
+                raise InvalidConfigError("wattmeter.demand.watt must be greater than 0.")
+
         if config.display is not None:
             # display.brightnessは数値で0-100の範囲(axp.setLcdBrightness())
             if config.display.brightness is not None:
@@ -257,6 +278,11 @@ class WMConfig:
                 if config.display.brightness < 0 or config.display.brightness > 100:
                     raise InvalidConfigError("display.brightness must be in the range of 0 to 100.")
 
+            # display.light_sleepは真偽値
+            if config.display.light_sleep is not None:
+                if not isinstance(config.display.light_sleep, bool):
+                    raise InvalidConfigError("display.light_sleep must be a boolean.")
+
             if config.display.sleep is not None:
                 # display.sleep はNone又はstartとendの値が存在しなければならない
                 if config.display.sleep.start is None or config.display.sleep.end is None: